@@ -19,7 +19,10 @@ def hello():
 
 def prepare_experiment(experiment_id=None, instances=None, distances=None, instance_type='ordinal',
                        coordinates=None, distance_id='emd-positionwise', _import=True,
-                       shift=False, dim=2, store=True, coordinates_names=None):
+                       shift=False, dim=2, store=True, coordinates_names=None,
+                       lazy=True, max_loaded_instances=None):
+    """ lazy: elections are imported on first access, and at most max_loaded_instances
+    of them are kept in memory at the same time (None for no limit) """
 
     # if instance_type == 'ordinal':
     #     return OrdinalElectionExperiment(experiment_id=experiment_id, shift=shift,
@@ -27,13 +30,15 @@ def prepare_experiment(experiment_id=None, instances=None, distances=None, insta
     #                                      instance_type=instance_type,
     #                                      distances=distances, coordinates=coordinates,
     #                                      distance_id=distance_id,
-    #                                      coordinates_names=coordinates_names)
+    #                                      coordinates_names=coordinates_names,
+    #                                      lazy=lazy, max_loaded_instances=max_loaded_instances)
     if instance_type in ['approval', 'rule']:
         return ApprovalElectionExperiment(experiment_id=experiment_id, shift=shift,
                                           instances=instances, _import=_import,
                                           instance_type=instance_type,
                                           distances=distances, coordinates=coordinates,
-                                          distance_id=distance_id)
+                                          distance_id=distance_id, lazy=lazy,
+                                          max_loaded_instances=max_loaded_instances)
     # elif instance_type == 'roommates':
     #     return RoommatesExperiment(experiment_id=experiment_id, _import=_import,
     #                                distance_id=distance_id, instance_type=instance_type)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+""" Binary election format:
+    <election_id>.npy         unique votes (ordinal: candidate ids as uint8/uint16,
+                              approval: bit-packed approval matrix)
+    <election_id>_counts.npy  multiplicities of the unique votes
+    <election_id>.json        header (ballot, model_id, params, sizes) """
+
+import ast
+import json
+import os
+from collections import Counter
+
+import numpy as np
+
+
+def get_binary_election_path(experiment_id: str, election_id: str) -> str:
+    return os.path.join(os.getcwd(), "experiments", str(experiment_id), "elections",
+                        str(election_id))
+
+
+def binary_election_exists(experiment_id: str, election_id: str, extension: str = None) -> bool:
+    """ Check if the election is stored in the binary format (and, if the extension of
+    the text format is given, that the binary version is not older than the text one) """
+    path = get_binary_election_path(experiment_id, election_id)
+    if not os.path.isfile(f'{path}.json'):
+        return False
+    if extension is not None and os.path.isfile(f'{path}.{extension}'):
+        return os.path.getmtime(f'{path}.json') >= os.path.getmtime(f'{path}.{extension}')
+    return True
+
+
+def get_vote_dtype(num_candidates: int):
+    if num_candidates <= 2 ** 8:
+        return np.uint8
+    elif num_candidates <= 2 ** 16:
+        return np.uint16
+    return np.uint32
+
+
+def store_binary_election(experiment_id: str, election_id: str, model_id: str,
+                          num_candidates: int, num_voters: int, params, ballot: str,
+                          votes=None, fake: bool = False) -> None:
+    """ Store election as .npy arrays with a .json header """
+
+    path = get_binary_election_path(experiment_id, election_id)
+    header = {'ballot': ballot, 'model_id': model_id, 'params': str(params),
+              'num_candidates': int(num_candidates), 'num_voters': int(num_voters),
+              'fake': fake}
+
+    if not fake:
+        if ballot == 'approval' and isinstance(votes, np.ndarray):
+            unique_votes, counts = np.unique(votes.astype(bool), axis=0, return_counts=True)
+            unique_votes = np.packbits(unique_votes, axis=1)
+            counts = counts.astype(np.uint32)
+        elif ballot == 'approval':
+            counter = Counter(frozenset(int(c) for c in vote) for vote in votes)
+            unique_votes = np.zeros([len(counter), num_candidates], dtype=bool)
+            for i, vote in enumerate(counter):
+                unique_votes[i, list(vote)] = True
+            unique_votes = np.packbits(unique_votes, axis=1)
+            counts = np.array(list(counter.values()), dtype=np.uint32)
+        else:
+            votes = np.asarray(votes, dtype=np.int64).reshape(len(votes), -1)
+            unique_votes, counts = np.unique(votes, axis=0, return_counts=True)
+            order = np.argsort(-counts, kind='stable')
+            unique_votes = unique_votes[order].astype(get_vote_dtype(num_candidates))
+            counts = counts[order].astype(np.uint32)
+        np.save(f'{path}.npy', unique_votes)
+        np.save(f'{path}_counts.npy', counts)
+
+    with open(f'{path}.json', 'w') as json_file:
+        json.dump(header, json_file)
+
+
+def import_binary_election(experiment_id: str, election_id: str, shift: bool = False):
+    """ Import election stored in the binary format (arrays are memory-mapped);
+    approval votes are returned as a boolean (num_voters, num_candidates) matrix,
+    ordinal votes as an integer array of the unique votes together with their
+    multiplicities (to be expanded only when needed, see expand_votes)
+
+    Return: votes, counts (None for approval), num_voters, num_candidates, params,
+    model_id, fake """
+
+    path = get_binary_election_path(experiment_id, election_id)
+    with open(f'{path}.json', 'r') as json_file:
+        header = json.load(json_file)
+
+    params = ast.literal_eval(header['params'])
+    num_candidates = header['num_candidates']
+    num_voters = header['num_voters']
+
+    if header['fake']:
+        return None, None, num_voters, num_candidates, params, header['model_id'], True
+
+    unique_votes = np.load(f'{path}.npy', mmap_mode='r')
+    counts = np.load(f'{path}_counts.npy', mmap_mode='r')
+
+    if header['ballot'] == 'approval':
+        approvals = np.unpackbits(unique_votes, axis=1, count=num_candidates).astype(bool)
+        if shift:
+            approvals = np.hstack([approvals[:, 1:], np.zeros([len(approvals), 1], dtype=bool)])
+        return np.repeat(approvals, counts, axis=0), None, num_voters, num_candidates, \
+            params, header['model_id'], False
+
+    if shift:
+        unique_votes = unique_votes.astype(np.int64) - 1
+    return unique_votes, counts, num_voters, num_candidates, params, header['model_id'], False
+
+
+def expand_votes(unique_votes: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """ Return: (num_voters, num_candidates) array with each vote repeated
+    according to its multiplicity (unique_votes itself, if there are no repetitions) """
+    if np.all(counts == 1):
+        return unique_votes
+    return np.repeat(unique_votes, counts, axis=0)
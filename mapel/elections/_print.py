@@ -871,21 +871,24 @@ def print_matrix(experiment=None, scale=1., rounding=1, distance_name='',
     # print(bucket)
 
     # ADD VALUES
-    for i in range(num_selected_instances):
-        limit = i + 1
-        if self_distances:
-            limit = i
-        for j in range(limit, num_selected_instances):
-            if time:
-                matrix[bucket[i]][bucket[j]] += experiment.times[mapping[i]][
-                    mapping[j]]
-            else:
-                # print('map', mapping[i], mapping[j])
-                # print(experiment.distances)
-                # print(experiment.distances[mapping[i]][mapping[j]])
-                # print(matrix[bucket[i]][bucket[j]])
-                matrix[bucket[i]][bucket[j]] += experiment.distances[mapping[i]][mapping[j]]
-            quantities[bucket[i]][bucket[j]] += 1
+    if time:
+        source = experiment.get_distance_matrix(experiment.times)
+    else:
+        source = experiment.get_distance_matrix()
+    indices = [source.index[mapping[i]] for i in range(num_selected_instances)]
+    values = source.to_matrix()[np.ix_(indices, indices)]
+    family_indices = np.array([selected_families.index(family_id) for family_id in bucket])
+
+    rows, cols = np.triu_indices(num_selected_instances, k=0 if self_distances else 1)
+    sums = np.zeros([num_selected_families, num_selected_families])
+    counts = np.zeros([num_selected_families, num_selected_families])
+    np.add.at(sums, (family_indices[rows], family_indices[cols]), values[rows, cols])
+    np.add.at(counts, (family_indices[rows], family_indices[cols]), 1)
+
+    for i, family_id_1 in enumerate(selected_families):
+        for j, family_id_2 in enumerate(selected_families):
+            matrix[family_id_1][family_id_2] = sums[i][j]
+            quantities[family_id_1][family_id_2] = counts[i][j]
     #
     # for i, family_id_1 in enumerate(experiment.families):
     #     for election_id_1 in experiment.families[family_id_1].election_ids:
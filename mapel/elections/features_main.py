@@ -307,17 +307,17 @@ def clustering_v1(experiment, num_clusters=20):
             'Identity', 'Uniformity', 'Antagonism', 'Stratification',
             ]
 
+    distance_matrix = experiment.get_distance_matrix()
+
     new_names = []
-    for i, a in enumerate(list(experiment.distances)):
+    for i, a in enumerate(distance_matrix.instance_ids):
         if not any(tmp in a for tmp in SKIP):
             new_names.append(a)
     print(len(new_names))
 
-    distMatrix = np.zeros([len(new_names), len(new_names)])
-    for i, a in enumerate(new_names):
-        for j, b in enumerate(new_names):
-            if a != b:
-                distMatrix[i][j] = experiment.distances[a][b]
+    indices = [distance_matrix.index[name] for name in new_names]
+    distMatrix = distance_matrix.to_matrix()[np.ix_(indices, indices)].astype(float)
+    np.fill_diagonal(distMatrix, 0.)
 
     # Zd = linkage(ssd.squareform(distMatrix), method="complete")
     # cld = fcluster(Zd, 500, criterion='distance').reshape(len(new_names), 1)
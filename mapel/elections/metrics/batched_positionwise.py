@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+from time import time
+
+import numpy as np
+
+from mapel.main._inner_distances import get_cost_matrix
+from mapel.main._matchings import solve_matching_vectors
+
+BATCHED_INNER_DISTANCES = {'l1', 'l2', 'chebyshev', 'hellinger', 'emd', 'discrete', 'wl1'}
+
+# upper bound on the number of floats in a single intermediate cost tensor
+MAX_BLOCK_ELEMENTS = 2 ** 22
+
+
+def stack_positionwise_vectors(instances: dict, instance_ids: list) -> np.ndarray:
+    """ Return: (N, m, m) array with positionwise vectors of given elections """
+    return np.stack([np.asarray(instances[instance_id].get_vectors(), dtype=float)
+                     for instance_id in instance_ids])
+
+
+def get_batch_cost_tables(vectors_1: np.ndarray, vectors_2: np.ndarray,
+                          inner_distance: str) -> np.ndarray:
+    """ Return: (B, m, m) cost tables, where
+        cost[b][j][i] = inner_distance(vectors_1[b][i], vectors_2[b][j]) """
+    if inner_distance not in BATCHED_INNER_DISTANCES:
+        raise ValueError(f'No batched version of {inner_distance} inner distance!')
+    return get_cost_matrix(vectors_2, vectors_1, inner_distance)
+
+
+def can_be_batched(instances: dict, ids: list) -> bool:
+    """ Check if all the elections have the same number of candidates """
+    num_candidates = {instances[instance_id].num_candidates
+                      for pair in ids for instance_id in pair}
+    return len(num_candidates) == 1
+
+
+def compute_positionwise_distances_batch(instances: dict, ids: list, inner_distance: str,
+                                         block_size: int = None) -> list:
+    """ Compute positionwise distances for all given pairs of elections
+
+    Return: list of (instance_id_1, instance_id_2, distance, matching, time) """
+
+    instance_ids = list(dict.fromkeys(instance_id for pair in ids for instance_id in pair))
+    index = {instance_id: i for i, instance_id in enumerate(instance_ids)}
+    stacked = stack_positionwise_vectors(instances, instance_ids)
+
+    if block_size is None:
+        m = stacked.shape[1]
+        block_size = max(1, MAX_BLOCK_ELEMENTS // (m ** 3))
+
+    results = []
+    for start in range(0, len(ids), block_size):
+        block_ids = ids[start:start + block_size]
+        start_time = time()
+        indices_1 = [index[instance_id_1] for instance_id_1, _ in block_ids]
+        indices_2 = [index[instance_id_2] for _, instance_id_2 in block_ids]
+        cost_tables = get_batch_cost_tables(stacked[indices_1], stacked[indices_2],
+                                            inner_distance)
+        shared_time = (time() - start_time) / len(block_ids)
+
+        for (instance_id_1, instance_id_2), cost_table in zip(block_ids, cost_tables):
+            start_time = time()
+            distance, matching = solve_matching_vectors(cost_table)
+            results.append((instance_id_1, instance_id_2, distance, np.array(matching),
+                            time() - start_time + shared_time))
+
+    return results
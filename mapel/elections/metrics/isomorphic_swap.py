@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+""" Exact isomorphic swap distance computed by branch-and-bound over candidate matchings.
+
+For a fixed candidate matching the distance is a linear assignment of voters, with
+costs equal to the swap distances between the (relabelled) votes. Candidates of the
+first election are matched one by one, and a node of the search tree is pruned if
+one of the following lower bounds reaches the best distance found so far:
+    - the assignment of voters w.r.t. disagreements on pairs of already matched
+      candidates (costs only grow as more candidates are matched), plus, for each
+      unmatched candidate, the fewest disagreements on its pairs with the matched
+      ones over all the candidates it can still be matched with,
+    - half of the positionwise (EMD) distance restricted to the candidate matchings
+      consistent with the node (Kendall tau is at least half of Spearman footrule). """
+
+import math
+from multiprocessing import Pool, Value
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from mapel.main._inner_distances import swap_distances, _hamming_distances_of_orders
+
+
+def get_pairwise_order_tensor(potes: np.ndarray) -> np.ndarray:
+    """ Return: (n, m, m) boolean array, whether candidate i is ranked above j in vote v """
+    potes = np.asarray(potes)
+    return potes[:, :, np.newaxis] < potes[:, np.newaxis, :]
+
+
+def get_position_emd_table(potes_1: np.ndarray, potes_2: np.ndarray) -> np.ndarray:
+    """ Return: table E, where E[i][j] is the EMD between the (unnormalized) position
+    vectors of candidate i in the first and candidate j in the second election """
+    num_candidates = potes_1.shape[1]
+    cumsum_1 = np.cumsum(_count_positions(potes_1, num_candidates), axis=1)[:, :-1]
+    cumsum_2 = np.cumsum(_count_positions(potes_2, num_candidates), axis=1)[:, :-1]
+    return np.abs(cumsum_1[:, np.newaxis, :] - cumsum_2[np.newaxis, :, :]).sum(axis=2)
+
+
+def _count_positions(potes: np.ndarray, num_candidates: int) -> np.ndarray:
+    counts = np.zeros([num_candidates, num_candidates])
+    np.add.at(counts, (np.tile(np.arange(num_candidates), len(potes)), potes.ravel()), 1)
+    return counts
+
+
+def _solve_assignment(cost_table: np.ndarray) -> float:
+    row_ind, col_ind = linear_sum_assignment(cost_table)
+    return float(cost_table[row_ind, col_ind].sum())
+
+
+class SwapBranchAndBound:
+
+    def __init__(self, potes_1, potes_2):
+        self.potes_1 = np.asarray(potes_1)
+        self.potes_2 = np.asarray(potes_2)
+        self.num_candidates = self.potes_1.shape[1]
+        self.orders_1 = get_pairwise_order_tensor(self.potes_1)
+        self.orders_2 = get_pairwise_order_tensor(self.potes_2)
+        self.emd_table = get_position_emd_table(self.potes_1, self.potes_2)
+
+    def get_matching_cost(self, mapping) -> float:
+        """ Return: swap distance for candidate i matched with mapping[i] """
+        return _solve_assignment(swap_distances(self.potes_1, self.potes_2[:, mapping]))
+
+    def get_initial_matching(self) -> (float, list):
+        """ Return: cost, candidate matching found by swapping pairs of candidates
+        (starting from the one optimal w.r.t. the positionwise distance) """
+        _, mapping = linear_sum_assignment(self.emd_table)
+        mapping = list(mapping)
+        best_cost = self.get_matching_cost(mapping)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(self.num_candidates):
+                for j in range(i + 1, self.num_candidates):
+                    mapping[i], mapping[j] = mapping[j], mapping[i]
+                    cost = self.get_matching_cost(mapping)
+                    if cost < best_cost:
+                        best_cost, improved = cost, True
+                    else:
+                        mapping[i], mapping[j] = mapping[j], mapping[i]
+        return best_cost, mapping
+
+    def extend(self, mapping: list, costs: np.ndarray, candidate: int) -> np.ndarray:
+        """ Return: disagreements between voters on pairs of matched candidates,
+        after the next candidate is matched with the given one """
+        depth = len(mapping)
+        if depth == 0:
+            return costs
+        orders_1 = self.orders_1[:, np.arange(depth), depth]
+        orders_2 = self.orders_2[:, mapping, candidate]
+        return costs + _hamming_distances_of_orders(orders_1, orders_2)
+
+    def get_order_distances(self, mapping: list, rows, cols) -> np.ndarray:
+        """ Return: (n, len(rows), n, len(cols)) array, D[u][i][v][j] is the number of
+        matched candidates for which the order w.r.t. candidate rows[i] in vote u of
+        the first election differs from that w.r.t. cols[j] in vote v of the second one """
+        num_voters_1, num_voters_2 = len(self.potes_1), len(self.potes_2)
+        if len(mapping) == 0:
+            return np.zeros([num_voters_1, len(rows), num_voters_2, len(cols)],
+                            dtype=np.float32)
+        orders_1 = self.orders_1[:, np.arange(len(mapping))][:, :, rows]
+        orders_2 = self.orders_2[:, mapping][:, :, cols]
+        orders_1 = orders_1.transpose(0, 2, 1).reshape(-1, len(mapping)).astype(np.float32)
+        orders_2 = orders_2.transpose(0, 2, 1).reshape(-1, len(mapping)).astype(np.float32)
+        distances = orders_1.sum(axis=1)[:, np.newaxis] + orders_2.sum(axis=1)[np.newaxis, :] \
+            - 2 * orders_1 @ orders_2.T
+        return distances.reshape(num_voters_1, len(rows), num_voters_2, len(cols))
+
+    def get_children(self, mapping: list, costs: np.ndarray, best_cost: float) -> list:
+        """ Return: list of (bound, mapping, costs) for the next matchings
+        that can lead to a distance smaller than best_cost """
+        depth = len(mapping)
+        free = [j for j in range(self.num_candidates) if j not in mapping]
+        rows = np.arange(depth + 1, self.num_candidates)
+        fixed_emd = self.emd_table[np.arange(depth), mapping].sum()
+        if len(rows) > 0:
+            distances = self.get_order_distances(mapping, rows, free)
+
+        children = []
+        for position, candidate in enumerate(free):
+            new_costs = self.extend(mapping, costs, candidate)
+            cols = free[:position] + free[position + 1:]
+            emd_bound = fixed_emd + self.emd_table[depth, candidate]
+            if len(cols) > 0:
+                emd_bound += _solve_assignment(self.emd_table[np.ix_(rows, cols)])
+            bound = math.ceil(emd_bound / 2 - 1e-9)
+            if bound >= best_cost:
+                continue
+
+            if len(cols) > 0:
+                # pairs formed by the new and the unmatched candidates
+                new_distances = distances[:, :, :, np.arange(len(free)) != position] + \
+                    (self.orders_1[:, depth, rows][:, :, np.newaxis, np.newaxis] !=
+                     self.orders_2[:, candidate, cols][np.newaxis, np.newaxis, :, :])
+                cross_costs = np.maximum(new_distances.min(axis=3).sum(axis=1),
+                                         new_distances.min(axis=1).sum(axis=2))
+                bound = max(bound, _solve_assignment(new_costs + cross_costs))
+            else:
+                bound = max(bound, _solve_assignment(new_costs))
+
+            if bound < best_cost:
+                children.append((bound, mapping + [candidate], new_costs))
+        return children
+
+    def search(self, node: tuple, best_cost: float, best_mapping: list,
+               shared_best=None) -> (float, list):
+        """ Depth-first search of the subtree rooted at node (bound, mapping, costs)
+
+        Return: best cost, best mapping (unchanged if nothing better was found);
+        with shared_best, only the subtree is pruned with the best distance found by the
+        other processes, while the returned matching is always the one found here """
+        threshold = best_cost
+        stack = [node]
+        while stack:
+            if shared_best is not None:
+                threshold = min(threshold, shared_best.value)
+            bound, mapping, costs = stack.pop()
+            if bound >= threshold:
+                continue
+            if len(mapping) == self.num_candidates:
+                best_cost, best_mapping = bound, mapping
+                threshold = bound
+                if shared_best is not None:
+                    with shared_best.get_lock():
+                        shared_best.value = min(shared_best.value, best_cost)
+                continue
+            children = self.get_children(mapping, costs, threshold)
+            # the most promising child is explored first
+            children.sort(key=lambda child: -child[0])
+            stack.extend(children)
+        return best_cost, best_mapping
+
+    def get_top_nodes(self, root: tuple, num_nodes: int, best_cost: float) -> list:
+        """ Return: nodes (bound, mapping, costs) of the first level of the search tree
+        with at least num_nodes nodes (or all the leaves) """
+        nodes = [root]
+        while len(nodes) < num_nodes and len(nodes[0][1]) < self.num_candidates:
+            nodes = [child for _, mapping, costs in nodes
+                     for child in self.get_children(mapping, costs, best_cost)]
+            if not nodes:
+                break
+        return sorted(nodes, key=lambda node: node[0])
+
+
+def compute_isomorphic_swap_distance(potes_1, potes_2, num_workers: int = 1) -> (int, list):
+    """ Return: isomorphic swap distance, optimal candidate matching """
+    problem = SwapBranchAndBound(potes_1, potes_2)
+    best_cost, best_mapping = problem.get_initial_matching()
+    root = (0., [], np.zeros([len(problem.potes_1), len(problem.potes_2)]))
+
+    if num_workers <= 1:
+        best_cost, best_mapping = problem.search(root, best_cost, best_mapping)
+        return int(best_cost), [int(j) for j in best_mapping]
+
+    # the top levels of the tree are split between the processes,
+    # which share the best distance found so far
+    nodes = problem.get_top_nodes(root, 4 * num_workers, best_cost)
+    shared_best = Value('d', best_cost)
+    with Pool(processes=num_workers, initializer=_init_search_worker,
+              initargs=(problem, shared_best)) as pool:
+        results = pool.map(_search_subtree, nodes)
+    for cost, mapping in results:
+        if mapping is not None and cost < best_cost:
+            best_cost, best_mapping = cost, mapping
+    return int(best_cost), [int(j) for j in best_mapping]
+
+
+_worker_problem = None
+_worker_best = None
+
+
+def _init_search_worker(problem: SwapBranchAndBound, shared_best) -> None:
+    global _worker_problem, _worker_best
+    _worker_problem = problem
+    _worker_best = shared_best
+
+
+def _search_subtree(node: tuple) -> (float, list):
+    """ Return: best cost, best mapping found in the subtree (None if nothing was found) """
+    return _worker_problem.search(node, math.inf, None, shared_best=_worker_best)
@@ -3,6 +3,7 @@
 import os
 import math
 from contextlib import suppress
+from time import time
 
 try:
     import cplex
@@ -11,764 +12,184 @@ except ImportError:
 
 import numpy as np
 
+from mapel.main._inner_distances import get_cost_matrix
+from mapel.main._lp_solvers import LinearProgram
+
 # NEW ILP
-def solve_rand_approx_pav(election, committee_size, W, C, ctr=0, fixed=[]):
+def solve_rand_approx_pav(election, committee_size, W, C, ctr=0, fixed=[], solver=None):
     if ctr == 5:
         return 0
 
-    cp = cplex.Cplex()
-    cp.parameters.threads.set(1)
-
     m = election.num_candidates
     n = election.num_voters
     k = committee_size
 
-    # OBJECTIVE FUNCTION
-    cp.objective.set_sense(cp.objective.sense.minimize)
-    names = []
-    obj = []
-    for j in range(n):
-        for l in range(k):
-            for i in range(m):
-                names.append(f'x{l}_{i}_{j}')
-                obj.append(W[l] * C[j][i])
-    types = [cp.variables.type.continuous] * len(names)
-    cp.variables.add(obj=obj, names=names, types=types,
-                     lb=[0.] * len(names), ub=[1.] * len(names))
-
-    # ADD MISSING VARIABLES
-    names = []
-    for i in range(m):
-        names.append(f'y{i}')
-    cp.variables.add(names=list(names),
-                     types=[cp.variables.type.continuous] * len(names),
-                     lb=[0.] * len(names), ub=[1.] * len(names))
+    program = LinearProgram()
+    # x[l][i][j] -- candidate i is the l-th approved committee member of voter j
+    x = program.add_variables((k, m, n), ub=1.,
+                              obj=np.asarray(W, dtype=float)[:k, np.newaxis, np.newaxis] *
+                              np.asarray(C, dtype=float).T[np.newaxis, :, :])
+    y = program.add_variables(m, ub=1.)
 
     # FIRST SINGLE CONSTRAINT
-    ind = []
-    val = []
-    for i in range(m):
-        ind.append(f'y{i}')
-        val.append(1.)
-    cp.linear_constraints.add(lin_expr=[cplex.SparsePair(ind=ind, val=val)],
-                              senses=['E'],
-                              rhs=[committee_size],
-                              names=['C1'])
+    program.add_constraints(y, lb=committee_size, ub=committee_size)
 
     # SECOND GROUP OF CONSTRAINTS
-    lin_expr = []
-    rhs = []
-    for i in range(m):
-        for j in range(n):
-            val = []
-            ind = []
-            for l in range(k):
-                ind.append(f'x{l}_{i}_{j}')
-                val.append(1.)
-            ind.append(f'y{i}')
-            val.append(-1.)
-            lin_expr.append(cplex.SparsePair(ind=ind, val=val))
-            rhs.append(0.)
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['L'] * len(rhs),
-                              rhs=rhs,
-                              names=['C2_' + str(i) for i in range(len(rhs))])
+    variables = np.hstack([x.transpose(1, 2, 0).reshape(m * n, k),
+                           np.repeat(y, n)[:, np.newaxis]])
+    program.add_constraints(variables, [1.] * k + [-1.], ub=0.)
 
     # THIRD GROUP OF CONSTRAINTS
-    lin_expr = []
-    rhs = []
-    for j in range(n):
-        for l in range(k):
-            val = []
-            ind = []
-            for i in range(m):
-                ind.append(f'x{l}_{i}_{j}')
-                val.append(1.)
-            lin_expr.append(cplex.SparsePair(ind=ind, val=val))
-            rhs.append(1.)
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['G'] * len(rhs),
-                              rhs=rhs,
-                              names=['C3_' + str(i) for i in range(len(rhs))])
+    program.add_constraints(x.transpose(2, 0, 1).reshape(n * k, m), lb=1.)
 
     # FIXED
-    lin_expr = []
-    rhs = []
-    for i in fixed:
-        ind = [f'y{i}']
-        val = [1.]
-    lin_expr.append(cplex.SparsePair(ind=ind, val=val))
-    rhs.append(1.)
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['E'] * len(rhs),
-                              rhs=rhs,
-                              names=['C4_' + str(i) for i in range(len(rhs))])
-
-    cp.parameters.threads.set(1)
-    cp.set_results_stream(None)
-    try:
-        cp.solve()
-    except:  # cplex.CplexSolverError:
-        print("Exception raised while solving")
+    if fixed:
+        program.add_constraints(y[list(fixed)][:, np.newaxis], lb=1., ub=1.)
+
+    objective_value, values = program.solve(solver)
+    if objective_value is None:
         return
 
     ### TO DO LATER ###
 
-    score, fixed = print_results(election, committee_size, cp)
+    score, fixed = print_results(election, committee_size, values[y])
 
     if len(fixed) < committee_size:
         print(score)
-        solve_rand_approx_pav(election, committee_size, W, C, ctr+1, fixed)
+        solve_rand_approx_pav(election, committee_size, W, C, ctr+1, fixed, solver=solver)
     else:
         return score
 
 
 # FOR SUBELECTIONS
-def solve_lp_voter_subelection(election_1, election_2, metric_name='0'):
+def solve_lp_voter_subelection(election_1, election_2, metric_name='0', solver=None):
     """ LP solver for voter subelection problem """
 
-    cp = cplex.Cplex()
-    cp.parameters.threads.set(1)
-
-    # OBJECTIVE FUNCTION
-    cp.objective.set_sense(cp.objective.sense.maximize)
-    names = []
-    for v1 in range(election_1.num_voters):
-        for v2 in range(election_2.num_voters):
-            names.append('N' + str(v1) + '_' + str(v2))
-    obj = [1.] * len(names)
-    types = [cp.variables.type.binary] * len(names)
-    cp.variables.add(obj=obj, names=names, types=types)
-
-    # FIRST CONSTRAINT FOR VOTERS
-    lin_expr = []
-    for v1 in range(election_1.num_voters):
-        val = [1.0] * election_2.num_voters
-        ind = []
-        for v2 in range(election_2.num_voters):
-            ind.append('N' + str(v1) + '_' + str(v2))
-        lin_expr.append(cplex.SparsePair(ind=ind, val=val))
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['L'] * election_1.num_voters,
-                              rhs=[1.0] * election_1.num_voters,
-                              names=['C1_' + str(i) for i in range(election_1.num_voters)])
-
-    # SECOND CONSTRAINT FOR VOTERS
-    lin_expr = []
-    for v2 in range(election_2.num_voters):
-        ind = []
-        for v1 in range(election_1.num_voters):
-            ind.append('N' + str(v1) + '_' + str(v2))
-        lin_expr.append(cplex.SparsePair(ind=ind, val=[1.0] * election_1.num_voters))
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['L'] * election_2.num_voters,
-                              rhs=[1.0] * election_2.num_voters,
-                              names=['C2_' + str(i) for i in range(election_2.num_voters)])
-
-    # ADD VARIABLES FOR CANDIDATES
-    names = []
-    for c1 in range(election_1.num_candidates):
-        for c2 in range(election_2.num_candidates):
-            names.append('M' + str(c1) + '_' + str(c2))
-    cp.variables.add(names=list(names),
-                     types=[cp.variables.type.binary] * election_1.num_candidates * election_2.num_candidates)
-
-    # FIRST CONSTRAINT FOR CANDIDATES
-    lin_expr = []
-    for c1 in range(election_1.num_candidates):
-        ind = []
-        for c2 in range(election_2.num_candidates):
-            ind.append('M' + str(c1) + '_' + str(c2))
-        lin_expr.append(cplex.SparsePair(ind=ind, val=[1.0] * election_2.num_candidates))
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['E'] * election_1.num_candidates,
-                              rhs=[1.0] * election_1.num_candidates,
-                              names=['C3_' + str(i) for i in range(election_1.num_candidates)])
-
-    # SECOND CONSTRAINT FOR CANDIDATES
-    lin_expr = []
-    for c2 in range(election_2.num_candidates):
-        ind = []
-        for c1 in range(election_1.num_candidates):
-            ind.append('M' + str(c1) + '_' + str(c2))
-        lin_expr.append(cplex.SparsePair(ind=ind, val=[1.0] * election_1.num_candidates))
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['E'] * election_2.num_candidates,
-                              rhs=[1.0] * election_2.num_candidates,
-                              names=['C4_' + str(i) for i in range(election_2.num_candidates)])
+    n_1, n_2 = election_1.num_voters, election_2.num_voters
+    m_1, m_2 = election_1.num_candidates, election_2.num_candidates
+    program = LinearProgram(sense='maximize')
 
-    # MAIN CONSTRAINT FOR VOTES
-    lin_expr = []
-    for v1 in range(election_1.num_voters):
-        for v2 in range(election_2.num_voters):
-            ind = []
-            val = []
-            for c1 in range(election_1.num_candidates):
-                for c2 in range(election_2.num_candidates):
-                    ind.append('M' + str(c1) + '_' + str(c2))
-                    if abs(election_1.potes[v1][c1] - election_2.potes[v2][c2]) <= int(metric_name):
-                        val.append(1.)
-                    else:
-                        val.append(0.)
-            ind.append('N' + str(v1) + '_' + str(v2))
-            val.append(-election_1.num_candidates)
-            lin_expr.append(cplex.SparsePair(ind=ind, val=val))
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['G'] * election_1.num_voters * election_2.num_voters,
-                              rhs=[0.0] * election_1.num_voters * election_2.num_voters,
-                              names=['C5_' + str(i) for i in
-                                     range(election_1.num_voters * election_2.num_voters)])
-
-    # cp.write('new.lp')
+    N = program.add_variables((n_1, n_2), obj=1., binary=True)
+    program.add_constraints(N, ub=1.)
+    program.add_constraints(N.T, ub=1.)
 
-    # SOLVE THE ILP
-    cp.set_results_stream(None)
-    try:
-        cp.solve()
-    except:  # cplex.CplexSolverError:
-        print("Exception raised while solving")
-        return
+    M = program.add_variables((m_1, m_2), binary=True)
+    program.add_constraints(M, lb=1., ub=1.)
+    program.add_constraints(M.T, lb=1., ub=1.)
 
-    return cp.solution.get_objective_value()
+    # MAIN CONSTRAINT FOR VOTES
+    potes_1 = np.asarray(election_1.potes)
+    potes_2 = np.asarray(election_2.potes)
+    close = np.abs(potes_1[:, np.newaxis, :, np.newaxis] -
+                   potes_2[np.newaxis, :, np.newaxis, :]) <= int(metric_name)
+    variables = np.hstack([np.broadcast_to(M.ravel(), (n_1 * n_2, m_1 * m_2)),
+                           N.reshape(-1, 1)])
+    coefficients = np.hstack([close.reshape(n_1 * n_2, m_1 * m_2),
+                              np.full((n_1 * n_2, 1), -m_1)])
+    program.add_constraints(variables, coefficients, lb=0.)
+
+    objective_value, _ = program.solve(solver)
+    return objective_value
 
 
-def solve_lp_candidate_subelections(lp_file_name, election_1, election_2):
+def solve_lp_candidate_subelections(election_1, election_2, solver=None):
     """ LP solver for candidate subelection problem """
 
-    # PRECOMPUTING
-    # """
-
-    P = np.zeros([election_1.num_voters, election_2.num_voters, election_1.num_candidates,
-                  election_2.num_candidates,
-                  election_1.num_candidates, election_2.num_candidates])
-
-    for v in range(election_1.num_voters):
-        for u in range(election_2.num_voters):
-            for c1 in range(election_1.num_candidates):
-                for d1 in range(election_2.num_candidates):
-                    for c2 in range(election_1.num_candidates):
-                        for d2 in range(election_2.num_candidates):
-                            if (election_1.potes[v][c1] > election_1.potes[v][c2] and
-                                election_2.potes[u][d1] >
-                                election_2.potes[u][d2]) or \
-                                    (election_1.potes[v][c1] < election_1.potes[v][c2] and
-                                     election_2.potes[u][d1] <
-                                     election_2.potes[u][d2]):
-                                P[v][u][c1][d1][c2][d2] = 1
-
-    # print(P)
-    # """
-
-    # CREATE LP FILE
-    lp_file = open(lp_file_name, 'w')
-    lp_file.write("Maximize\nobj: ")
-
-    first = True
-    for c in range(election_1.num_candidates):
-        for d in range(election_2.num_candidates):
-            if not first:
-                lp_file.write(" + ")
-            first = False
-            lp_file.write(" M_" + str(c) + "_" + str(d))
-
-    lp_file.write("\n")
-
-    """
-    first = True
-    for v in range(election_1.num_voters):
-        for u in range(election_2.num_voters):
-            for c1 in range(election_1.num_candidates):
-                for d1 in range(election_2.num_candidates):
-                    for c2 in range(election_1.num_candidates):
-                        if c1 == c2:
-                            continue
-                        for d2 in range(election_2.num_candidates):
-                            if d1 == d2:
-                                continue
-
-                            if P[v][u][c1][d1][c2][d2] == 1:
-                                if not first:
-                                    lp_file.write(" + ")
-                                first = False
-                                lp_file.write(" P_" + str(v) + "_" + str(u) + "_" +
-                                              str(c1) + "_" + str(d1) + "_" + str(c2) + "_" + str(d2))
-    lp_file.write("\n")
-    """
-
-    lp_file.write("Subject To\n")
-    ctr_c = 0
-
-    # FIRST CONSTRAINT FOR VOTERS
-    for v in range(election_1.num_voters):
-        lp_file.write("c" + str(ctr_c) + ":")
-        first = True
-        for u in range(election_2.num_voters):
-            if not first:
-                lp_file.write(" +")
-            first = False
-            lp_file.write(" N_" + str(v) + "_" + str(u))
-        lp_file.write(" = 1" + "\n")
-        ctr_c += 1
-
-    # SECOND CONSTRAINT FOR VOTERS
-    for u in range(election_2.num_voters):
-        lp_file.write("c" + str(ctr_c) + ":")
-        first = True
-        for v in range(election_1.num_voters):
-            if not first:
-                lp_file.write(" +")
-            first = False
-            lp_file.write(" N_" + str(v) + "_" + str(u))
-        lp_file.write(" = 1" + "\n")
-        ctr_c += 1
-
-    # FIRST CONSTRAINT FOR CANDIDATES
-    for c in range(election_1.num_candidates):
-        lp_file.write("c" + str(ctr_c) + ":")
-        first = True
-        for d in range(election_2.num_candidates):
-            if not first:
-                lp_file.write(" +")
-            first = False
-            lp_file.write(" M_" + str(c) + "_" + str(d))
-        lp_file.write(" <= 1" + "\n")
-        ctr_c += 1
-
-    # SECOND CONSTRAINT FOR CANDIDATES
-    for d in range(election_2.num_candidates):
-        lp_file.write("c" + str(ctr_c) + ":")
-        first = True
-        for c in range(election_1.num_candidates):
-            if not first:
-                lp_file.write(" +")
-            first = False
-            lp_file.write(" M_" + str(c) + "_" + str(d))
-        lp_file.write(" <= 1" + "\n")
-        ctr_c += 1
-
-    # FIRST CONSTRAINT FOR P
-    for v in range(election_1.num_voters):
-        for u in range(election_2.num_voters):
-            for c1 in range(election_1.num_candidates):
-                for d1 in range(election_2.num_candidates):
-                    for c2 in range(election_1.num_candidates):
-                        if c1 == c2:
-                            continue
-                        for d2 in range(election_2.num_candidates):
-                            if d1 == d2:
-                                continue
-
-                            # if P[v][u][c1][d1][c2][d2] == 1:
-                            lp_file.write("c" + str(ctr_c) + ":")
-                            lp_file.write(" P_" + str(v) + "_" + str(u) + "_" +
-                                          str(c1) + "_" + str(d1) + "_" + str(c2) + "_" + str(d2))
-
-                            lp_file.write(" - 0.34 N_" + str(v) + "_" + str(u))
-                            lp_file.write(" - 0.34 M_" + str(c1) + "_" + str(d1))
-                            lp_file.write(" - 0.34 M_" + str(c2) + "_" + str(d2))
-
-                            lp_file.write(" <= 0" + "\n")
-                            ctr_c += 1
-
-    # SECOND CONSTRAINT FOR P
-    for v in range(election_1.num_voters):
-        for u in range(election_2.num_voters):
-            for c1 in range(election_1.num_candidates):
-                for d1 in range(election_2.num_candidates):
-                    for c2 in range(election_1.num_candidates):
-                        if c1 == c2:
-                            continue
-                        for d2 in range(election_2.num_candidates):
-                            if d1 == d2:
-                                continue
-
-                            # if P[v][u][c1][d1][c2][d2] == 1:
-                            lp_file.write("c" + str(ctr_c) + ":")
-                            lp_file.write(" P_" + str(v) + "_" + str(u) + "_" +
-                                          str(c1) + "_" + str(d1) + "_" + str(c2) + "_" + str(d2))
-                            # lp_file.write(" + 1")
-                            lp_file.write(" - 0.34 N_" + str(v) + "_" + str(u))
-                            lp_file.write(" - 0.34 M_" + str(c1) + "_" + str(d1))
-                            lp_file.write(" - 0.34 M_" + str(c2) + "_" + str(d2))
-
-                            lp_file.write(" > -1" + "\n")
-                            ctr_c += 1
-
-    # THIRD CONSTRAINT FOR P
-    for v in range(election_1.num_voters):
-        for u in range(election_2.num_voters):
-            for c1 in range(election_1.num_candidates):
-                for d1 in range(election_2.num_candidates):
-                    for c2 in range(election_1.num_candidates):
-                        if c1 == c2:
-                            continue
-                        for d2 in range(election_2.num_candidates):
-                            if d1 == d2:
-                                continue
-
-                            # if P[v][u][c1][d1][c2][d2] == 1:
-                            lp_file.write("c" + str(ctr_c) + ":")
-                            lp_file.write(" P_" + str(v) + "_" + str(u) + "_" +
-                                          str(c1) + "_" + str(d1) + "_" + str(c2) + "_" + str(d2))
-
-                            lp_file.write(" <= " + str(P[v][u][c1][d1][c2][d2]) + "\n")
-                            ctr_c += 1
-
-    """
-    # NEW 1
-    for c1 in range(election_1.num_candidates):
-        for d1 in range(election_2.num_candidates):
-            lp_file.write("c" + str(ctr_c) + ":")
-            first = True
-            for v in range(election_1.num_voters):
-                for u in range(election_2.num_voters):
-                    for c2 in range(election_1.num_candidates):
-                        if c1 == c2:
-                            continue
-                        for d2 in range(election_2.num_candidates):
-                            if d1 == d2:
-                                continue
-
-                            if P[v][u][c1][d1][c2][d2] == 1:
-                                if not first:
-                                    lp_file.write(" +")
-                                first = False
-                                lp_file.write(" P_" + str(v) + "_" + str(u) + "_" +
-                                              str(c1) + "_" + str(d1) + "_" + str(c2) + "_" + str(d2))
-            lp_file.write(' - ' + str((magic_param-1)*election_1.num_voters) + ' M_' + str(c1) + '_' + str(d1) + ' = 0' + "\n")
-            ctr_c += 1
-
-    # NEW 2
-    for v in range(election_1.num_voters):
-        for u in range(election_2.num_voters):
-            lp_file.write("c" + str(ctr_c) + ":")
-            first = True
-            for c1 in range(election_1.num_candidates):
-                for d1 in range(election_2.num_candidates):
-                    for c2 in range(election_1.num_candidates):
-                        if c1 == c2:
-                            continue
-                        for d2 in range(election_2.num_candidates):
-                            if d1 == d2:
-                                continue
-
-                            if P[v][u][c1][d1][c2][d2] == 1:
-                                if not first:
-                                    lp_file.write(" +")
-                                first = False
-                                lp_file.write(" P_" + str(v) + "_" + str(u) + "_" +
-                                              str(c1) + "_" + str(d1) + "_" + str(c2) + "_" + str(d2))
-            lp_file.write(' - ' + str((magic_param-1)*2) + ' N_' + str(v) + '_' + str(u) + ' = 0' + "\n")
-            ctr_c += 1
-    """
-
-    lp_file.write("Binary\n")
-
-    for v in range(election_1.num_voters):
-        for u in range(election_2.num_voters):
-            for c1 in range(election_1.num_candidates):
-                for d1 in range(election_2.num_candidates):
-                    for c2 in range(election_1.num_candidates):
-                        if c1 == c2:
-                            continue
-                        for d2 in range(election_2.num_candidates):
-                            if d1 == d2:
-                                continue
-
-                            # if P[v][u][c1][d1][c2][d2] == 1:
-                            lp_file.write("P_" + str(v) + "_" + str(u) + "_" +
-                                          str(c1) + "_" + str(d1) + "_" + str(c2) + "_" + str(
-                                d2) + "\n")
-
-    for v in range(election_1.num_voters):
-        for u in range(election_2.num_voters):
-            lp_file.write("N_" + str(v) + "_" + str(u) + "\n")
-
-    for c in range(election_1.num_candidates):
-        for d in range(election_2.num_candidates):
-            lp_file.write("M_" + str(c) + "_" + str(d) + "\n")
+    n_1, n_2 = election_1.num_voters, election_2.num_voters
+    m_1, m_2 = election_1.num_candidates, election_2.num_candidates
 
-    lp_file.write("End\n")
-
-    lp_file.close()
-
-    ### SECOND PART
-    cp_lp = cplex.Cplex(lp_file_name)
-    cp_lp.parameters.threads.set(1)
-    cp_lp.set_results_stream(None)
-
-    try:
-        cp_lp.solve()
-    except:  # cplex.CplexSolverError:
-        print("Exception raised during solve")
-        return
-
-    ##########################
-    ##########################
-
-    result = np.zeros([election_1.num_candidates, election_1.num_candidates])
-    for i in range(election_1.num_candidates):
-        for j in range(election_1.num_candidates):
-            name = 'M_' + str(i) + '_' + str(j)
-            result[i][j] = cp_lp.solution.get_values(name)
-
-    # print('M', result)
-    """
-    result_2 = np.zeros([election_1.num_voters, election_1.num_voters])
-    for i in range(election_1.num_voters):
-        for j in range(election_1.num_voters):
-            election_id = 'N_' + str(i) + '_' + str(j)
-            result_2[i][j] = cp_lp.solution.get_values(election_id)
-
-    print('N', result_2)
-    total = 0
-    for v in range(election_1.num_voters):
-        for u in range(election_1.num_voters):
-            for c1 in range(election_1.num_candidates):
-                for d1 in range(election_1.num_candidates):
-                    for c2 in range(election_1.num_candidates):
-                        if c1 == c2:
-                            continue
-                        for d2 in range(election_1.num_candidates):
-                            if d1 == d2:
-                                continue
-
-                            #if P[v][u][c1][d1][c2][d2] == 1:
-                            election_id = "P_" + str(v) + "_" + str(u) + "_" + str(c1) + "_" + str(d1) + "_" + str(c2) + "_" + str(d2)
-                            value = cp_lp.solution.get_values(election_id)
-                            #print(value)
-                            if value == 1:
-                                print(election_id)
-                            total += value
-    print(total)
-    """
-    ##########################
-    ##########################
-
-    # objective_value = cp_lp.solution.get_objective_value()
-    # print('O-V: ', objective_value)
-    # print(sum(sum(result)))
-    return sum(sum(result))
+    # PRECOMPUTING
+    # P[v][u][c1][d1][c2][d2] = 1 iff v and u order the pairs (c1, c2) and (d1, d2) alike
+    potes_1 = np.asarray(election_1.potes)
+    potes_2 = np.asarray(election_2.potes)
+    signs_1 = np.sign(potes_1[:, :, np.newaxis] - potes_1[:, np.newaxis, :])
+    signs_2 = np.sign(potes_2[:, :, np.newaxis] - potes_2[:, np.newaxis, :])
+    P = signs_1[:, np.newaxis, :, np.newaxis, :, np.newaxis] * \
+        signs_2[np.newaxis, :, np.newaxis, :, np.newaxis, :] > 0
+
+    program = LinearProgram(sense='maximize')
+    M = program.add_variables((m_1, m_2), obj=1., binary=True)
+    N = program.add_variables((n_1, n_2), binary=True)
+
+    # CONSTRAINTS FOR VOTERS
+    program.add_constraints(N, lb=1., ub=1.)
+    program.add_constraints(N.T, lb=1., ub=1.)
+
+    # CONSTRAINTS FOR CANDIDATES
+    program.add_constraints(M, ub=1.)
+    program.add_constraints(M.T, ub=1.)
+
+    # CONSTRAINTS FOR P (only for c1 != c2 and d1 != d2)
+    v, u, c1, d1, c2, d2 = np.nonzero(
+        np.broadcast_to((np.arange(m_1)[:, np.newaxis, np.newaxis, np.newaxis] !=
+                         np.arange(m_1)[np.newaxis, np.newaxis, :, np.newaxis]) &
+                        (np.arange(m_2)[np.newaxis, :, np.newaxis, np.newaxis] !=
+                         np.arange(m_2)[np.newaxis, np.newaxis, np.newaxis, :]),
+                        (n_1, n_2, m_1, m_2, m_1, m_2)))
+    P_vars = program.add_variables(len(v), ub=P[v, u, c1, d1, c2, d2].astype(float),
+                                   binary=True)
+    variables = np.stack([P_vars, N[v, u], M[c1, d1], M[c2, d2]], axis=1)
+    coefficients = np.array([1., -0.34, -0.34, -0.34])
+    program.add_constraints(variables, coefficients, ub=0.)
+    program.add_constraints(variables, coefficients, lb=-1.)
+
+    objective_value, _ = program.solve(solver)
+    return objective_value
 
 
 # FOR METRICS
-def solve_lp_matching_vector_with_lp(cost_table, length):
+def solve_lp_matching_vector_with_lp(cost_table, length, solver=None):
     """ LP solver for vectors' matching """
 
-    # print(cost_table)
-    cp = cplex.Cplex()
-    cp.parameters.threads.set(1)
-
-    # OBJECTIVE FUNCTION
-    cp.objective.set_sense(cp.objective.sense.minimize)
-    objective = []
-    names = []
-    pos = 0
-    for i in range(length):
-        for j in range(length):
-            names.append('x' + str(pos))
-            objective.append(cost_table[i][j])
-            pos += 1
-    cp.variables.add(obj=objective, names=names, types=[cp.variables.type.binary] * length ** 2)
-
-    # FIRST GROUP OF CONSTRAINTS
-    lin_expr = []
-    for i in range(length):
-        ind = []
-        for j in range(length):
-            pos = i * length + j
-            ind.append('x' + str(pos))
-        lin_expr.append(cplex.SparsePair(ind=ind, val=[1.0] * length))
-    cp.linear_constraints.add(lin_expr=lin_expr, senses=['E'] * length, rhs=[1.0] * length)
-
-    # SECOND GROUP OF CONSTRAINTS
-    lin_expr = []
-    for j in range(length):
-        ind = []
-        for i in range(length):
-            pos = i * length + j
-            ind.append('x' + str(pos))
-        lin_expr.append(cplex.SparsePair(ind=ind, val=[1.0] * length))
-    cp.linear_constraints.add(lin_expr=lin_expr, senses=['E'] * length, rhs=[1.0] * length)
-
-    # c.write('new.lp')
-
-    # SOLVE THE ILP
-    cp.set_results_stream(None)
-    try:
-        cp.solve()
-    except:  # cplex.CplexSolverError:
-        print("Exception raised while solving")
-        return
+    program = LinearProgram()
+    x = program.add_variables((length, length), obj=np.asarray(cost_table)[:length, :length],
+                              binary=True)
+    program.add_constraints(x, lb=1., ub=1.)
+    program.add_constraints(x.T, lb=1., ub=1.)
 
-    objective_value = cp.solution.get_objective_value()
+    objective_value, _ = program.solve(solver)
     return objective_value
 
 
-def solve_lp_matching_interval(cost_table, length_1, length_2):
+def solve_lp_matching_interval(cost_table, length_1, length_2, solver=None):
     precision = length_1 * length_2
-    # print(cost_table)
-
-    c = cplex.Cplex()
-    c.parameters.threads.set(1)
-
-    # OBJECTIVE FUNCTION
-    c.objective.set_sense(c.objective.sense.minimize)
-    c.objective.set_name("Obj")
-    objective = []
-    names = []
-    pos = 0
-    for i in range(length_1):
-        for j in range(length_2):
-            names.append('x' + str(pos))
-            objective.append(cost_table[i][j])
-            pos += 1
-    c.variables.add(obj=objective,
-                    names=names,
-                    types=[c.variables.type.integer] * precision)
-
-    # FIRST GROUP OF CONSTRAINTS
-    lin_expr = []
-    c_names = []
-    for i in range(length_1):
-        ind = []
-        for j in range(length_2):
-            pos = i * length_2 + j
-            ind.append('x' + str(pos))
-        lin_expr.append(cplex.SparsePair(ind=ind, val=[1.0] * length_2))
-        c_names.append('c1_' + str(i))
-    c.linear_constraints.add(lin_expr=lin_expr,
-                             senses=['E'] * length_1,
-                             rhs=[length_2] * length_1,
-                             names=c_names)
 
-    # SECOND GROUP OF CONSTRAINTS
-    lin_expr = []
-    c_names = []
-    for j in range(length_2):
-        ind = []
-        for i in range(length_1):
-            pos = i * length_2 + j
-            ind.append('x' + str(pos))
-        lin_expr.append(cplex.SparsePair(ind=ind, val=[1.0] * length_1))
-        c_names.append('c2_' + str(j))
-    c.linear_constraints.add(lin_expr=lin_expr,
-                             senses=['E'] * length_2,
-                             rhs=[length_1] * length_2,
-                             names=c_names)
-
-    c.write('interval.lp')
-    c.write('interval.mps')
+    program = LinearProgram()
+    x = program.add_variables((length_1, length_2),
+                              obj=np.asarray(cost_table)[:length_1, :length_2], integer=True)
+    program.add_constraints(x, lb=length_2, ub=length_2)
+    program.add_constraints(x.T, lb=length_1, ub=length_1)
 
-    # SOLVE THE ILP
-    c.set_results_stream(None)
-    try:
-        c.solve()
-    except:  # cplex.CplexSolverError:
-        print("Exception raised while solving")
+    objective_value, _ = program.solve(solver)
+    if objective_value is None:
         return
-
-    result = c.solution.get_objective_value() / precision
-
-    return result
+    return objective_value / precision
 
 
 # DODGSON SCORE
-def solve_lp_file_dodgson_score(election, N=None, e=None, D=None):
+def solve_lp_file_dodgson_score(election, N=None, e=None, D=None, solver=None):
 
-    cp = cplex.Cplex()
-    # cp.parameters.threads.set(1)
+    num_groups, num_steps = len(N), len(D)
+    e = np.asarray(e, dtype=float)
 
-    # OBJECTIVE FUNCTION
-    cp.objective.set_sense(cp.objective.sense.minimize)
-
-    names = []
-    obj = []
-    for i in range(len(N)):
-        for j in range(1, len(D)):
-            names.append("y" + str(i) + "_" + str(j))
-            obj.append(j)
-    types = [cp.variables.type.integer] * len(names)
-    cp.variables.add(obj=obj, names=names, types=types)
-
-    # ADD MISSING VARIABLES
-    names = []
-    for i in range(len(N)):
-        names.append("y" + str(i) + "_" + str(0))
-    cp.variables.add(names=list(names),
-                     types=[cp.variables.type.integer] * len(names))
+    program = LinearProgram()
+    y = program.add_variables((num_groups, num_steps), integer=True,
+                              obj=np.tile(np.arange(num_steps, dtype=float), (num_groups, 1)))
 
     # FIRST GROUP OF CONSTRAINTS
-    lin_expr = []
-    rhs = []
-    for i in range(len(N)):
-        ind = ["y" + str(i) + "_" + str(0)]
-        val = [1.]
-        lin_expr.append(cplex.SparsePair(ind=ind, val=val))
-        rhs.append(N[i])
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['E'] * len(rhs),
-                              rhs=rhs,
-                              names=['C1_' + str(i) for i in range(len(rhs))])
+    program.add_constraints(y[:, [0]], lb=N, ub=N)
 
     # SECOND GROUP OF CONSTRAINTS
-    lin_expr = []
-    rhs = []
-    for k in range(len(D)):
-
-        # if election.election_id == 'Impartial Culture_2' and k==0:
-        #     continue
-
-        val = []
-        ind = []
-        for i in range(len(N)):
-            for j in range(1, len(D)):
-                ind.append("y" + str(i) + "_" + str(j))
-                value = e[i][j][k] - e[i][j - 1][k]
-                val.append(value)
-        lin_expr.append(cplex.SparsePair(ind=ind, val=val))
-        rhs.append(D[k])
-
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['G'] * len(rhs),
-                              rhs=rhs,
-                              names=['C2_' + str(i) for i in range(len(rhs))])
+    coefficients = (e[:, 1:, :] - e[:, :-1, :]).transpose(2, 0, 1).reshape(num_steps, -1)
+    program.add_constraints(np.broadcast_to(y[:, 1:].ravel(), coefficients.shape),
+                            coefficients, lb=D)
 
     # THIRD GROUP OF CONSTRAINTS
-    lin_expr = []
-    rhs = []
-    for i in range(len(N)):
-        for j in range(1, len(D)):
-            ind = []
-            val = []
-            ind.append("y" + str(i) + "_" + str(j - 1))
-            ind.append("y" + str(i) + "_" + str(j))
-            val.append(1.)
-            val.append(-1.)
-            lin_expr.append(cplex.SparsePair(ind=ind, val=val))
-            rhs.append(0.)
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['G'] * len(rhs),
-                              rhs=rhs,
-                              names=['C3_' + str(i) for i in range(len(rhs))])
-    # cp.write("tmp.lp")
-    #
-    # cp.read("tmp.lp")
+    program.add_constraints(np.stack([y[:, :-1].ravel(), y[:, 1:].ravel()], axis=1),
+                            [1., -1.], lb=0.)
 
-    # SOLVE THE ILP
-    cp.parameters.threads.set(1)
-    cp.set_results_stream(None)
-    try:
-        cp.solve()
-    except:  # cplex.CplexSolverError:
-        print("Exception raised while solving")
-        return
-
-    # for x in cp.solution.get_values():
-    #     if x <0 or x > 1:
-    #         print(x)
-
-    return cp.solution.get_objective_value()
+    objective_value, _ = program.solve(solver)
+    return objective_value
 
 
 def generate_lp_file_dodgson_score_old(lp_file_name, N=None, e=None, D=None):
@@ -845,6 +266,8 @@ def generate_lp_file_dodgson_score_old(lp_file_name, N=None, e=None, D=None):
 def solve_lp_dodgson_score(lp_file_name):
     """ this function ..."""
 
+    if cplex is None:
+        raise ImportError('Solving .lp files requires cplex (see solve_lp_file_dodgson_score)')
     cp_lp = cplex.Cplex(lp_file_name)
     cp_lp.parameters.threads.set(1)
     cp_lp.set_results_stream(None)
@@ -869,178 +292,59 @@ def solve_lp_dodgson_score(lp_file_name):
 
 
 # FOR WINNERS - updated
-def solve_lp_borda_owa(params, votes, owa):
+def solve_lp_borda_owa(params, votes, owa, solver=None):
+    """ Return: winners, time """
+    return _solve_lp_owa(params, votes, np.asarray(owa, dtype=float)[:, np.newaxis],
+                         solver=solver)
+
+
+# FOR WINNERS - updated
+def solve_lp_bloc_owa(params, votes, owa, t_bloc, solver=None):
+    """ Return: winners, time (only the t_bloc-th position counts) """
+    weights = np.zeros([params['orders'], params['candidates']])
+    weights[:, t_bloc - 1] = np.asarray(owa, dtype=float)[:params['orders']]
+    return _solve_lp_owa(params, votes, weights, solver=solver)
+
+
+def _solve_lp_owa(params, votes, weights, solver=None):
+    """ weights[j][k] -- value of the j-th order of a voter at position k """
 
     num_voters = params['voters']
     num_candidates = params['candidates']
     num_orders = params['orders']
 
-    cp = cplex.Cplex()
-    cp.parameters.threads.set(1)
-
-    # OBJECTIVE FUNCTION
-    cp.objective.set_sense(cp.objective.sense.maximize)
-    objective = []
-    names = []
-    pos = 0
-    for i in range(num_voters):
-        for j in range(num_orders):
-            for k in range(num_candidates):
-                names.append(f'x{pos}')
-                objective.append(owa[j])
-                pos += 1
-    cp.variables.add(obj=objective, names=names,
-                     types=[cp.variables.type.binary] * num_voters * num_orders * num_candidates)
-
-    # ADD VARIABLES FOR CANDIDATES
-    names = [f'y{i}' for i in range(num_candidates)]
-    cp.variables.add(names=list(names),
-                     types=[cp.variables.type.binary] * num_candidates)
+    program = LinearProgram(sense='maximize')
+    # x[i][j][k] -- the j-th committee member of voter i is in the top k + 1 positions
+    x = program.add_variables((num_voters, num_orders, num_candidates),
+                              obj=np.broadcast_to(weights, (num_voters, num_orders,
+                                                            num_candidates)), binary=True)
+    y = program.add_variables(num_candidates, binary=True)
 
     # FIRST GROUP OF CONSTRAINTS
-    lin_expr = []
-    ind = [f'y{i}' for i in range(num_candidates)]
-    val = [1.] * num_candidates
-    lin_expr.append(cplex.SparsePair(ind=ind, val=val))
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['E'],
-                              rhs=[num_orders])
+    program.add_constraints(y, lb=num_orders, ub=num_orders)
 
     # SECOND GROUP OF CONSTRAINTS
-    lin_expr = []
-    for i in range(num_voters):
-        for j in range(num_candidates):
-            ind = []
-            val = []
-            pos = i * num_orders * num_candidates + j
-            for k in range(num_orders):
-                ind.append(f'x{pos + num_candidates * k}')
-                val.append(1.)
-            for k in range(0, j + 1):
-                ind.append(f'y{int(votes[i][k])}')
-                val.append(-1.)
-            lin_expr.append(cplex.SparsePair(ind=ind, val=val))
-    cp.linear_constraints.add(lin_expr=lin_expr,
-                              senses=['L'] * num_voters * num_candidates,
-                              rhs=[0.0] * num_voters * num_candidates)
+    votes = np.asarray(votes, dtype=int)[:num_voters, :num_candidates]
+    prefix = np.tril(np.ones([num_candidates, num_candidates]))
+    variables = np.concatenate([x.transpose(0, 2, 1),
+                                np.broadcast_to(y[votes][:, np.newaxis, :],
+                                                (num_voters, num_candidates, num_candidates))],
+                               axis=2).reshape(num_voters * num_candidates, -1)
+    coefficients = np.hstack([np.ones([num_candidates, num_orders]), -prefix])
+    program.add_constraints(variables, np.tile(coefficients, (num_voters, 1)), ub=0.)
 
     # SOLVE THE ILP
-    cp.set_results_stream(None)
-    start = cp.get_time()
-    try:
-        cp.solve()
-    except cplex.CplexSolverError:
-        print("Exception raised during solve")
+    start = time()
+    objective_value, values = program.solve(solver)
+    if objective_value is None:
         return
-    stop = cp.get_time()
+    stop = time()
 
     # EXTRACT WINNERS
-    result = [0.] * num_candidates
-    for i in range(num_candidates):
-        result[i] = cp.solution.get_values(f'y{i}')
-    winner_id = 0
-    winners = [0.] * num_orders
-    for i in range(num_candidates):
-        if math.isclose(result[i], 1.):
-            winners[winner_id] = i
-            winner_id += 1
-    winners = sorted(winners)
-
-    return winners, stop-start
-
-
-# FOR WINNERS - needs update
-def solve_lp_bloc_owa(params, votes, owa, t_bloc):
-    """ this function generates lp file"""
-
+    winners = sorted(np.flatnonzero(np.isclose(values[y], 1.)).tolist())[:num_orders]
+    winners += [0] * (num_orders - len(winners))
 
-    rand_name = str(np.random.random())
-    lp_file_name = str(rand_name + ".lp")
-
-    lp_file = open(lp_file_name, 'w')
-    lp_file.write("Maximize\nobj: ")
-    pos = 0
-    first = True
-    for i in range(params['voters']):
-        for j in range(params['orders']):
-            for k in range(params['candidates']):
-
-                if not first:
-                    if k == t_bloc - 1:
-                        lp_file.write(" + ")
-                first = False
-                if k == t_bloc - 1:
-                    lp_file.write(str(owa[j]) + " x" + str(pos))
-                pos += 1
-    lp_file.write("\n")
-
-    lp_file.write("Subject To\n")
-    lp_file.write("c0:")
-    first = True
-    for i in range(params['candidates']):
-        if not first:
-            lp_file.write(" +")
-        first = False
-        lp_file.write(" y" + str(i))
-    lp_file.write(' = ' + str(params['orders']) + '\n')
-
-    for i in range(params['voters']):
-        for j in range(params['candidates']):
-            lp_file.write("c" + str(i * params['candidates'] + j + 1) + ": ")
-            pos = i * params['orders'] * params['candidates'] + j
-            first = True
-            for k in range(params['orders']):
-                if not first:
-                    lp_file.write(" +")
-                first = False
-                lp_file.write(" x" + str(pos + params['candidates'] * k))
-
-            for k in range(0, j + 1):
-                lp_file.write(" - y" + str(int(votes[i][k])))
-
-            lp_file.write(" <= 0 \n")
-
-    lp_file.write("Binary\n")
-    for i in range(params['voters'] * params['orders'] * params['candidates']):
-        lp_file.write("x" + str(i) + "\n")
-    for i in range(params['candidates']):
-        lp_file.write("y" + str(i) + "\n")
-
-    lp_file.write("End\n")
-    lp_file.close()
-
-
-    cp_lp = cplex.Cplex(lp_file_name)
-    cp_lp.parameters.threads.set(1)
-    cp_lp.set_results_stream(None)
-
-    start = cp_lp.get_time()
-    try:
-        cp_lp.solve()
-    except cplex.CplexSolverError:
-        print("Exception raised during solve")
-        return
-    stop = cp_lp.get_time()
-
-    result = [0.] * params['candidates']
-    for i in range(params['candidates']):
-        result[i] = cp_lp.solution.get_values('y' + str(i))
-    # print(result)
-
-    params['pure'] = True
-
-    winner_id = 0
-    winners = [0.] * params['orders']
-    for i in range(params['candidates']):
-        if math.isclose(result[i], 1.):
-            if params['pure']:
-                winners[winner_id] = i
-            winner_id += 1
-    winners = sorted(winners)
-
-    os.remove(lp_file_name)
-
-    return winners, stop-start
+    return sorted(winners), stop-start
 
 
 """
@@ -1155,285 +459,100 @@ def generate_lp_file_matching_matrix_half(lp_file_name, matrix_1, matrix_2, leng
 """
 
 
-def generate_lp_file_matching_matrix(lp_file_name, matrix_1, matrix_2, length, inner_distance):
+def solve_lp_matching_matrices(matrix_1, matrix_2, length, inner_distance, solver=None):
+    """ ILP solver for matrices' matching """
 
-    with open(lp_file_name, 'w') as lp_file:
-        lp_file.write("Minimize\n")
+    program = LinearProgram()
 
-        first = True
-        for k in range(length):
-            for l in range(length):
-                for i in range(length):
-                    if i == k:
-                        continue
-                    for j in range(length):
-                        if j == l:
-                            continue
-
-                        if not first:
-                            lp_file.write(" + ")
-                        first = False
-                        weight = inner_distance(np.array([matrix_1[k][i]]), np.array([matrix_2[l][j]]))
-                        lp_file.write(
-                            str(weight) + " P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(
-                                j))
-        lp_file.write("\n")
-
-        lp_file.write("Subject To\n")
-
-        for k in range(length):
-            for l in range(length):
-                for i in range(length):
-                    if i == k:
-                        continue
-                    for j in range(length):
-                        if j == l:
-                            continue
-
-                        lp_file.write("P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(j))
-                        lp_file.write(" - " + "M" + "i" + str(i) + "j" + str(j) + " <= 0" + "\n")
-
-                        lp_file.write("P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(j))
-                        lp_file.write(" - " + "M" + "i" + str(k) + "j" + str(l) + " <= 0" + "\n")
-
-        for i in range(length):
-            first = True
-            for j in range(length):
-                if not first:
-                    lp_file.write(" + ")
-                first = False
-                lp_file.write("M" + "i" + str(i) + "j" + str(j))
-            lp_file.write(" = 1" + "\n")
-
-        for j in range(length):
-            first = True
-            for i in range(length):
-                if not first:
-                    lp_file.write(" + ")
-                first = False
-                lp_file.write("M" + "i" + str(i) + "j" + str(j))
-            lp_file.write(" = 1" + "\n")
-
-        # Not sure about this part #
-        for k in range(length):
-            for i in range(length):
-                if k == i:
-                    continue
-                first = True
-                for l in range(length):
-                    for j in range(length):
-                        if l == j:
-                            continue
-                        if not first:
-                            lp_file.write(" + ")
-                        first = False
-                        lp_file.write("P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(j))
-                lp_file.write(" = 1" + "\n")
-
-        # Not sure about this part #
-        for l in range(length):
-            for j in range(length):
-                if l == j:
-                    continue
-                first = True
-                for k in range(length):
-                    for i in range(length):
-                        if k == i:
-                            continue
-                        if not first:
-                            lp_file.write(" + ")
-                        first = False
-                        lp_file.write("P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(j))
-                lp_file.write(" = 1" + "\n")
-
-        lp_file.write("Binary\n")
+    # P[k][l][i][j] = 1 iff (k, i) is matched with (l, j), defined for i != k and j != l
+    different = ~np.eye(length, dtype=bool)
+    valid = different[:, np.newaxis, :, np.newaxis] & different[np.newaxis, :, np.newaxis, :]
+    k, l, i, j = np.nonzero(valid)
+    weights = get_inner_distance_table(np.asarray(matrix_1), np.asarray(matrix_2),
+                                       inner_distance)
+    P = np.full(valid.shape, -1)
+    P[valid] = program.add_variables(len(k), obj=weights[k, i, l, j], binary=True)
+    M = program.add_variables((length, length), binary=True)
 
-        for k in range(length):
-            for l in range(length):
-                for i in range(length):
-                    if i == k:
-                        continue
-                    for j in range(length):
-                        if j == l:
-                            continue
-                        lp_file.write(
-                            "P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(j) + "\n")
-
-        for i in range(length):
-            for j in range(length):
-                lp_file.write("M" + "i" + str(i) + "j" + str(j) + "\n")
+    program.add_constraints(np.stack([P[valid], M[i, j]], axis=1), [1., -1.], ub=0.)
+    program.add_constraints(np.stack([P[valid], M[k, l]], axis=1), [1., -1.], ub=0.)
 
-        lp_file.write("End\n")
-
-
-def solve_lp_matrix(lp_file_name):
-    cp_lp = cplex.Cplex(lp_file_name)
-    cp_lp.set_results_stream(None)
+    program.add_constraints(M, lb=1., ub=1.)
+    program.add_constraints(M.T, lb=1., ub=1.)
 
-    # cp_lp.parameters.threads.set(1)
-    # cp_lp.parameters.mip.tolerances.mipgap = 0.0001
-    # cp_lp.parameters.mip.strategy.probe.set(3)
+    # each entry (k, i) is matched with exactly one entry (l, j), and vice versa
+    by_first = P.transpose(0, 2, 1, 3).reshape(length ** 2, length ** 2)
+    by_first = by_first[different.ravel()][:, different.ravel()]
+    program.add_constraints(by_first, lb=1., ub=1.)
+    by_second = P.transpose(1, 3, 0, 2).reshape(length ** 2, length ** 2)
+    by_second = by_second[different.ravel()][:, different.ravel()]
+    program.add_constraints(by_second, lb=1., ub=1.)
 
-    try:
-        cp_lp.solve()
+    objective_value, _ = program.solve(solver)
+    return objective_value
 
-    except:
-        print("Exception raised during solve")
-        return
 
-    return cp_lp.solution.get_objective_value()
+def get_inner_distance_table(matrix_1: np.ndarray, matrix_2: np.ndarray,
+                             inner_distance) -> np.ndarray:
+    """ Return: table T, where T[k][i][l][j] = inner_distance([matrix_1[k][i]], [matrix_2[l][j]])
+    (computed once for each pair of distinct values) """
+    values_1, inverse_1 = np.unique(matrix_1, return_inverse=True)
+    values_2, inverse_2 = np.unique(matrix_2, return_inverse=True)
+    table = get_cost_matrix(values_1[:, np.newaxis], values_2[:, np.newaxis], inner_distance)
+    return table[inverse_1.reshape(-1, 1), inverse_2.reshape(1, -1)].reshape(
+        matrix_1.shape + matrix_2.shape)
 
 
-# SPEARMAN - old
+# SPEARMAN / HAMMING
+def solve_ilp_distance(votes_1, votes_2, params, metric_name, solver=None):
+    """ ILP solver for distances which match both voters and candidates """
 
-def generate_ilp_distance(lp_file_name, votes_1, votes_2, params, metric_name):
-    lp_file = open(lp_file_name, 'w')
-    lp_file.write("Minimize\n")  # obj: ")
-    #
-    # first = True
-    # for k in range(params['voters']):
-    #     for l in range(params['voters']):
-    #
-    #         vote_1 = votes_1[k]
-    #         vote_2 = votes_2[l]
-    #
-    #         if metric_name == 'spearman':
-    #             pote_1 = [0] * params['candidates']
-    #             pote_2 = [0] * params['candidates']
-    #
-    #             for i in range(params['candidates']):
-    #                 pote_1[vote_1[i]] = i
-    #                 pote_2[vote_2[i]] = i
-    #
-    #         for i in range(params['candidates']):
-    #             for j in range(params['candidates']):
-    #                 if not first:
-    #                     lp_file.write(" + ")
-    #                 first = False
-    #
-    #                 if metric_name == "spearman":
-    #                     weight = abs(pote_1[i] - pote_2[j])
-    #                 elif metric_name == "alt":
-    #                     weight = float(abs(pote_1[i] - pote_2[j]) ** (2)) / float(
-    #                         1. + min(pote_1[i], pote_2[j]))
-    #                 elif metric_name == 'hamming':
-    #                     weight = hamming(vote_1, vote_2)
-    #                 else:
-    #                     weight = 0
-    #
-    #                 lp_file.write(
-    #                     str(weight) + " P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(
-    #                         j))
-    # lp_file.write("\n")
-    #
-    # lp_file.write("Subject To\n")
-    #
-    # for k in range(params['voters']):
-    #     for l in range(params['voters']):
-    #         for i in range(params['candidates']):
-    #             for j in range(params['candidates']):
-    #                 lp_file.write("P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(j))
-    #                 lp_file.write(" - " + "M" + "i" + str(i) + "j" + str(j) + " <= 0" + "\n")
-    #
-    #                 lp_file.write("P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(j))
-    #                 lp_file.write(" - " + "N" + "k" + str(k) + "l" + str(l) + " <= 0" + "\n")
-    #
-    # for k in range(params['voters']):
-    #     first = True
-    #     for l in range(params['voters']):
-    #         if not first:
-    #             lp_file.write(" + ")
-    #         first = False
-    #         lp_file.write("N" + "k" + str(k) + "l" + str(l))
-    #     lp_file.write(" = 1" + "\n")
-    #
-    # for l in range(params['voters']):
-    #     first = True
-    #     for k in range(params['voters']):
-    #         if not first:
-    #             lp_file.write(" + ")
-    #         first = False
-    #         lp_file.write("N" + "k" + str(k) + "l" + str(l))
-    #     lp_file.write(" = 1" + "\n")
-    #
-    # for i in range(params['candidates']):
-    #     first = True
-    #     for j in range(params['candidates']):
-    #         if not first:
-    #             lp_file.write(" + ")
-    #         first = False
-    #         lp_file.write("M" + "i" + str(i) + "j" + str(j))
-    #     lp_file.write(" = 1" + "\n")
-    #
-    # for j in range(params['candidates']):
-    #     first = True
-    #     for i in range(params['candidates']):
-    #         if not first:
-    #             lp_file.write(" + ")
-    #         first = False
-    #         lp_file.write("M" + "i" + str(i) + "j" + str(j))
-    #     lp_file.write(" = 1" + "\n")
-    #
-    # # IMPORTANT #
-    # for k in range(params['voters']):
-    #     for i in range(params['candidates']):
-    #         first = True
-    #         for l in range(params['voters']):
-    #             for j in range(params['candidates']):
-    #                 if not first:
-    #                     lp_file.write(" + ")
-    #                 first = False
-    #                 lp_file.write("P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(j))
-    #         lp_file.write(" = 1" + "\n")
-    #
-    # # IMPORTANT #
-    # for l in range(params['voters']):
-    #     for j in range(params['candidates']):
-    #         first = True
-    #         for k in range(params['voters']):
-    #             for i in range(params['candidates']):
-    #                 if not first:
-    #                     lp_file.write(" + ")
-    #                 first = False
-    #                 lp_file.write("P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(j))
-    #         lp_file.write(" = 1" + "\n")
-    #
-    # lp_file.write("Binary\n")
-    #
-    # for k in range(params['voters']):
-    #     for l in range(params['voters']):
-    #         for i in range(params['candidates']):
-    #             for j in range(params['candidates']):
-    #                 lp_file.write(
-    #                     "P" + "k" + str(k) + "l" + str(l) + "i" + str(i) + "j" + str(j) + "\n")
-    #
-    # for k in range(params['voters']):
-    #     for l in range(params['voters']):
-    #         lp_file.write("N" + "k" + str(k) + "l" + str(l) + "\n")
-    #
-    # for i in range(params['candidates']):
-    #     for j in range(params['candidates']):
-    #         lp_file.write("M" + "i" + str(i) + "j" + str(j) + "\n")
+    num_voters = params['voters']
+    num_candidates = params['candidates']
 
-    lp_file.write("End\n")
+    # weights[k][l][i][j] - cost of matching candidate i of voter k with candidate j of voter l
+    if metric_name == 'spearman':
+        potes_1 = np.argsort(np.asarray(votes_1), axis=1)
+        potes_2 = np.argsort(np.asarray(votes_2), axis=1)
+        weights = np.abs(potes_1[:, np.newaxis, :, np.newaxis] -
+                         potes_2[np.newaxis, :, np.newaxis, :])
+    elif metric_name == 'alt':
+        potes_1 = np.argsort(np.asarray(votes_1), axis=1)[:, np.newaxis, :, np.newaxis]
+        potes_2 = np.argsort(np.asarray(votes_2), axis=1)[np.newaxis, :, np.newaxis, :]
+        weights = np.abs(potes_1 - potes_2) ** 2 / (1. + np.minimum(potes_1, potes_2))
+    elif metric_name == 'hamming':
+        approvals_1 = np.zeros((num_voters, num_candidates), dtype=bool)
+        approvals_2 = np.zeros((num_voters, num_candidates), dtype=bool)
+        for k in range(num_voters):
+            approvals_1[k, list(votes_1[k])] = True
+            approvals_2[k, list(votes_2[k])] = True
+        weights = approvals_1[:, np.newaxis, :, np.newaxis] != \
+            approvals_2[np.newaxis, :, np.newaxis, :]
+    else:
+        weights = np.zeros((num_voters, num_voters, num_candidates, num_candidates))
 
+    program = LinearProgram()
+    P = program.add_variables(weights.shape, obj=weights.astype(float), binary=True)
+    N = program.add_variables((num_voters, num_voters), binary=True)
+    M = program.add_variables((num_candidates, num_candidates), binary=True)
 
-def solve_ilp_distance(lp_file_name, votes_1, votes_2, params, metric_name):
-    cp_lp = cplex.Cplex(lp_file_name)
-    cp_lp.set_results_stream(None)
+    k, l, i, j = np.indices(weights.shape).reshape(4, -1)
+    program.add_constraints(np.stack([P.ravel(), M[i, j]], axis=1), [1., -1.], ub=0.)
+    program.add_constraints(np.stack([P.ravel(), N[k, l]], axis=1), [1., -1.], ub=0.)
 
-    # cp_lp.parameters.threads.set(1)
-    # cp_lp.parameters.timelimit.set(60)
+    program.add_constraints(N, lb=1., ub=1.)
+    program.add_constraints(N.T, lb=1., ub=1.)
+    program.add_constraints(M, lb=1., ub=1.)
+    program.add_constraints(M.T, lb=1., ub=1.)
 
-    try:
-        cp_lp.solve()
-
-    except cplex.CplexSolverError:
-        print("Exception raised during solve")
-        return
+    # IMPORTANT #
+    program.add_constraints(P.transpose(0, 2, 1, 3).reshape(num_voters * num_candidates, -1),
+                            lb=1., ub=1.)
+    program.add_constraints(P.transpose(1, 3, 0, 2).reshape(num_voters * num_candidates, -1),
+                            lb=1., ub=1.)
 
-    total = cp_lp.solution.get_objective_value()
-    return total
+    objective_value, _ = program.solve(solver)
+    return objective_value
 
 
 def spearman_cost(single_votes_1, single_votes_2, params, perm):
@@ -1532,11 +651,7 @@ def generate_lp_file_borda_owa(owa, lp_file_name, params, votes):
 
 # TMP - PRINT
 
-def print_results(election, committee_size, cp):
-
-    result = [0.] * election.num_candidates
-    for i in range(election.num_candidates):
-        result[i] = cp.solution.get_values('y' + str(i))
+def print_results(election, committee_size, result):
     # print(result)
 
     fixed = []
@@ -7,20 +7,23 @@ import networkx as nx
 
 from mapel.main._matchings import *
 from mapel.elections.objects.ApprovalElection import ApprovalElection
+from mapel.main._inner_distances import get_cost_matrix
 
 
 # MAIN APPROVAL DISTANCES
 def compute_approvalwise(election_1: ApprovalElection, election_2: ApprovalElection,
                          inner_distance: Callable) -> float:
     """ Return: approvalwise distance """
-    return inner_distance(election_1.approvalwise_vector, election_2.approvalwise_vector)
+    return inner_distance(election_1.get_approvalwise_vector(),
+                          election_2.get_approvalwise_vector())
 
 
 def compute_coapproval_frequency_vectors(election_1: ApprovalElection, election_2: ApprovalElection,
-                                         inner_distance: Callable) -> (float, list):
+                                         inner_distance: Callable,
+                                         vector_type: str = 'A') -> (float, list):
     """ Return: coapproval frequency distance, optimal matching """
     cost_table = get_matching_cost_coapproval_frequency_vectors(
-        election_1, election_2, inner_distance)
+        election_1, election_2, inner_distance, vector_type=vector_type)
     return solve_matching_vectors(cost_table)
 
 
@@ -37,34 +40,32 @@ def compute_hamming(election_1: ApprovalElection, election_2: ApprovalElection)
     votes_1 = election_1.votes
     votes_2 = election_2.votes
     params = {'voters': election_1.num_voters, 'candidates': election_2.num_candidates}
-    file_name = f'{np.random.random()}.lp'
-    path = os.path.join(os.getcwd(), "trash", file_name)
-    lp.generate_ilp_distance(path, votes_1, votes_2, params, 'hamming')
-    objective_value = lp.solve_ilp_distance(path, votes_1, votes_2, params, 'hamming')
-    objective_value /= election_1.num_candidates  # ANALYZE THIS LINE
-    lp.remove_lp_file(path)
-    return objective_value
+    # the ILP weights count mismatched candidates of matched voters, so the objective
+    # already is the isomorphic Hamming distance
+    return lp.solve_ilp_distance(votes_1, votes_2, params, 'hamming')
 
 
 def compute_voterlikeness(election_1: ApprovalElection, election_2: ApprovalElection,
-                          inner_distance: Callable) -> (float, list):
+                          inner_distance: Callable, vector_type: str = 'A') -> (float, list):
     """ Return: voterlikeness distance, optimal matching """
     cost_table = get_matching_cost_voterlikeness_vectors(
-        election_1, election_2, inner_distance)
+        election_1, election_2, inner_distance, vector_type=vector_type)
     return solve_matching_vectors(cost_table)
 
 
 def compute_pairwise(election_1: ApprovalElection, election_2: ApprovalElection,
-                     inner_distance: Callable) -> (float, list):
+                     inner_distance: Callable, method: str = 'bnb',
+                     time_limit: float = None) -> (float, list):
     """ Return: approval pairwise distance, optimal matching """
     length = election_1.num_candidates
-    matrix_1 = election_1.pairwise_matrix
-    matrix_2 = election_2.pairwise_matrix
-    return solve_matching_matrices(matrix_1, matrix_2, length, inner_distance)
+    matrix_1 = election_1.get_pairwise_matrix()
+    matrix_2 = election_2.get_pairwise_matrix()
+    return solve_matching_matrices(matrix_1, matrix_2, length, inner_distance,
+                                   method=method, time_limit=time_limit)
 
 
-def compute_flow(ele_1, ele_2):
-    cost_table = get_flow_helper_1(ele_1, ele_2)
+def compute_flow(ele_1, ele_2, vector_type: str = 'A'):
+    cost_table = get_flow_helper_1(ele_1, ele_2, vector_type=vector_type)
     objective_value, matching = solve_matching_vectors(cost_table)
     objective_value /= 1000.
     return objective_value, matching
@@ -193,45 +194,96 @@ def flow_helper_simple(v_1, v_2, num_candidates=1, num_voters=1):
     return nx.min_cost_flow_cost(graph)
 
 
-def get_flow_helper_1(election_1: ApprovalElection, election_2: ApprovalElection) -> List[list]:
+def get_flow_helper_1(election_1: ApprovalElection, election_2: ApprovalElection,
+                      vector_type: str = 'A') -> np.ndarray:
     """ Return: Cost table """
-    vectors_1 = election_1.coapproval_frequency_vectors
-    vectors_2 = election_2.coapproval_frequency_vectors
-    size = election_1.num_candidates
-    return [[flow_helper_simple(vectors_1[i], vectors_2[j],
-                         num_candidates=election_1.num_candidates,
-                         num_voters=election_1.num_voters)
-             for i in range(size)] for j in range(size)]
+    return get_flow_cost_table(election_1.get_coapproval_frequency_vectors(vector_type),
+                               election_2.get_coapproval_frequency_vectors(vector_type),
+                               num_candidates=election_1.num_candidates,
+                               num_voters=election_1.num_voters)
+
+
+def get_flow_cost_table(vectors_1, vectors_2, num_candidates=1, num_voters=1) -> np.ndarray:
+    """ Return: table C, where C[j][i] = flow_helper_simple(vectors_1[i], vectors_2[j])
+
+    The network of flow_helper_simple is a ladder: two rows of m nodes, unit cost
+    between neighbours in a row and cost m between the two nodes of each rung, and
+    capacities that never bind. As every path within a row is shorter than m, an optimal
+    flow crosses the rungs only in the direction of the imbalance E between the rows,
+    |E| times in total. With R_k -- the flow crossed at rungs 0, ..., k, the cost is
+        m |E| + sum_k |PU_k - R_k| + |PL_k + R_k|,
+    where PU_k (PL_k) is the prefix sum of the excess supply in the upper (lower) row,
+    minimized over non-decreasing R from 0 to E. The minimum is attained at the
+    breakpoints, so it is found by a dynamic program over them, for all pairs at once. """
+
+    m = num_candidates
+    total_demand = num_voters * num_candidates
+    epsilon = 0.1
+    supplies = np.floor(np.asarray(vectors_1, dtype=float) * total_demand + epsilon)
+    demands = np.floor(np.asarray(vectors_2, dtype=float) * total_demand + epsilon)
+
+    # excess[j][i] -- supply minus demand of each node, for the pair (i, j)
+    excess = supplies[np.newaxis, :, :] - demands[:, np.newaxis, :]
+    upper, lower = excess[:, :, 0:m], excess[:, :, m:2 * m]
+    imbalance = upper.sum(axis=2)
+    # w.l.o.g. the flow crosses from the upper row to the lower one
+    swap = imbalance < 0
+    upper, lower = np.where(swap[:, :, np.newaxis], lower, upper), \
+        np.where(swap[:, :, np.newaxis], upper, lower)
+    imbalance = np.abs(imbalance)
+
+    prefix_upper = np.cumsum(upper, axis=2)[:, :, 0:m - 1]
+    prefix_lower = np.cumsum(lower, axis=2)[:, :, 0:m - 1]
+    breakpoints = np.concatenate([np.zeros(imbalance.shape + (1,)), imbalance[:, :, np.newaxis],
+                                  prefix_upper, -prefix_lower], axis=2)
+    breakpoints = np.sort(np.clip(breakpoints, 0, imbalance[:, :, np.newaxis]), axis=2)
+
+    costs = np.zeros(breakpoints.shape)
+    for k in range(m - 1):
+        costs = np.minimum.accumulate(costs, axis=2) + \
+            np.abs(prefix_upper[:, :, k, np.newaxis] - breakpoints) + \
+            np.abs(prefix_lower[:, :, k, np.newaxis] + breakpoints)
+    cost_table = m * imbalance + costs.min(axis=2)
+
+    # the network above assumes that supplies and demands are balanced,
+    # other pairs are solved as they are
+    unbalanced_1 = np.flatnonzero(supplies.sum(axis=1) != total_demand)
+    unbalanced_2 = np.flatnonzero(demands.sum(axis=1) != total_demand)
+    for j, i in set((j, i) for i in unbalanced_1 for j in range(len(demands))) | \
+            set((j, i) for j in unbalanced_2 for i in range(len(supplies))):
+        cost_table[j, i] = flow_helper_simple(vectors_1[i], vectors_2[j],
+                                              num_candidates=num_candidates,
+                                              num_voters=num_voters)
+    return cost_table
 
 
 def get_matching_cost_coapproval_frequency_vectors(election_1: ApprovalElection,
                                                    election_2: ApprovalElection,
-                                                   inner_distance: Callable) -> List[list]:
+                                                   inner_distance: Callable,
+                                                   vector_type: str = 'A') -> List[list]:
     """ Return: Cost table """
-    vectors_1 = election_1.coapproval_frequency_vectors
-    vectors_2 = election_2.coapproval_frequency_vectors
-    size = election_1.num_candidates
-    return [[inner_distance(vectors_1[i], vectors_2[j]) for i in range(size)] for j in range(size)]
+    vectors_1 = election_1.get_coapproval_frequency_vectors(vector_type)
+    vectors_2 = election_2.get_coapproval_frequency_vectors(vector_type)
+    return get_cost_matrix(vectors_2, vectors_1, inner_distance)
 
 
 def get_matching_cost_candidatelikeness(election_1: ApprovalElection,
                                         election_2: ApprovalElection,
                                         inner_distance: Callable) -> List[list]:
     """ Return: Cost table """
-    vectors_1 = election_1.candidatelikeness_sorted_vectors
-    vectors_2 = election_2.candidatelikeness_sorted_vectors
-    size = election_1.num_candidates
-    return [[inner_distance(vectors_1[i], vectors_2[j]) for i in range(size)] for j in range(size)]
+    vectors_1 = election_1.get_candidatelikeness_sorted_vectors()
+    vectors_2 = election_2.get_candidatelikeness_sorted_vectors()
+    return get_cost_matrix(vectors_2, vectors_1, inner_distance)
 
 
 def get_matching_cost_voterlikeness_vectors(election_1: ApprovalElection,
                                             election_2: ApprovalElection,
-                                            inner_distance: Callable) -> List[list]:
+                                            inner_distance: Callable,
+                                            vector_type: str = 'A') -> List[list]:
     """ Return: Cost table """
-    vectors_1 = election_1.voterlikeness_vectors
-    vectors_2 = election_2.voterlikeness_vectors
-    size = election_1.num_voters
-    return [[inner_distance(vectors_1[i], vectors_2[j]) for i in range(size)] for j in range(size)]
+    vectors_1 = election_1.get_voterlikeness_vectors(vector_type)
+    vectors_2 = election_2.get_voterlikeness_vectors(vector_type)
+    return get_cost_matrix(vectors_2, vectors_1, inner_distance)
 
 # # # # # # # # # # # # # # # #
 # LAST CLEANUP ON: 13.10.2021 #
@@ -1,9 +1,9 @@
 from typing import Callable, List
-from itertools import combinations, permutations
 
 from mapel.main._matchings import *
 from mapel.elections.objects.OrdinalElection import OrdinalElection
-from mapel.main._inner_distances import swap_distance
+from mapel.main._inner_distances import swap_distances, get_cost_matrix
+from mapel.elections.metrics.isomorphic_swap import compute_isomorphic_swap_distance
 
 
 # MAIN DISTANCES
@@ -40,30 +40,33 @@ def compute_bordawise_distance(election_1: OrdinalElection, election_2: OrdinalE
 
 
 def compute_pairwise_distance(election_1: OrdinalElection, election_2: OrdinalElection,
-                              inner_distance: Callable) -> float:
+                              inner_distance: Callable, method: str = 'bnb',
+                              time_limit: float = None) -> float:
     """ Compute Pairwise distance between ordinal elections """
     length = election_1.num_candidates
     matrix_1 = election_1.votes_to_pairwise_matrix()
     matrix_2 = election_2.votes_to_pairwise_matrix()
-    return solve_matching_matrices(matrix_1, matrix_2, length, inner_distance)
+    return solve_matching_matrices(matrix_1, matrix_2, length, inner_distance,
+                                   method=method, time_limit=time_limit)
 
 
 def compute_voterlikeness_distance(election_1: OrdinalElection, election_2: OrdinalElection,
-                                   inner_distance: Callable) -> float:
+                                   inner_distance: Callable, method: str = 'bnb',
+                                   time_limit: float = None) -> float:
     """ Compute Voterlikeness distance between elections """
     length = election_1.num_voters
     matrix_1 = election_1.votes_to_voterlikeness_matrix()
     matrix_2 = election_2.votes_to_voterlikeness_matrix()
-    return solve_matching_matrices(matrix_1, matrix_2, length, inner_distance)
+    return solve_matching_matrices(matrix_1, matrix_2, length, inner_distance,
+                                   method=method, time_limit=time_limit)
 
 
-def compute_swap_bf_distance(election_1: OrdinalElection, election_2: OrdinalElection) -> int:
-    """ Compute Swap distance between elections (using brute force) """
-    obj_values = []
-    for mapping in permutations(range(election_1.num_candidates)):
-        cost_table = get_matching_cost_swap_bf(election_1, election_2, mapping)
-        obj_values.append(solve_matching_vectors(cost_table)[0])
-    return min(obj_values)
+def compute_swap_bf_distance(election_1: OrdinalElection, election_2: OrdinalElection,
+                             num_workers: int = 1) -> int:
+    """ Compute Swap distance between elections (using branch-and-bound) """
+    distance, _ = compute_isomorphic_swap_distance(election_1.potes, election_2.potes,
+                                                   num_workers=num_workers)
+    return distance
 
 
 def compute_spearman_distance(election_1: OrdinalElection, election_2: OrdinalElection) -> int:
@@ -72,13 +75,7 @@ def compute_spearman_distance(election_1: OrdinalElection, election_2: OrdinalEl
     votes_1 = election_1.votes
     votes_2 = election_2.votes
     params = {'voters': election_1.num_voters, 'candidates': election_1.num_candidates}
-
-    file_name = f'{np.random.random()}.lp'
-    path = os.path.join(os.getcwd(), "trash", file_name)
-    lp.generate_ilp_distance(path, votes_1, votes_2, params, 'spearman')
-    objective_value = lp.solve_ilp_distance(path, votes_1, votes_2, params, 'spearman')
-    lp.remove_lp_file(path)
-    return objective_value
+    return lp.solve_ilp_distance(votes_1, votes_2, params, 'spearman')
 
 
 def compute_discrete_distance(election_1: OrdinalElection, election_2: OrdinalElection) -> int:
@@ -92,21 +89,17 @@ def compute_voter_subelection(election_1: OrdinalElection, election_2: OrdinalEl
 
 def compute_candidate_subelection(election_1: OrdinalElection, election_2: OrdinalElection) -> int:
     """ Compute Candidate-Subelection """
-    file_name = str(np.random.random()) + '.lp'
-    path = os.path.join(os.getcwd(), 'trash', file_name)
-    objective_value = lp.solve_lp_candidate_subelections(path, election_1, election_2)
-    lp.remove_lp_file(path)
-    return objective_value
+    return lp.solve_lp_candidate_subelections(election_1, election_2)
 
 # HELPER FUNCTIONS #
 def get_matching_cost_pos_swap(election_1: OrdinalElection, election_2: OrdinalElection,
                                matching) -> List[list]:
     """ Return: Cost table """
-    votes_1 = election_1.votes
-    votes_2 = election_2.votes
-    size = election_1.num_voters
-    return [[swap_distance(votes_1[i], votes_2[j], matching=matching) for i in range(size)]
-            for j in range(size)]
+    # votes of the second election are relabelled once, then all the swap
+    # distances are computed together (block by block)
+    potes_1 = np.asarray(election_1.potes)
+    potes_2 = np.argsort(np.asarray(matching)[election_2.get_votes_array()], axis=1)
+    return swap_distances(potes_1, potes_2).T
 
 
 def get_matching_cost_positionwise(election_1: OrdinalElection, election_2: OrdinalElection,
@@ -114,26 +107,15 @@ def get_matching_cost_positionwise(election_1: OrdinalElection, election_2: Ordi
     """ Return: Cost table """
     vectors_1 = election_1.get_vectors()
     vectors_2 = election_2.get_vectors()
-    size = election_1.num_candidates
-    return [[inner_distance(vectors_1[i], vectors_2[j]) for i in range(size)] for j in range(size)]
+    return get_cost_matrix(vectors_2, vectors_1, inner_distance)
 
 
 def get_matching_cost_swap_bf(election_1: OrdinalElection, election_2: OrdinalElection,
                               mapping):
     """ Return: Cost table """
-    cost_table = np.zeros([election_1.num_voters, election_1.num_voters])
-
-    for v1 in range(election_1.num_voters):
-        for v2 in range(election_2.num_voters):
-            swap_distance = 0
-            for i, j in combinations(election_1.potes[0], 2):
-                if (election_1.potes[v1][i] > election_1.potes[v1][j] and
-                    election_2.potes[v2][mapping[i]] < election_2.potes[v2][mapping[j]]) or \
-                        (election_1.potes[v1][i] < election_1.potes[v1][j] and
-                         election_2.potes[v2][mapping[i]] > election_2.potes[v2][mapping[j]]):
-                    swap_distance += 1
-            cost_table[v1][v2] = swap_distance
-    return cost_table
+    potes_1 = np.asarray(election_1.potes)
+    potes_2 = np.asarray(election_2.potes)
+    return swap_distances(potes_1, potes_2[:, list(mapping)])
 
 # # # # # # # # # # # # # # # #
 # LAST CLEANUP ON: 17.03.2022 #
@@ -1,13 +1,18 @@
 #!/usr/bin/env python
 import logging
+import math
+from multiprocessing import Pool
 from time import time
 from typing import Callable
 
 import numpy as np
 
+from mapel.elections.metrics import batched_positionwise as bp
 from mapel.elections.metrics import main_approval_distances as mad
 from mapel.elections.metrics import main_ordinal_distances as mod
+from mapel.main._distance_cache import DistanceCache
 from mapel.main._inner_distances import map_str_to_func
+from mapel.main._matchings import InexactDistance
 from mapel.elections.objects.ApprovalElection import ApprovalElection
 from mapel.elections.objects.Election import Election
 from mapel.elections.objects.OrdinalElection import OrdinalElection
@@ -15,19 +20,26 @@ from mapel.main.objects.Experiment import Experiment
 
 
 def get_distance(election_1: Election, election_2: Election,
-                 distance_id: str = None) -> float or (float, list):
-    """ Return: distance between instances, (if applicable) optimal matching """
+                 distance_id: str = None, vector_type: str = 'A',
+                 qap_params: dict = None) -> float or (float, list):
+    """ Return: distance between instances, (if applicable) optimal matching
+
+    qap_params: method and time_limit of solve_matching_matrices, used by the
+    distances that match pairwise or voterlikeness matrices """
 
     if type(election_1) is ApprovalElection and type(election_2) is ApprovalElection:
-        return get_approval_distance(election_1, election_2, distance_id=distance_id)
+        return get_approval_distance(election_1, election_2, distance_id=distance_id,
+                                     vector_type=vector_type, qap_params=qap_params)
     elif type(election_1) is OrdinalElection and type(election_2) is OrdinalElection:
-        return get_ordinal_distance(election_1, election_2, distance_id=distance_id)
+        return get_ordinal_distance(election_1, election_2, distance_id=distance_id,
+                                    qap_params=qap_params)
     else:
         logging.warning('No such instance!')
 
 
 def get_approval_distance(election_1: ApprovalElection, election_2: ApprovalElection,
-                          distance_id: str = None) -> float or (float, list):
+                          distance_id: str = None, vector_type: str = 'A',
+                          qap_params: dict = None) -> float or (float, list):
     """ Return: distance between approval elections, (if applicable) optimal matching """
 
     inner_distance, main_distance = extract_distance_id(distance_id)
@@ -45,16 +57,24 @@ def get_approval_distance(election_1: ApprovalElection, election_2: ApprovalElec
         'candidatelikeness': mad.compute_candidatelikeness,
     }
 
+    # metrics based on vectors that depend on vector_type
+    metrics_with_vector_type = {'flow', 'coapproval_frequency', 'voterlikeness'}
+    kwargs = {'vector_type': vector_type} if main_distance in metrics_with_vector_type else {}
+    # metrics that solve a QAP
+    if main_distance == 'pairwise' and qap_params:
+        kwargs.update(qap_params)
+
     if main_distance in metrics_without_params:
-        return metrics_without_params.get(main_distance)(election_1, election_2)
+        return metrics_without_params.get(main_distance)(election_1, election_2, **kwargs)
 
     elif main_distance in metrics_with_inner_distance:
         return metrics_with_inner_distance.get(main_distance)(election_1, election_2,
-                                                              inner_distance)
+                                                              inner_distance, **kwargs)
 
 
 def get_ordinal_distance(election_1: OrdinalElection, election_2: OrdinalElection,
-                         distance_id: str = None) -> float or (float, list):
+                         distance_id: str = None,
+                         qap_params: dict = None) -> float or (float, list):
     """ Return: distance between ordinal elections, (if applicable) optimal matching """
 
     inner_distance, main_distance = extract_distance_id(distance_id)
@@ -75,12 +95,16 @@ def get_ordinal_distance(election_1: OrdinalElection, election_2: OrdinalElectio
         'pos_swap': mod.compute_pos_swap_distance,
     }
 
+    # metrics that solve a QAP
+    metrics_with_qap = {'pairwise', 'voterlikeness'}
+    kwargs = qap_params if main_distance in metrics_with_qap and qap_params else {}
+
     if main_distance in metrics_without_params:
         return metrics_without_params.get(main_distance)(election_1, election_2)
 
     elif main_distance in metrics_with_inner_distance:
         return metrics_with_inner_distance.get(main_distance)(election_1, election_2,
-                                                              inner_distance)
+                                                              inner_distance, **kwargs)
 
 
 def extract_distance_id(distance_id: str) -> (Callable, str):
@@ -95,24 +119,194 @@ def extract_distance_id(distance_id: str) -> (Callable, str):
 
 def run_single_thread(experiment: Experiment, thread_ids: list,
                       distances: dict, times: dict, matchings: dict,
-                      printing: bool, t) -> None:
+                      printing: bool, t, vector_type: str = 'A',
+                      lower_bounds: dict = None, qap_params: dict = None) -> None:
     """ Single thread for computing distances """
     for instance_id_1, instance_id_2 in thread_ids:
         if t == 0 and printing:
             print(instance_id_1, instance_id_2)
-        start_time = time()
-        distance = get_distance(experiment.instances[instance_id_1],
-                                experiment.instances[instance_id_2],
-                                distance_id=experiment.distance_id)
-        if type(distance) is tuple:
-            distance, matching = distance
-            matching = np.array(matching)
-            matchings[instance_id_1][instance_id_2] = matching
-            matchings[instance_id_2][instance_id_1] = np.argsort(matching)
-        distances[instance_id_1][instance_id_2] = distance
-        distances[instance_id_2][instance_id_1] = distances[instance_id_1][instance_id_2]
-        times[instance_id_1][instance_id_2] = time() - start_time
-        times[instance_id_2][instance_id_1] = times[instance_id_1][instance_id_2]
+        distance, matching, time_ = _compute_single_distance(experiment.instances[instance_id_1],
+                                                             experiment.instances[instance_id_2],
+                                                             experiment.distance_id,
+                                                             vector_type=vector_type,
+                                                             qap_params=qap_params)
+        merge_single_result(instance_id_1, instance_id_2, distance, matching, time_,
+                             distances, times, matchings, lower_bounds=lower_bounds)
+
+
+def get_cache_distance_id(distance_id: str, vector_type: str) -> str:
+    """ Return: distance_id extended with parameters that change the distance """
+    if '-coapproval_frequency' in distance_id or 'flow' in distance_id or \
+            '-voterlikeness' in distance_id:
+        return f'{distance_id}:{vector_type}'
+    return distance_id
+
+
+def import_distances_from_cache(experiment: Experiment, ids: list, cache: DistanceCache,
+                                distances: dict, times: dict, matchings: dict,
+                                vector_type: str = 'A') -> list:
+    """ Merge the cached distances into the dictionaries
+
+    Return: pairs of instances that are not in the cache """
+    hashes = {instance_id: experiment.instances[instance_id].get_hash()
+              for pair in ids for instance_id in pair}
+    cache_distance_id = get_cache_distance_id(experiment.distance_id, vector_type)
+    found = cache.get_many([(hashes[id_1], hashes[id_2]) for id_1, id_2 in ids],
+                           cache_distance_id)
+
+    missing_ids = []
+    for instance_id_1, instance_id_2 in ids:
+        key = (hashes[instance_id_1], hashes[instance_id_2])
+        if key in found:
+            distance, matching, time_ = found[key]
+            merge_single_result(instance_id_1, instance_id_2, distance, matching, time_,
+                                distances, times, matchings)
+        else:
+            missing_ids.append((instance_id_1, instance_id_2))
+    return missing_ids
+
+
+def store_distances_in_cache(experiment: Experiment, ids: list, cache: DistanceCache,
+                             distances: dict, times: dict, matchings: dict,
+                             vector_type: str = 'A', lower_bounds: dict = None) -> None:
+    """ Store computed distances in the cache
+
+    Distances that are not proven to be optimal (i.e., in lower_bounds) are skipped,
+    since they depend on the time limit and on the speed of the machine """
+    cache_distance_id = get_cache_distance_id(experiment.distance_id, vector_type)
+    entries = []
+    for instance_id_1, instance_id_2 in ids:
+        if lower_bounds and (instance_id_1, instance_id_2) in lower_bounds:
+            continue
+        entries.append((experiment.instances[instance_id_1].get_hash(),
+                        experiment.instances[instance_id_2].get_hash(),
+                        distances[instance_id_1][instance_id_2],
+                        matchings[instance_id_1].get(instance_id_2),
+                        times[instance_id_1][instance_id_2]))
+    cache.put_many(entries, cache_distance_id)
+
+
+def run_batched_positionwise(experiment: Experiment, ids: list,
+                             distances: dict, times: dict, matchings: dict,
+                             block_size: int = None) -> None:
+    """ Compute positionwise distances block by block using stacked matrices """
+    inner_distance, _ = experiment.distance_id.split('-')
+    results = bp.compute_positionwise_distances_batch(experiment.instances, ids, inner_distance,
+                                                      block_size=block_size)
+    for instance_id_1, instance_id_2, distance, matching, time_ in results:
+        merge_single_result(instance_id_1, instance_id_2, distance, matching, time_,
+                             distances, times, matchings)
+
+
+def is_batchable(distance_id: str) -> bool:
+    """ Check if the distance has a batched (vectorized) implementation """
+    if '-' not in distance_id:
+        return False
+    inner_distance, main_distance = distance_id.split('-')
+    return main_distance == 'positionwise' and inner_distance in bp.BATCHED_INNER_DISTANCES
+
+
+def run_process_pool(experiment: Experiment, ids: list,
+                     distances: dict, times: dict, matchings: dict,
+                     num_processes: int, chunk_size: int = None,
+                     printing: bool = False, vector_type: str = 'A',
+                     lower_bounds: dict = None, pool: Pool = None,
+                     qap_params: dict = None) -> None:
+    """ Compute distances using a pool of processes
+
+    Instances are sent to each worker only once (via the pool initializer),
+    while the pairs are handed out in chunks on demand. A pool started with
+    start_process_pool can be given to reuse the workers across many calls. """
+
+    if pool is None:
+        with start_process_pool(experiment, num_processes, vector_type=vector_type,
+                                qap_params=qap_params) as pool:
+            run_process_pool(experiment, ids, distances, times, matchings, num_processes,
+                             chunk_size=chunk_size, printing=printing,
+                             vector_type=vector_type, lower_bounds=lower_bounds, pool=pool)
+        return
+
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(len(ids) / (num_processes * 16)))
+
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+    for c, results in enumerate(pool.imap_unordered(_run_process_chunk, chunks)):
+        if printing:
+            print(f'Chunk {c + 1}/{len(chunks)} done')
+        for instance_id_1, instance_id_2, distance, matching, time_ in results:
+            merge_single_result(instance_id_1, instance_id_2, distance, matching, time_,
+                                 distances, times, matchings, lower_bounds=lower_bounds)
+
+
+def start_process_pool(experiment: Experiment, num_processes: int,
+                       vector_type: str = 'A', qap_params: dict = None) -> Pool:
+    """ Return: pool of processes, each one with its own copy of the instances """
+    return Pool(processes=num_processes, initializer=_init_process_worker,
+                initargs=(experiment.instances, experiment.distance_id, vector_type,
+                          qap_params))
+
+
+_worker_instances = None
+_worker_distance_id = None
+_worker_vector_type = None
+_worker_qap_params = None
+
+
+def _init_process_worker(instances: dict, distance_id: str, vector_type: str = 'A',
+                         qap_params: dict = None) -> None:
+    global _worker_instances, _worker_distance_id, _worker_vector_type, _worker_qap_params
+    _worker_instances = instances
+    _worker_distance_id = distance_id
+    _worker_vector_type = vector_type
+    _worker_qap_params = qap_params
+
+
+def _run_process_chunk(chunk_ids: list) -> list:
+    """ Single chunk of pairs computed inside a worker process """
+    if is_batchable(_worker_distance_id) and bp.can_be_batched(_worker_instances, chunk_ids):
+        inner_distance, _ = _worker_distance_id.split('-')
+        return bp.compute_positionwise_distances_batch(_worker_instances, chunk_ids,
+                                                       inner_distance)
+    results = []
+    for instance_id_1, instance_id_2 in chunk_ids:
+        distance, matching, time_ = _compute_single_distance(_worker_instances[instance_id_1],
+                                                             _worker_instances[instance_id_2],
+                                                             _worker_distance_id,
+                                                             vector_type=_worker_vector_type,
+                                                             qap_params=_worker_qap_params)
+        results.append((instance_id_1, instance_id_2, distance, matching, time_))
+    return results
+
+
+def _compute_single_distance(instance_1, instance_2, distance_id: str,
+                             vector_type: str = 'A',
+                             qap_params: dict = None) -> (float, np.ndarray, float):
+    """ Return: distance, matching (or None), computation time """
+    start_time = time()
+    distance = get_distance(instance_1, instance_2, distance_id=distance_id,
+                            vector_type=vector_type, qap_params=qap_params)
+    matching = None
+    if type(distance) is tuple:
+        distance, matching = distance
+        matching = np.array(matching)
+    return distance, matching, time() - start_time
+
+
+def merge_single_result(instance_id_1, instance_id_2, distance, matching, time_,
+                         distances: dict, times: dict, matchings: dict,
+                         lower_bounds: dict = None) -> None:
+    if lower_bounds is not None and isinstance(distance, InexactDistance):
+        lower_bounds[(instance_id_1, instance_id_2)] = distance.lower_bound
+        lower_bounds[(instance_id_2, instance_id_1)] = distance.lower_bound
+        distance = float(distance)
+    if matching is not None:
+        matchings[instance_id_1][instance_id_2] = matching
+        matchings[instance_id_2][instance_id_1] = np.argsort(matching)
+    distances[instance_id_1][instance_id_2] = distance
+    distances[instance_id_2][instance_id_1] = distances[instance_id_1][instance_id_2]
+    times[instance_id_1][instance_id_2] = time_
+    times[instance_id_2][instance_id_1] = times[instance_id_1][instance_id_2]
 
 # # # # # # # # # # # # # # # #
 # LAST CLEANUP ON: 17.03.2022 #
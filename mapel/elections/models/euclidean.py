@@ -2,22 +2,27 @@ import numpy as np
 import math
 from numpy import linalg
 
+# upper bound on the number of floats in a single voters x candidates x dim chunk
+MAX_CHUNK_ELEMENTS = 2 ** 22
+
 
 ####################################################################################################
 # Approval Euclidean Election Models
 ####################################################################################################
 
-def get_range(params):
+def get_range(params, size=None):
     if params['p_dist'] == 'beta':
-        return np.random.beta(params['a'], params['b'])
+        return np.random.beta(params['a'], params['b'], size=size)
     elif params['p_dist'] == 'uniform':
-        return np.random.uniform(low=params['a'], high=params['b'])
+        return np.random.uniform(low=params['a'], high=params['b'], size=size)
+    elif size is not None:
+        return np.full(size, params['p_dist'], dtype=float)
     else:
         return params['p_dist']
 
 
 def generate_approval_vcr_votes(num_voters: int = None, num_candidates: int = None,
-                                params: dict = None) -> list:
+                                params: dict = None, chunk_size: int = None) -> list:
     # v_a = 1.05  # params['v_a']
     # v_b = 10  # params['v_b']
     # c_a = 1.05  # params['c_a']
@@ -35,26 +40,26 @@ def generate_approval_vcr_votes(num_voters: int = None, num_candidates: int = No
     name = f'{dim}d_{params["space"]}'
     print(name)
 
-    voters = np.array([get_rand(name) for _ in range(num_voters)])
-    candidates = np.array([get_rand(name) for _ in range(num_candidates)])
+    voters = get_rand_points(name, num_voters)
+    candidates = get_rand_points(name, num_candidates)
 
     # v_range = [np.random.beta(v_a, v_b) for _ in range(num_voters)]
     # c_range = [np.random.beta(c_a, c_b) for _ in range(num_candidates)]
     # [np.random.uniform(low=0.05, high=max_range) ...
 
-    v_range = np.array([get_range(params) for _ in range(num_voters)])
-    c_range = np.array([get_range(params) for _ in range(num_candidates)])
+    v_range = get_range(params, size=num_voters)
+    c_range = get_range(params, size=num_candidates)
 
-    for v in range(num_voters):
-        for c in range(num_candidates):
-            if v_range[v] + c_range[c] >= np.linalg.norm(voters[v] - candidates[c]):
-                votes[v].add(c)
+    for start, distances in iterate_distances(voters, candidates, chunk_size=chunk_size):
+        approved = v_range[start:start + len(distances), np.newaxis] + c_range >= distances
+        for v, row in enumerate(approved, start=start):
+            votes[v] = set(np.flatnonzero(row).tolist())
 
     return votes
 
 
 def generate_approval_euclidean_votes(num_voters: int = None, num_candidates: int = None,
-                                      params: dict = None) -> list:
+                                      params: dict = None, chunk_size: int = None) -> list:
     # 'p' should be lower than 0.5
 
     alpha = 4
@@ -62,10 +67,6 @@ def generate_approval_euclidean_votes(num_voters: int = None, num_candidates: in
 
     dim = params['dim']
 
-    rankings = np.zeros([num_voters, num_candidates], dtype=int)
-    distances = np.zeros([num_voters, num_candidates])
-    votes = []
-
     if 'shift' in params:
         shift = np.array([params['shift'] ** 2 for _ in range(dim)])
         voters = np.random.rand(num_voters, dim) + shift
@@ -74,7 +75,7 @@ def generate_approval_euclidean_votes(num_voters: int = None, num_candidates: in
         voters = np.random.rand(num_voters, dim)
         params['gauss'] /= 2
         num_candidates_in_group_a = int(params['gauss'] * num_candidates)
-        num_candidates_in_group_b = num_voters - num_candidates_in_group_a
+        num_candidates_in_group_b = num_candidates - num_candidates_in_group_a
         scale_group_a = params['gauss']
         scale_group_b = 1 - params['gauss']
         loc_a = [1. / 3 for _ in range(dim)]
@@ -86,23 +87,16 @@ def generate_approval_euclidean_votes(num_voters: int = None, num_candidates: in
         candidates = np.concatenate((candidates_group_a, candidates_group_b), axis=0)
     elif 'model_id' in params:
         model = params['model_id']
-        voters = np.array([get_rand(model) for _ in range(num_voters)])
-        candidates = np.array([get_rand(model) for _ in range(num_candidates)])
+        voters = get_rand_points(model, num_voters)
+        candidates = get_rand_points(model, num_candidates)
     else:
         voters = np.random.rand(num_voters, dim)
         candidates = np.random.rand(num_candidates, dim)
 
-    for v in range(num_voters):
-        for c in range(num_candidates):
-            rankings[v][c] = c
-            distances[v][c] = np.linalg.norm(voters[v] - candidates[c])
-        rankings[v] = [x for _, x in sorted(zip(distances[v], rankings[v]))]
+    rankings = get_rankings(voters, candidates, chunk_size=chunk_size)
 
-    for v in range(num_voters):
-        k = int(np.random.beta(alpha, beta) * num_candidates)
-        votes.append(set(rankings[v][0:k]))
-
-    return votes
+    sizes = (np.random.beta(alpha, beta, size=num_voters) * num_candidates).astype(int)
+    return [set(rankings[v][0:sizes[v]].tolist()) for v in range(num_voters)]
 
 
 ####################################################################################################
@@ -117,9 +111,6 @@ def generate_1d_gaussian_party(num_voters=None, num_candidates=None, params=None
     voters = [[] for _ in range(num_voters)]
     candidates = [[] for _ in range(num_candidates)]
 
-    votes = np.zeros([num_voters, num_candidates], dtype=int)
-    distances = np.zeros([num_voters, num_candidates], dtype=float)
-
     for j in range(params['num_parties']):
         for w in range(params['num_winners']):
             _id = j * params['num_winners'] + w
@@ -132,14 +123,7 @@ def generate_1d_gaussian_party(num_voters=None, num_candidates=None, params=None
     for j in range(num_voters):
         voters[j] = [np.random.random() * (_max - _min) + _min + shift[0]]
 
-    for j in range(num_voters):
-        for k in range(num_candidates):
-            votes[j][k] = k
-            distances[j][k] = np.linalg.norm(voters[j] - candidates[k])
-
-        votes[j] = [x for _, x in sorted(zip(distances[j], votes[j]))]
-
-    return votes
+    return get_rankings(np.array(voters), np.array(candidates))
 
 
 def generate_2d_gaussian_party(num_voters=None, num_candidates=None, params=None):
@@ -151,9 +135,6 @@ def generate_2d_gaussian_party(num_voters=None, num_candidates=None, params=None
     voters = [[] for _ in range(num_voters)]
     candidates = [[] for _ in range(num_candidates)]
 
-    votes = np.zeros([num_voters, num_candidates], dtype=int)
-    distances = np.zeros([num_voters, num_candidates], dtype=float)
-
     for j in range(params['num_parties']):
         for w in range(params['num_winners']):
             _id = j * params['num_winners'] + w
@@ -173,14 +154,7 @@ def generate_2d_gaussian_party(num_voters=None, num_candidates=None, params=None
         voters[j] = [np.random.random() * (x_max - x_min) + x_min + shift[0],
                      np.random.random() * (y_max - y_min) + y_min + shift[1]]
 
-    for j in range(num_voters):
-        for k in range(num_candidates):
-            votes[j][k] = k
-            distances[j][k] = np.linalg.norm(voters[j] - candidates[k])
-
-        votes[j] = [x for _, x in sorted(zip(distances[j], votes[j]))]
-
-    return votes
+    return get_rankings(np.array(voters), np.array(candidates))
 
 
 ####################################################################################################
@@ -188,62 +162,46 @@ def generate_2d_gaussian_party(num_voters=None, num_candidates=None, params=None
 ####################################################################################################
 def generate_ordinal_euclidean_votes(model: str = None, num_voters: int = None,
                                      num_candidates: int = None,
-                                     params: dict = None) -> np.ndarray:
-    voters = np.zeros([num_voters, params['dim']])
-    candidates = np.zeros([num_voters, params['dim']])
-    votes = np.zeros([num_voters, num_candidates], dtype=int)
-    distances = np.zeros([num_voters, num_candidates], dtype=float)
-
-    for v in range(num_voters):
-        voters[v] = get_rand(model)
-    # voters = sorted(voters)
-
-    for v in range(num_candidates):
-        candidates[v] = get_rand(model)
-    # candidates = sorted(candidates)
-
-    for v in range(num_voters):
-        for c in range(num_candidates):
-            votes[v][c] = c
-            distances[v][c] = np.linalg.norm(voters[v] - candidates[c])
+                                     params: dict = None, chunk_size: int = None) -> np.ndarray:
+    voters = get_rand_points(model, num_voters)
+    candidates = get_rand_points(model, num_candidates)
+    return get_rankings(voters, candidates, chunk_size=chunk_size)
 
-        votes[v] = [x for _, x in sorted(zip(distances[v], votes[v]))]
 
-    return votes
-
-
-def generate_elections_2d_grid(num_voters=None, num_candidates=None):
-    voters = np.zeros([num_voters, 2])
-    candidates = []
-
-    votes = np.zeros([num_voters, num_candidates], dtype=int)
-    distances = np.zeros([num_voters, num_candidates], dtype=float)
-
-    for j in range(num_voters):
-        voters[j] = get_rand('2d_square')
-    voters = sorted(voters)
+def generate_elections_2d_grid(num_voters=None, num_candidates=None, model=None, params=None):
+    voters = get_rand_points('2d_square', num_voters)
+    voters = voters[np.lexsort(voters.T[::-1])]
 
     sq = int(num_candidates ** 0.5)
     d = 1. / sq
 
-    for i in range(sq):
-        for j in range(sq):
-            x = d / 2. + d * i
-            y = d / 2. + d * j
-            point = [x, y]
-            candidates.append(point)
+    centers = d / 2. + d * np.arange(sq)
+    candidates = np.stack(np.meshgrid(centers, centers, indexing='ij'), axis=-1).reshape(-1, 2)
 
-    for j in range(num_voters):
-        for k in range(num_candidates):
-            votes[j][k] = k
-            distances[j][k] = np.linalg.norm(voters[j] - candidates[k])
+    return get_rankings(voters, candidates[0:num_candidates])
 
-        votes[j] = [x for _, x in sorted(zip(distances[j], votes[j]))]
 
-    return votes
+# AUXILIARY
+def iterate_distances(voters: np.ndarray, candidates: np.ndarray, chunk_size: int = None):
+    """ Yield: (start, distances between voters[start:start+chunk_size] and all candidates) """
+    voters = np.asarray(voters, dtype=float).reshape(len(voters), -1)
+    candidates = np.asarray(candidates, dtype=float).reshape(len(candidates), -1)
+    if chunk_size is None:
+        chunk_size = max(1, MAX_CHUNK_ELEMENTS // max(1, candidates.size))
+    for start in range(0, len(voters), chunk_size):
+        differences = voters[start:start + chunk_size, np.newaxis, :] - candidates[np.newaxis]
+        yield start, np.sqrt(np.einsum('vcd,vcd->vc', differences, differences))
+
+
+def get_rankings(voters: np.ndarray, candidates: np.ndarray,
+                 chunk_size: int = None) -> np.ndarray:
+    """ Return: for each voter, candidates sorted by increasing distance (ties by index) """
+    rankings = np.zeros([len(voters), len(candidates)], dtype=int)
+    for start, distances in iterate_distances(voters, candidates, chunk_size=chunk_size):
+        rankings[start:start + len(distances)] = np.argsort(distances, axis=1, kind='stable')
+    return rankings
 
 
-# AUXILIARY
 def random_ball(dimension, num_points=1, radius=1):
     random_directions = np.random.normal(size=(dimension, num_points))
     random_directions /= linalg.norm(random_directions, axis=0)
@@ -261,101 +219,84 @@ def random_sphere(dimension, num_points=1, radius=1):
 
 def get_rand(model: str, cat: str = "voters") -> list:
     """ generate random values"""
-    # print(model ==  "1d_uniform")
+    point = get_rand_points(model, 1, cat=cat)[0]
+    if len(point) == 1:
+        return float(point[0])
+    return list(point)
+
+
+def get_rand_points(model: str, num_points: int, cat: str = "voters") -> np.ndarray:
+    """ Return: (num_points, dim) array of random points """
+
+    def uniform_choice(points_1, points_2):
+        return np.where(np.random.random((num_points, 1)) < 0.5, points_1, points_2)
+
+    def asymmetric(dim):
+        loc = np.where(np.random.rand(num_points, 1) < 0.3, 0.25, 0.75)
+        return np.random.normal(loc=loc, scale=0.15, size=(num_points, dim))
+
+    def truncated_gaussian(dim):
+        # rejection sampling within the ball of radius 0.5 around the center
+        points = np.random.normal(0.5, 0.15, size=(num_points, dim))
+        rejected = np.linalg.norm(points - 0.5, axis=1) > 0.5
+        while rejected.any():
+            points[rejected] = np.random.normal(0.5, 0.15, size=(rejected.sum(), dim))
+            rejected = np.linalg.norm(points - 0.5, axis=1) > 0.5
+        return points
+
+    def disc(center_x, center_y):
+        phi = 2.0 * 180.0 * np.random.random(num_points)
+        radius = np.sqrt(np.random.random(num_points)) * 0.5
+        return np.stack([center_x + radius * np.cos(phi),
+                         center_y + radius * np.sin(phi)], axis=1)
 
-    point = [0]
     if model in {"1d_uniform",  "1d_interval"}:
-        return np.random.rand()
+        return np.random.rand(num_points, 1)
     elif model in {'1d_asymmetric'}:
-        if np.random.rand() < 0.3:
-            return np.random.normal(loc=0.25, scale=0.15, size=1)
-        else:
-            return np.random.normal(loc=0.75, scale=0.15, size=1)
+        return asymmetric(1)
     elif model in {"1d_gaussian"}:
-        point = np.random.normal(0.5, 0.15)
-        while point > 1 or point < 0:
-            point = np.random.normal(0.5, 0.15)
+        return truncated_gaussian(1)
     elif model == "1d_one_sided_triangle":
-        point = np.random.uniform(0, 1) ** 0.5
+        return np.random.uniform(0, 1, size=(num_points, 1)) ** 0.5
     elif model == "1d_full_triangle":
-        point = np.random.choice([np.random.uniform(0, 1) ** 0.5, 2 - np.random.uniform(0, 1) ** 0.5])
+        return uniform_choice(np.random.uniform(0, 1, size=(num_points, 1)) ** 0.5,
+                              2 - np.random.uniform(0, 1, size=(num_points, 1)) ** 0.5)
     elif model == "1d_two_party":
-        point = np.random.choice([np.random.uniform(0, 1), np.random.uniform(2, 3)])
+        return uniform_choice(np.random.uniform(0, 1, size=(num_points, 1)),
+                              np.random.uniform(2, 3, size=(num_points, 1)))
     elif model in {"2d_disc", "2d_range_disc"}:
-        phi = 2.0 * 180.0 * np.random.random()
-        radius = math.sqrt(np.random.random()) * 0.5
-        point = [0.5 + radius * math.cos(phi), 0.5 + radius * math.sin(phi)]
+        return disc(0.5, 0.5)
     elif model == "2d_range_overlapping":
-        phi = 2.0 * 180.0 * np.random.random()
-        radius = math.sqrt(np.random.random()) * 0.5
-        if cat == "voters":
-            point = [0.25 + radius * math.cos(phi), 0.5 + radius * math.sin(phi)]
-        elif cat == "candidates":
-            point = [0.75 + radius * math.cos(phi), 0.5 + radius * math.sin(phi)]
+        if cat == "candidates":
+            return disc(0.75, 0.5)
+        return disc(0.25, 0.5)
     elif model in {"2d_square", "2d_uniform"}:
-        point = [np.random.random(), np.random.random()]
+        return np.random.random((num_points, 2))
     elif model in {'2d_asymmetric'}:
-        if np.random.rand() < 0.3:
-            return np.random.normal(loc=0.25, scale=0.15, size=2)
-        else:
-            return np.random.normal(loc=0.75, scale=0.15, size=2)
+        return asymmetric(2)
     elif model == "2d_sphere":
-        alpha = 2 * math.pi * np.random.random()
-        x = 1. * math.cos(alpha)
-        y = 1. * math.sin(alpha)
-        point = [x, y]
+        alpha = 2 * math.pi * np.random.random(num_points)
+        return np.stack([np.cos(alpha), np.sin(alpha)], axis=1)
     elif model in ["2d_gaussian", "2d_range_gaussian"]:
-        point = [np.random.normal(0.5, 0.15), np.random.normal(0.5, 0.15)]
-        while np.linalg.norm(point - np.array([0.5, 0.5])) > 0.5:
-            point = [np.random.normal(0.5, 0.15), np.random.normal(0.5, 0.15)]
+        return truncated_gaussian(2)
     elif model in ["2d_range_fourgau"]:
-        r = np.random.randint(1, 4)
         size = 0.06
-        if r == 1:
-            point = [np.random.normal(0.25, size), np.random.normal(0.5, size)]
-        if r == 2:
-            point = [np.random.normal(0.5, size), np.random.normal(0.75, size)]
-        if r == 3:
-            point = [np.random.normal(0.75, size), np.random.normal(0.5, size)]
-        if r == 4:
-            point = [np.random.normal(0.5, size), np.random.normal(0.25, size)]
+        centers = np.array([[0.25, 0.5], [0.5, 0.75], [0.75, 0.5]])
+        return np.random.normal(centers[np.random.randint(0, 3, size=num_points)], size)
     elif model in ["3d_cube", "3d_uniform"]:
-        point = [np.random.random(), np.random.random(), np.random.random()]
+        return np.random.random((num_points, 3))
     elif model in {'3d_asymmetric'}:
-        if np.random.rand() < 0.3:
-            return np.random.normal(loc=0.25, scale=0.15, size=3)
-        else:
-            return np.random.normal(loc=0.75, scale=0.15, size=3)
+        return asymmetric(3)
     elif model in ['3d_gaussian']:
-        point = [np.random.normal(0.5, 0.15),
-                 np.random.normal(0.5, 0.15),
-                 np.random.normal(0.5, 0.15)]
-        while np.linalg.norm(point - np.array([0.5, 0.5, 0.5])) > 0.5:
-            point = [np.random.normal(0.5, 0.15),
-                     np.random.normal(0.5, 0.15),
-                     np.random.normal(0.5, 0.15)]
-    elif model == "4d_cube":
-        dim = 4
-        point = [np.random.random() for _ in range(dim)]
-    elif model == "5d_cube":
-        dim = 5
-        point = [np.random.random() for _ in range(dim)]
-    elif model == "10d_cube":
-        dim = 10
-        point = [np.random.random() for _ in range(dim)]
-    elif model == "20d_cube":
-        dim = 20
-        point = [np.random.random() for _ in range(dim)]
-    elif model == "3d_sphere":
-        dim = 3
-        point = list(random_sphere(dim)[0])
-    elif model == "4d_sphere":
-        dim = 4
-        point = list(random_sphere(dim)[0])
-    elif model == "5d_sphere":
-        dim = 5
-        point = list(random_sphere(dim)[0])
-    else:
-        print('unknown model_id', model)
-        point = [0, 0]
-    return point
+        return truncated_gaussian(3)
+
+    dim, _, space = model.partition('d_')
+    if dim.isdigit() and space == 'cube':
+        return np.random.random((num_points, int(dim)))
+    elif dim.isdigit() and space == 'sphere':
+        return random_sphere(int(dim), num_points)
+    elif dim.isdigit() and space == 'ball':
+        return random_ball(int(dim), num_points)
+
+    print('unknown model_id', model)
+    return np.zeros([num_points, 2])
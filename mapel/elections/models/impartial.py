@@ -3,19 +3,24 @@ import math
 import numpy as np
 
 
+def sample_permutations(num_voters: int, num_candidates: int) -> np.ndarray:
+    """ Return: (num_voters, num_candidates) array of independent uniform permutations """
+    return np.argsort(np.random.random((num_voters, num_candidates)), axis=1)
+
+
+def sample_approval_matrix(num_voters: int, num_candidates: int, p: float) -> np.ndarray:
+    """ Return: boolean approval matrix, each candidate approved independently with prob. p """
+    return np.random.random((num_voters, num_candidates)) <= p
+
+
 def generate_approval_ic_votes(num_voters: int = None, num_candidates: int = None,
-                               params: dict = None) -> list:
-    """ Return: approval votes from Impartial Culture """
+                               params: dict = None) -> np.ndarray:
+    """ Return: approval votes (as boolean matrix) from Impartial Culture """
     if params is None:
         params = {}
     if 'p' not in params:
         params = {'p': 0.5}
-    votes = [set() for _ in range(num_voters)]
-    for i in range(num_voters):
-        for j in range(num_candidates):
-            if np.random.random() <= params['p']:
-                votes[i].add(j)
-    return votes
+    return sample_approval_matrix(num_voters, num_candidates, params['p'])
 
 
 def generate_approval_id_votes(num_voters: int = None, num_candidates: int = None,
@@ -41,32 +46,37 @@ def generate_approval_empty_votes(num_voters: int = None) -> list:
     return [set() for _ in range(num_voters)]
 
 
-def generate_impartial_anonymous_culture_election(num_voters: int = None,
-                                                  num_candidates: int = None) -> list:
-    """ Return: ordinal votes from Impartial Anonymous Culture """
-    alpha = 1. / math.factorial(num_candidates)
+def sample_urn_sources(is_new: np.ndarray) -> np.ndarray:
+    """ Vote j is fresh if is_new[j], otherwise it is a copy of a uniformly chosen
+    earlier vote.
 
-    votes = [list() for _ in range(num_voters)]
+    Return: for each vote, the index of the fresh vote (among the fresh ones) it equals """
+    num_voters = len(is_new)
+    sources = np.arange(num_voters)
+    copies = np.flatnonzero(~is_new)
+    sources[copies] = (np.random.random(len(copies)) * copies).astype(int)
+    # follow the chains of copies back to fresh votes (pointer jumping)
+    while True:
+        next_sources = sources[sources]
+        if np.array_equal(next_sources, sources):
+            break
+        sources = next_sources
+    return (np.cumsum(is_new) - 1)[sources]
 
-    urn_size = 1.
-    for j in range(num_voters):
-        rho = np.random.random()
-        if rho <= urn_size:
-            votes[j] = list(np.random.permutation(num_candidates))
-        else:
-            votes[j] = votes[np.random.randint(0, j - 1)]
-        urn_size = 1. / (1. + alpha * (j + 1.))
 
-    return votes
+def generate_impartial_anonymous_culture_election(num_voters: int = None,
+                                                  num_candidates: int = None) -> np.ndarray:
+    """ Return: ordinal votes from Impartial Anonymous Culture """
+    alpha = 1. / math.factorial(num_candidates)
+    is_new = np.random.random(num_voters) <= 1. / (1. + alpha * np.arange(num_voters))
+    sources = sample_urn_sources(is_new)
+    return sample_permutations(int(is_new.sum()), num_candidates)[sources]
 
 
 def generate_ordinal_ic_votes(num_voters: int = None,
                               num_candidates: int = None) -> np.ndarray:
     """ Return: ordinal votes from Impartial Culture """
-    votes = np.zeros([num_voters, num_candidates], dtype=int)
-    for j in range(num_voters):
-        votes[j] = np.random.permutation(num_candidates)
-    return votes
+    return sample_permutations(num_voters, num_candidates)
 
 
 def generate_ic_party(num_voters: int = None, params: dict = None) -> list:
@@ -74,28 +84,17 @@ def generate_ic_party(num_voters: int = None, params: dict = None) -> list:
     num_parties = params['num_parties']
     party_size = params['num_winners']
 
-    votes = np.zeros([num_voters, num_parties], dtype=int)
-
-    for j in range(num_voters):
-        votes[j] = np.random.permutation(num_parties)
-
-    new_votes = [[] for _ in range(num_voters)]
-    for i in range(num_voters):
-        for j in range(num_parties):
-            for w in range(party_size):
-                _id = votes[i][j] * party_size + w
-                new_votes[i].append(_id)
-    return new_votes
+    votes = sample_permutations(num_voters, num_parties)
+    new_votes = votes[:, :, np.newaxis] * party_size + np.arange(party_size)
+    return new_votes.reshape(num_voters, num_parties * party_size).tolist()
 
 
 def generate_roommates_ic_votes(num_agents: int = None, params=None):
 
-        votes = np.zeros([num_agents, num_agents-1], dtype=int)
-        for j in range(num_agents):
-            base = np.random.permutation(num_agents)
-            base = base[base != j]
-            votes[j] = base
-        return votes
+        # agent j ranks itself last, so that it can be dropped from its own vote
+        keys = np.random.random((num_agents, num_agents))
+        np.fill_diagonal(keys, 2.)
+        return np.argsort(keys, axis=1)[:, :-1]
 
 # # # # # # # # # # # # # # # #
 # LAST CLEANUP ON: 14.10.2021 #
@@ -56,60 +56,57 @@ def computeInsertionProbas(i, phi):
     return probas
 
 
-def weighted_choice(choices):
-    total = 0
-    for w in choices:
-        total = total + w
-    r = np.random.uniform(0, total)
-    upto = 0.0
-    for i, w in enumerate(choices):
-        if upto + w >= r:
-            return i
-        upto = upto + w
-    assert False, "Shouldn't get here"
-
-
-def mallowsVote(m, insertion_probabilites_list):
-    vote = [0]
-    for i in range(1, m):
-        index = weighted_choice(insertion_probabilites_list[i - 1])
-        vote.insert(index, i)
-    return vote
+def sample_insertion_positions(num_voters, num_candidates, phi) -> np.ndarray:
+    """ Return: (num_voters, num_candidates) array, where [v][i] is the position at which
+    candidate i is inserted into the vote of voter v (among candidates 0, ..., i-1) """
+    positions = np.zeros([num_voters, num_candidates], dtype=int)
+    if num_candidates < 2:
+        return positions
+    randoms = np.random.uniform(0, 1, size=(num_voters, num_candidates - 1))
+    for i in range(1, num_candidates):
+        cdf = np.cumsum(computeInsertionProbas(i, phi))
+        positions[:, i] = np.searchsorted(cdf, randoms[:, i - 1] * cdf[-1])
+    return np.minimum(positions, np.arange(num_candidates))
+
+
+def insertion_positions_to_votes(positions, block_size=1000) -> np.ndarray:
+    """ Return: votes obtained by inserting the candidates at given positions """
+    num_voters, num_candidates = positions.shape
+    dtype = np.int16 if num_candidates < 2 ** 15 else int
+    votes = np.zeros([num_voters, num_candidates], dtype=dtype)
+    columns = np.arange(num_candidates)
+    for start in range(0, num_voters, block_size):
+        block = votes[start:start + block_size]
+        rows = np.arange(len(block))
+        for i in range(1, num_candidates):
+            position = positions[start:start + block_size, i]
+            block[:, 1:i + 1] = np.where(columns[1:i + 1] > position[:, np.newaxis],
+                                         block[:, 0:i], block[:, 1:i + 1])
+            block[rows, position] = i
+    return votes.astype(int)
 
 
 def generate_mallows_votes(num_voters, num_candidates, params):
-    insertion_probabilites_list = []
-    for i in range(1, num_candidates):
-        insertion_probabilites_list.append(computeInsertionProbas(i, params['phi']))
-    V = []
-    for i in range(num_voters):
-        vote = mallowsVote(num_candidates, insertion_probabilites_list)
-        if 'weight' in params and params['weight'] > 0:
-            probability = np.random.random()
-            if probability <= params['weight']:
-                vote.reverse()
-        V += [vote]
-    return V
+    positions = sample_insertion_positions(num_voters, num_candidates, params['phi'])
+    votes = insertion_positions_to_votes(positions)
+    if 'weight' in params and params['weight'] > 0:
+        reverse = np.random.random(num_voters) <= params['weight']
+        votes[reverse] = votes[reverse, ::-1]
+    return votes
 
 
 def generate_norm_mallows_mixture_votes(num_voters, num_candidates, params):
+    size_1 = int((1-float(params['weight']))*num_voters)
+
     phi_1 = phi_from_norm_phi(num_candidates, float(params['norm-phi_1']))
     params_1 = {'weight': 0, 'phi': phi_1}
-    votes_1 = generate_mallows_votes(num_voters, num_candidates, params_1)
-
+    votes_1 = generate_mallows_votes(size_1, num_candidates, params_1)
 
     phi_2 = phi_from_norm_phi(num_candidates, float(params['norm-phi_2']))
     params_2 = {'weight': 1, 'phi': phi_2}
-    votes_2 = generate_mallows_votes(num_voters, num_candidates, params_2)
+    votes_2 = generate_mallows_votes(num_voters - size_1, num_candidates, params_2)
 
-    votes = []
-    size_1 = int((1-float(params['weight']))*num_voters)
-    for i in range(size_1):
-        votes.append(votes_1[i])
-    for i in range(size_1, num_voters):
-        votes.append(votes_2[i])
-
-    return votes
+    return np.concatenate([votes_1, votes_2])
 
 
 def calculateZpoly(m):
@@ -194,7 +191,7 @@ def generate_mallows_party(num_voters=None, num_candidates=None,
     party_size = num_winners
 
     params['phi'] = phi_from_relphi(num_parties, relphi=params['main-phi'])
-    mapping = generate_mallows_votes(num_voters, num_parties, params)[0]
+    mapping = generate_mallows_votes(1, num_parties, params)[0]
 
     params['phi'] = phi_from_relphi(num_parties, relphi=params['norm-phi'])
     votes = generate_mallows_votes(num_voters, num_parties, params)
@@ -461,7 +458,7 @@ def generate_approval_truncated_mallows_votes(num_voters=None, num_candidates=No
         #     k = int(np.random.normal(params['p'],
         #                              params['norm-phi'] / (num_candidates ** 0.5)) * num_candidates)
             # k = int(np.random.normal(params['p'], 0.05) * num_candidates)
-        votes.append(set(ordinal_votes[v][0:k]))
+        votes.append(set(ordinal_votes[v][0:k].tolist()))
 
     return votes
 
@@ -1,5 +1,10 @@
 #!/usr/bin/env python
 
+import math
+import os
+import tempfile
+from bisect import bisect_right
+from itertools import accumulate, chain, permutations
 from random import *
 from timeit import default_timer as timer
 
@@ -48,7 +53,7 @@ def generate_ordinal_single_crossing_votes(num_voters: int = None,
     # elif domain_id == 'naive_pf':
     #     domain = naive_sampler.sample()
     elif domain_id == 'uniform':
-        return uniform_sampler.sampleElection()
+        return sample_single_crossing_election(num_voters, num_candidates)
     else:
         print('No such domain!')
         domain = []
@@ -97,168 +102,252 @@ def get_single_crossing_vectors(num_candidates: int) -> np.ndarray:
 
 
 ######################
-
-
-all_computed = 0  # internal counter
-
-SC_ELECTION = dict()  # function mapping (vote,n) to the number of single-crossing elections that include vote and n-1 other votes
-
-
-class SCNode:
-    def __init__(self, vote):
-        self.vote = tuple(vote)
-        self.next = []  # all next nodes reachable via single swap
-        self.all_next = set()  # all next nodes reachable via any number of swaps
-        self.era = 0  # era for search through the graph
-        self.domains = -1  # number of different domains that can be
-        # generated starting with this vote
-
-    def count_domains(self):
-        if self.domains != -1:
-            return self.domains
-        if len(self.next) == 0:
-            self.domains = 1
-            return 1
-
-        self.domains = 0
-        for node in self.next:
-            self.domains += node.count_domains()
-        return self.domains
-
-    def sample_domain(self):
-        D = [self.vote]
-        if len(self.next) == 0: return D
-        S = 0
-        for node in self.next:
-            S += node.count_domains()
-        R = randrange(S)
-        T = 0
-        for node in self.next:
-            T += node.count_domains()
-            if R < T:
-                return D + node.sample_domain()
-
-    def sample_domain_naive(self):
-        D = [self.vote]
-        if len(self.next) == 0: return D
-        node = choice(self.next)
-        return D + node.sample_domain_naive()
-
-    def domains_difference(self):
-        if len(self.next) == 0: return 0
-        A = max(node.count_domains() for node in self.next)
-        B = min(node.count_domains() for node in self.next)
-        for node in self.next:
-            print(f"d: {node.count_domains()}")
-        print(f"A: {A}, B:{B}, A-B:{A - B}")
-        return A - B
-
-    def generate_all_next(self):
-        global all_computed
-        if self.all_next: return
-        for node in self.next:
-            node.generate_all_next()
-            self.all_next |= node.all_next
-        self.all_next.add(self.vote)
-        all_computed += 1
-        # print( all_computed, self.all_next )
-
-    def count_elections(self, n, nodes):
-        if n == 0: return 0
-        if n == 1: return 1
-        if (self.vote, n) in SC_ELECTION:
-            return SC_ELECTION[(self.vote, n)]
-
-        S = 0
-        for vote in self.all_next:
-            S += nodes[vote].count_elections(n - 1, nodes)
-        SC_ELECTION[(self.vote, n)] = S
-        # print( SC_ELECTION[ (self.vote, n) ] )
-        return SC_ELECTION[(self.vote, n)]
-
-    def sample_election(self, n, nodes):
-        E = [self.vote]
-        if n == 1: return E
-        S = 0
-        for vote in self.all_next:
-            S += nodes[vote].count_elections(n - 1, nodes)
-        R = randrange(S)
-        T = 0
-        for vote in self.all_next:
-            T += nodes[vote].count_elections(n - 1, nodes)
-            if R < T:
-                return E + nodes[vote].sample_election(n - 1, nodes)
-
-
-def makeSCgraph(m):
-    nodes = {}
-    vote = list(range(m))
-    node = SCNode(vote)
-    nodes[tuple(vote)] = node
-
-    def recSCgraph(node):
-        vote = list(node.vote)
-        for i in range(m - 1):
-            if vote[i] < vote[i + 1]:
-                nv = vote.copy()
-                nv[i], nv[i + 1] = nv[i + 1], nv[i]
-                tp = tuple(nv)
-                if not (tp in nodes):
-                    nd = SCNode(nv)
-                    nodes[tp] = nd
-                    recSCgraph(nd)
-                nd = nodes[tp]
-                node.next.append(nd)
-
-    recSCgraph(node)
-    return nodes
-
-
-def visitSC(node, f, new_era):
-    """visit all votes that can follow the one in node and call f on each"""
-    m = len(node.vote)
-    v = list(node.vote)
-    f(node)
-    node.era = new_era
-    for new_node in node.next:
-        if new_node.era != new_era:
-            visitSC(new_node, f, new_era)
-
-
-def getSCDomainSampler(m):
-    nodes = makeSCgraph(m)
-    top = tuple(range(m))
-    return nodes[top]
+# Uniform sampling of single-crossing domains and elections.
+#
+# Votes are the vertices of the weak order: w >= v if w can be obtained from v by swapping
+# adjacent candidates that are in the increasing order (each swap adds one inversion).
+# A maximal single-crossing domain is a maximal chain from the identity to the reversed
+# vote, and a single-crossing election (with the first vote equal to the identity)
+# is a chain v_1 <= v_2 <= ... <= v_n. Both are sampled uniformly from exact counts,
+# which are stored in cache/single_crossing, so they are computed only once per
+# (num_candidates, num_voters). The tables grow with m!, which limits the exact
+# sampler to about 8 candidates.
+
+# upper bound on the size (in bytes) of the table with election counts
+MAX_TABLE_SIZE = 2 ** 30
+
+_TABLES = {}  # tables already loaded by this process
+
+
+def get_weak_order(num_candidates: int) -> (np.ndarray, np.ndarray, np.ndarray):
+    """ Return: all votes sorted by the number of inversions, their inversion sets
+    (as bit masks), and for each vote and position i the index of the vote with
+    candidates at positions i, i+1 swapped (-1 if the swap does not add an inversion) """
+    m = num_candidates
+    votes = np.fromiter(chain.from_iterable(permutations(range(m))), dtype=np.int8,
+                        count=math.factorial(m) * m).reshape(-1, m)
+    pairs = [(i, j) for i in range(m) for j in range(i + 1, m)]
+
+    masks = np.zeros(len(votes), dtype=np.int64)
+    positions = np.argsort(votes, axis=1)
+    for k, (a, b) in enumerate(pairs):
+        masks |= (positions[:, a] > positions[:, b]).astype(np.int64) << k
+    num_inversions = np.zeros(len(votes), dtype=int)
+    for k in range(len(pairs)):
+        num_inversions += (masks >> k) & 1
+
+    # votes are generated in the lexicographic order, so their ranks give the row indices
+    order = np.argsort(num_inversions, kind='stable')
+    index = np.empty(len(votes), dtype=np.int32)
+    index[order] = np.arange(len(votes))
+    votes = votes[order]
+    masks = masks[order]
+
+    successors = np.full([len(votes), max(m - 1, 0)], -1, dtype=np.int32)
+    for i in range(m - 1):
+        ascent = votes[:, i] < votes[:, i + 1]
+        swapped = votes[ascent].copy()
+        swapped[:, [i, i + 1]] = swapped[:, [i + 1, i]]
+        successors[ascent, i] = index[_lexicographic_ranks(swapped)]
+
+    return votes, masks, successors
+
+
+def _lexicographic_ranks(votes: np.ndarray) -> np.ndarray:
+    m = votes.shape[1]
+    ranks = np.zeros(len(votes), dtype=np.int64)
+    for i in range(m):
+        smaller_later = (votes[:, i + 1:] < votes[:, i:i + 1]).sum(axis=1)
+        ranks += smaller_later * math.factorial(m - 1 - i)
+    return ranks
+
+
+def _follow(values: np.ndarray, successors: np.ndarray) -> np.ndarray:
+    """ Return: values of the successors (zero where there is no successor) """
+    return np.where(successors >= 0, values[successors], 0)
+
+
+def sum_over_up_sets(values: np.ndarray, successors: np.ndarray) -> np.ndarray:
+    """ Return: for each vote v, the sum of values of all the votes w >= v """
+    # every w >= v is reached from v exactly once by applying c_1 c_2 ... c_{m-1},
+    # where c_k is one of: nothing, s_k, s_k s_{k-1}, ..., s_k s_{k-1} ... s_1
+    # (s_i swaps positions i and i+1, and has to add an inversion each time)
+    m = successors.shape[1] + 1
+    sums = values
+    for k in range(m - 1, 0, -1):
+        run = sums
+        for j in range(2, k + 1):
+            run = sums + _follow(run, successors[:, j - 2])
+        sums = sums + _follow(run, successors[:, k - 1])
+    return sums
+
+
+def count_domains(masks: np.ndarray, successors: np.ndarray) -> np.ndarray:
+    """ Return: for each vote, the number of maximal chains from it to the reversed vote """
+    num_inversions = np.zeros(len(masks), dtype=int)
+    for k in range(64):
+        num_inversions += (masks >> k) & 1
+    domains = np.ones(len(successors), dtype=object)
+    # successors have one more inversion, so we go level by level from the top
+    for level in range(num_inversions.max() - 1, -1, -1):
+        votes = np.flatnonzero(num_inversions == level)
+        domains[votes] = sum(_follow(domains, successors[votes, i])
+                             for i in range(successors.shape[1]))
+    return domains
+
+
+def count_elections(successors: np.ndarray, num_voters: int) -> list:
+    """ Return: list of arrays, the t-th one with, for each vote v, the number of
+    single-crossing elections with t+1 voters whose first vote is v """
+    counts = [np.ones(len(successors), dtype=object)]
+    for _ in range(num_voters - 1):
+        counts.append(sum_over_up_sets(counts[-1], successors))
+    return counts
+
+
+def _ints_to_bytes(values, width: int) -> np.ndarray:
+    return np.frombuffer(b''.join(int(value).to_bytes(width, 'little') for value in values),
+                         dtype=np.uint8).reshape(len(values), width)
+
+
+def _bytes_to_ints(rows: np.ndarray) -> list:
+    return [int.from_bytes(row.tobytes(), 'little') for row in rows]
+
+
+def _get_cache_path(file_name: str) -> str:
+    path = os.path.join(os.getcwd(), 'cache', 'single_crossing')
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, file_name)
+
+
+def _store_in_cache(path: str, store) -> None:
+    """ Write the file under a temporary name and then rename it, so that processes
+    computing the same table in parallel never see a partially written file """
+    directory, file_name = os.path.split(path)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=f'.{file_name}.')
+    try:
+        with os.fdopen(descriptor, 'wb') as file_:
+            store(file_)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def get_single_crossing_tables(num_candidates: int, num_voters: int = None) -> dict:
+    """ Return: weak order (votes, masks, successors) with domain counts and, if num_voters
+    is given, election counts (as a memory-mapped byte array), loaded from the cache
+    or computed (and stored) on first use """
+    key = (num_candidates, num_voters)
+    if key in _TABLES:
+        return _TABLES[key]
+
+    path = _get_cache_path(f'weak_order_{num_candidates}.npz')
+    if not os.path.isfile(path):
+        votes, masks, successors = get_weak_order(num_candidates)
+        _store_in_cache(path, lambda file_: np.savez(file_, votes=votes, masks=masks,
+                                                     successors=successors))
+    with np.load(path) as weak_order:
+        tables = {name: weak_order[name] for name in ['votes', 'masks', 'successors']}
+    votes, successors = tables['votes'], tables['successors']
+
+    path = _get_cache_path(f'domains_{num_candidates}.npy')
+    if not os.path.isfile(path):
+        domains = count_domains(tables['masks'], successors)
+        domains = _ints_to_bytes(domains, (int(domains[0]).bit_length() + 7) // 8)
+        _store_in_cache(path, lambda file_: np.save(file_, domains))
+    tables['domains'] = np.load(path, mmap_mode='r')
+
+    if num_voters is not None:
+        path = _get_cache_path(f'elections_{num_candidates}_{num_voters}.npy')
+        if not os.path.isfile(path):
+            # the number of elections is at most (m!)^(n-1)
+            width = ((num_voters - 1) * len(votes).bit_length() + 8) // 8
+            if len(votes) * num_voters * width > MAX_TABLE_SIZE:
+                raise ValueError(f'Uniform single-crossing sampler is too large for '
+                                 f'{num_candidates} candidates and {num_voters} voters!')
+            counts = count_elections(successors, num_voters)
+            width = (int(counts[-1][0]).bit_length() + 7) // 8
+            table = np.stack([_ints_to_bytes(level, width) for level in counts])
+            _store_in_cache(path, lambda file_: np.save(file_, table))
+        tables['elections'] = np.load(path, mmap_mode='r')
+
+    _TABLES[key] = tables
+    return tables
+
+
+def _weighted_choice(options: np.ndarray, weights: list) -> int:
+    """ Return: option chosen with probability proportional to its (big integer) weight """
+    cumulative = list(accumulate(weights))
+    return options[bisect_right(cumulative, randrange(cumulative[-1]))]
+
+
+def sample_single_crossing_domain(num_candidates: int) -> np.ndarray:
+    """ Return: maximal single-crossing domain chosen uniformly at random """
+    tables = get_single_crossing_tables(num_candidates)
+    successors = tables['successors']
+    x = 0
+    domain = [x]
+    while (successors[x] >= 0).any():
+        options = successors[x][successors[x] >= 0]
+        x = _weighted_choice(options, _bytes_to_ints(tables['domains'][options]))
+        domain.append(x)
+    return tables['votes'][domain].astype(int)
+
+
+def sample_single_crossing_election(num_voters: int, num_candidates: int) -> np.ndarray:
+    """ Return: single-crossing election (with identity as the first vote)
+    chosen uniformly at random """
+    tables = get_single_crossing_tables(num_candidates, num_voters)
+    masks = tables['masks']
+    x = 0
+    election = [x]
+    for t in range(num_voters - 2, -1, -1):
+        # votes above x in the weak order (they all come after x)
+        options = x + np.flatnonzero((masks[x:] & masks[x]) == masks[x])
+        x = _weighted_choice(options, _bytes_to_ints(tables['elections'][t][options]))
+        election.append(x)
+    return tables['votes'][election].astype(int)
+
+
+def get_naive_single_crossing_domain(num_candidates: int) -> np.ndarray:
+    """ Return: maximal single-crossing domain, where each next vote is obtained
+    by a swap chosen uniformly among the possible ones """
+    tables = get_single_crossing_tables(num_candidates)
+    successors = tables['successors']
+    x = 0
+    domain = [x]
+    while (successors[x] >= 0).any():
+        x = choice(successors[x][successors[x] >= 0])
+        domain.append(x)
+    return tables['votes'][domain].astype(int)
 
 
 ### classes for sampling single-crossing domains uniformly
-### at random and naively (they work in reasonable time until m = 10
-### candidates
+### at random and naively
 
 class scDomainUniformSampler:
     def __init__(self, m):
-        self.nodes = makeSCgraph(m)
-        self.top = tuple(range(m))
-        self.top_node = self.nodes[self.top]
+        self.m = m
+        self.n = None
 
     def sample(self):
-        return self.top_node.sample_domain()
+        return sample_single_crossing_domain(self.m)
 
     def prepareElectionSampler(self, n):
         self.n = n
-        self.top_node.generate_all_next()
-        self.top_node.count_elections(n, self.nodes)
+        get_single_crossing_tables(self.m, n)
 
     def sampleElection(self):
-        return self.top_node.sample_election(self.n, self.nodes)
+        return sample_single_crossing_election(self.n, self.m)
 
 
 class scDomainNaiveSampler:
     def __init__(self, m):
-        self.node = getSCDomainSampler(m)
+        self.m = m
 
     def sample(self):
-        return self.node.sample_domain_naive()
+        return get_naive_single_crossing_domain(self.m)
 
 
 ### run an experiment
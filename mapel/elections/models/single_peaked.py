@@ -13,91 +13,67 @@ def generate_sp_party(model=None, num_voters=None, num_candidates=None, params=N
             _id = j * params['num_winners'] + w
             candidates[_id] = [np.random.normal(params['party'][j][0], params['var'])]
 
-    mapping = [x for _, x in sorted(zip(candidates, _ids))]
+    mapping = np.array([x for _, x in sorted(zip(candidates, _ids))])
 
     if model == 'conitzer_party':
         votes = generate_ordinal_sp_conitzer_votes(num_voters=num_voters, num_candidates=num_candidates)
     elif model == 'walsh_party':
         votes = generate_ordinal_sp_walsh_votes(num_voters=num_voters, num_candidates=num_candidates)
-    for i in range(num_voters):
-        for j in range(num_candidates):
-            votes[i][j] = mapping[votes[i][j]]
-
-    return votes
+    return mapping[votes]
 
 
 def generate_ordinal_sp_conitzer_votes(num_voters=None, num_candidates=None) -> np.ndarray:
     """ helper function: generate conitzer single-peaked elections """
 
-    votes = np.zeros([num_voters, num_candidates])
-    for j in range(num_voters):
-        votes[j][0] = np.random.choice(range(num_candidates))
-        left = votes[j][0] - 1
-        right = votes[j][0] + 1
-        for k in range(1, num_candidates):
-            side = np.random.choice([0, 1])
-            if side == 0:
-                if left >= 0:
-                    votes[j][k] = left
-                    left -= 1
-                else:
-                    votes[j][k] = right
-                    right += 1
-            else:
-                if right < num_candidates:
-                    votes[j][k] = right
-                    right += 1
-                else:
-                    votes[j][k] = left
-                    left -= 1
-
+    peaks, lefts, is_left = _sample_sides(num_voters, num_candidates)
+    k = np.arange(1, num_candidates)
+    # a coin is followed until its side of the axis is exhausted,
+    # from then on all the remaining candidates come from the other side
+    num_right = num_candidates - 1 - peaks[:, np.newaxis]
+    lefts = np.clip(lefts, k - num_right, peaks[:, np.newaxis])
+    is_left = np.diff(lefts, axis=1, prepend=0) > 0
+    rights = k - lefts
+
+    votes = np.empty([num_voters, num_candidates], dtype=int)
+    votes[:, 0] = peaks
+    votes[:, 1:] = np.where(is_left, peaks[:, np.newaxis] - lefts, peaks[:, np.newaxis] + rights)
     return votes
 
 
 def generate_ordinal_spoc_conitzer_votes(num_voters=None, num_candidates=None) -> np.ndarray:
     """ helper function: generate spoc_conitzer single-peaked elections"""
 
-    votes = np.zeros([num_voters, num_candidates])
-
-    for j in range(num_voters):
-        votes[j][0] = np.random.choice(range(num_candidates))
-        left = votes[j][0] - 1
-        left %= num_candidates
-        right = votes[j][0] + 1
-        right %= num_candidates
-        for k in range(1, num_candidates):
-            side = np.random.choice([0, 1])
-            if side == 0:
-                votes[j][k] = left
-                left -= 1
-                left %= num_candidates
-            else:
-                votes[j][k] = right
-                right += 1
-                right %= num_candidates
+    peaks, lefts, is_left = _sample_sides(num_voters, num_candidates)
+    rights = np.arange(1, num_candidates) - lefts
 
-    return votes
+    votes = np.empty([num_voters, num_candidates], dtype=int)
+    votes[:, 0] = peaks
+    votes[:, 1:] = np.where(is_left, peaks[:, np.newaxis] - lefts, peaks[:, np.newaxis] + rights)
+    return votes % num_candidates
 
 
 def generate_ordinal_sp_walsh_votes(num_voters=None, num_candidates=None) -> np.ndarray:
     """ helper function: generate walsh single-peaked elections"""
 
-    votes = np.zeros([num_voters, num_candidates])
+    # the vote is built from the last position: each time the leftmost or the
+    # rightmost of the remaining candidates (with equal probability) is placed
+    _, lefts, is_left = _sample_sides(num_voters, num_candidates)
+    rights = np.arange(1, num_candidates) - lefts
 
-    for j in range(num_voters):
-        votes[j] = walsh_sp(0, num_candidates - 1)
-
-    return votes.astype(int)
+    votes = np.empty([num_voters, num_candidates], dtype=int)
+    votes[:, :0:-1] = np.where(is_left, lefts - 1, num_candidates - rights)
+    votes[:, 0] = lefts[:, -1] if num_candidates > 1 else 0
+    return votes
 
 
 # AUXILIARY
-def walsh_sp(a, b):
-    if a == b:
-        return [a]
-    elif np.random.choice([0, 1]) == 0:
-        return walsh_sp(a + 1, b) + [a]
-    else:
-        return walsh_sp(a, b - 1) + [b]
+def _sample_sides(num_voters, num_candidates) -> (np.ndarray, np.ndarray, np.ndarray):
+    """ Return: uniformly random peaks, number of left moves among the first k steps,
+    and whether the k-th step goes left (a fair coin for each voter and step) """
+    peaks = np.random.randint(0, num_candidates, num_voters)
+    is_left = np.random.randint(0, 2, [num_voters, num_candidates - 1]) == 0
+    lefts = np.cumsum(is_left, axis=1)
+    return peaks, lefts, is_left
 
 
 ### MATRICES ###
@@ -2,56 +2,42 @@
 
 import numpy as np
 
+from mapel.elections.models.impartial import sample_permutations, sample_approval_matrix, \
+    sample_urn_sources
+
+
+def sample_urn_decisions(num_voters: int, alpha: float) -> np.ndarray:
+    """ Return: boolean vector marking the votes that are drawn fresh (and not copied) """
+    # before the j-th draw the urn contains 1 + alpha * j "balls"
+    rho = np.random.uniform(0, 1. + alpha * np.arange(num_voters))
+    return rho <= 1.
+
 
 def generate_urn_votes(num_voters: int = None, num_candidates: int = None,
                        params: dict = None) -> np.ndarray:
     """ Return: ordinal votes from Polya-Eggenberger model_id """
-
-    votes = np.zeros([num_voters, num_candidates])
-    urn_size = 1.
-    for j in range(num_voters):
-        rho = np.random.uniform(0, urn_size)
-        if rho <= 1.:
-            votes[j] = np.random.permutation(num_candidates)
-        else:
-            votes[j] = votes[np.random.randint(0, j)]
-        urn_size += params['alpha']
-
-    return votes
+    is_new = sample_urn_decisions(num_voters, params['alpha'])
+    sources = sample_urn_sources(is_new)
+    return sample_permutations(int(is_new.sum()), num_candidates)[sources]
 
 
 def generate_approval_urn_votes(num_voters: int = None, num_candidates: int = None,
-                                params: dict = None) -> list:
-    """ Return: approval votes from Polya-Eggenberger model_id """
-
-    votes = []
-    urn_size = 1.
-    for j in range(num_voters):
-        rho = np.random.uniform(0, urn_size)
-        if rho <= 1.:
-            vote = set()
-            for c in range(num_candidates):
-                if np.random.random() <= params['p']:
-                    vote.add(c)
-            votes.append(vote)
-        else:
-            votes.append(votes[np.random.randint(0, j)])
-        urn_size += params['alpha']
-
-    return votes
+                                params: dict = None) -> np.ndarray:
+    """ Return: approval votes (as boolean matrix) from Polya-Eggenberger model_id """
+    is_new = sample_urn_decisions(num_voters, params['alpha'])
+    sources = sample_urn_sources(is_new)
+    return sample_approval_matrix(int(is_new.sum()), num_candidates, params['p'])[sources]
 
 
 def generate_approval_truncated_urn_votes(num_voters: int = None, num_candidates: int = None,
-                                params: dict = None) -> list:
+                                params: dict = None) -> np.ndarray:
 
     ordinal_votes = generate_urn_votes(num_voters=num_voters, num_candidates=num_candidates,
                                        params=params)
 
-    votes = []
     k = int(params['p'] * num_candidates)
-    for v in range(num_voters):
-        votes.append(set(ordinal_votes[v][0:k]))
-
+    votes = np.zeros([num_voters, num_candidates], dtype=bool)
+    votes[np.arange(num_voters)[:, np.newaxis], ordinal_votes[:, 0:k]] = True
     return votes
 
 # # # # # # # # # # # # # # # #
@@ -17,6 +17,7 @@ import mapel.elections.models.single_crossing as single_crossing
 import mapel.elections.models.single_peaked as single_peaked
 import mapel.elections.models.urn_model as urn_model
 from mapel.elections._glossary import *
+from mapel.elections._binary_elections import store_binary_election
 
 
 def generate_approval_votes(model_id: str = None, num_candidates: int = None,
@@ -133,7 +134,9 @@ def generate_ordinal_votes(model_id: str = None, num_candidates: int = None, num
         votes = []
         print("No such election model_id!", model_id)
 
-    if model_id not in LIST_OF_FAKE_MODELS:
+    if isinstance(votes, np.ndarray):
+        votes = votes.astype(int).tolist()
+    elif model_id not in LIST_OF_FAKE_MODELS:
         votes = [[int(x) for x in row] for row in votes]
 
     return votes
@@ -142,10 +145,17 @@ def generate_ordinal_votes(model_id: str = None, num_candidates: int = None, num
 
 
 def store_approval_election(experiment, model_id, election_id, num_candidates, num_voters,
-                            params, ballot):
-    """ Store approval election in an .app file """
+                            params, ballot, votes=None, file_format: str = 'text'):
+    """ Store approval election in an .app file (or in the binary format) """
 
-    if model_id in APPROVAL_FAKE_MODELS:
+    if file_format == 'binary':
+        fake = model_id in APPROVAL_FAKE_MODELS
+        if votes is None and not fake:
+            votes = experiment.votes
+        store_binary_election(experiment.experiment_id, election_id, model_id, num_candidates,
+                              num_voters, params, ballot, votes=votes, fake=fake)
+
+    elif model_id in APPROVAL_FAKE_MODELS:
         path = os.path.join("experiments", str(experiment.experiment_id),
                             "elections", (str(election_id) + ".app"))
         file_ = open(path, 'w')
@@ -159,7 +169,7 @@ def store_approval_election(experiment, model_id, election_id, num_candidates, n
                             (str(election_id) + ".app"))
 
         store_votes_in_a_file(experiment, model_id, election_id, num_candidates, num_voters,
-                              params, path, ballot)
+                              params, path, ballot, votes=votes)
 
 
 
@@ -168,6 +178,8 @@ def store_votes_in_a_file(election, model_id, election_id, num_candidates, num_v
     """ Store votes in a file """
     if votes is None:
         votes = election.votes
+    if ballot == 'approval' and isinstance(votes, np.ndarray):
+        votes = [np.flatnonzero(row).tolist() for row in votes]
 
     with open(path, 'w') as file_:
 
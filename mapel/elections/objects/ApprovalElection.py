@@ -6,7 +6,7 @@ import os
 import numpy as np
 
 from mapel.elections._glossary import *
-from mapel.main._inner_distances import hamming
+from mapel.elections._binary_elections import binary_election_exists, import_binary_election
 from mapel.elections.objects.Election import Election
 
 
@@ -22,19 +22,31 @@ class ApprovalElection(Election):
 
         self.approvalwise_vector = []
         self.coapproval_frequency_vectors = []
+        self.coapproval_frequency_vector_type = None
         self.voterlikeness_vectors = []
+        self.voterlikeness_vector_type = None
         self.pairwise_matrix = []
         self.candidatelikeness_original_vectors = []
         self.candidatelikeness_sorted_vectors = []
         self.model = model_id
+        self.params = None
         self.hamming_candidates = []
         self.reverse_approvals = []
 
-        if _import:
+        if _import and binary_election_exists(experiment_id, election_id, 'app'):
+            self.votes, _, self.num_voters, self.num_candidates, self.params, \
+                self.model, self.fake = import_binary_election(experiment_id, election_id, shift)
+            self.model_id = self.model
+            self.alpha = 1
+            if self.params and 'alpha' in self.params:
+                self.alpha = self.params['alpha']
+        elif _import:
             fake = check_if_fake(experiment_id, election_id)
             if fake:
                 self.model, self.params, self.num_voters, self.num_candidates = \
                     import_fake_app_election(experiment_id, election_id)
+                self.model_id = self.model
+                self.fake = True
             else:
                 self.votes, self.num_voters, self.num_candidates, self.params, \
                     self.model = import_real_app_election(experiment_id, election_id, shift)
@@ -44,6 +56,55 @@ class ApprovalElection(Election):
                     self.alpha = 1
                     pass
 
+    @property
+    def votes(self):
+        """ Return: votes as a list of sets (a view of the approval matrix) """
+        if self._votes is None and self._approval_matrix is not None:
+            self._votes = approval_matrix_to_votes(self._approval_matrix)
+        return self._votes
+
+    @votes.setter
+    def votes(self, votes):
+        # votes can be given either as a list of sets or as a boolean approval matrix
+        if isinstance(votes, np.ndarray) and votes.dtype == bool:
+            self._approval_matrix = votes
+            self._votes = None
+        else:
+            self._approval_matrix = None
+            self._votes = votes
+        self._cached = {}
+
+    def get_approval_matrix(self) -> np.ndarray:
+        """ Return: (num_voters, num_candidates) boolean approval matrix """
+        if self._approval_matrix is None:
+            self._approval_matrix = votes_to_approval_matrix(self._votes, self.num_candidates)
+        return self._approval_matrix
+
+    def get_approvalwise_vector(self) -> np.ndarray:
+        if len(self.approvalwise_vector) == 0:
+            self.votes_to_approvalwise_vector()
+        return self.approvalwise_vector
+
+    def get_coapproval_frequency_vectors(self, vector_type='A') -> np.ndarray:
+        if self.coapproval_frequency_vector_type != vector_type:
+            self.votes_to_coapproval_frequency_vectors(vector_type=vector_type)
+        return self.coapproval_frequency_vectors
+
+    def get_voterlikeness_vectors(self, vector_type='hamming') -> np.ndarray:
+        if self.voterlikeness_vector_type != vector_type:
+            self.votes_to_voterlikeness_vectors(vector_type=vector_type)
+        return self.voterlikeness_vectors
+
+    def get_pairwise_matrix(self) -> np.ndarray:
+        if len(self.pairwise_matrix) == 0:
+            self.votes_to_pairwise_matrix()
+        return self.pairwise_matrix
+
+    def get_candidatelikeness_sorted_vectors(self) -> np.ndarray:
+        if len(self.candidatelikeness_sorted_vectors) == 0:
+            self.votes_to_candidatelikeness_sorted_vectors()
+        return self.candidatelikeness_sorted_vectors
+
     def votes_to_approvalwise_vector(self) -> None:
         """ Convert votes to ... """
 
@@ -59,65 +120,59 @@ class ApprovalElection(Election):
             self.approvalwise_vector = np.sort(get_skeleton_approvalwise_vector(self))
 
         else:
-            approvalwise_vector = np.zeros([self.num_candidates])
-            for vote in self.votes:
-                for c in vote:
-                    approvalwise_vector[c] += 1
-            approvalwise_vector = approvalwise_vector / self.num_voters
+            approvalwise_vector = self.get_approval_matrix().sum(axis=0) / self.num_voters
             self.approvalwise_vector = np.sort(approvalwise_vector)
 
     def votes_to_coapproval_frequency_vectors(self, vector_type='A') -> None:
         """ Convert votes to ... """
-        vectors = np.zeros([self.num_candidates, self.num_candidates * 2])
-        for vote in self.votes:
-            size = len(vote)
-            for c in range(self.num_candidates):
-                if c in vote:
-                    if vector_type in ['A', 'B']:
-                        vectors[c][size - 1] += 1
-                    elif vector_type == 'C':
-                        vectors[c][2 * size - 1] += 1
-                    elif vector_type in ['D', 'E']:
-                        vectors[c][self.num_candidates + size - 1] += 1
-                else:
-                    if vector_type == 'A':
-                        vectors[c][self.num_candidates + size] += 1
-                    elif vector_type == 'B':
-                        vectors[c][2 * self.num_candidates - size - 1] += 1
-                    elif vector_type == 'C':
-                        vectors[c][2 * size] += 1
-                    elif vector_type == 'D':
-                        vectors[c][size] += 1
-                    elif vector_type == 'E':
-                        vectors[c][self.num_candidates - size - 1] += 1
+        m = self.num_candidates
+        matrix = self.get_approval_matrix()
+        sizes = matrix.sum(axis=1)
+
+        # approved[c][size] -- number of votes of given size that approve c
+        votes_of_size = np.bincount(sizes, minlength=m + 1)
+        approved = _matmul(matrix.T, np.arange(m + 1) == sizes[:, np.newaxis])
+        disapproved = votes_of_size - approved
+
+        size = np.arange(m + 1)
+        approved_column, disapproved_column = {
+            'A': (size - 1, m + size),
+            'B': (size - 1, 2 * m - size - 1),
+            'C': (2 * size - 1, 2 * size),
+            'D': (m + size - 1, size),
+            'E': (m + size - 1, m - size - 1),
+        }.get(vector_type, (None, None))
+
+        vectors = np.zeros([m, m * 2])
+        if approved_column is not None:
+            for counts, columns in [(approved, approved_column),
+                                    (disapproved, disapproved_column)]:
+                nonzero = np.flatnonzero(counts.any(axis=0))
+                vectors[:, columns[nonzero]] += counts[:, nonzero]
         vectors = vectors / self.num_voters
         # vectors = vectors / experiment.num_candidates
         self.coapproval_frequency_vectors = vectors
+        self.coapproval_frequency_vector_type = vector_type
 
     def votes_to_pairwise_matrix(self) -> None:
         """ Convert votes to ... """
-        matrix = np.zeros([self.num_candidates, self.num_candidates])
-
-        for c_1 in range(self.num_candidates):
-            for c_2 in range(self.num_candidates):
-                for vote in self.votes:
-                    if (c_1 in vote and c_2 in vote) or (c_1 not in vote and c_2 not in vote):
-                        matrix[c_1][c_2] += 1
+        matrix = self.num_voters - self._count_candidate_disagreements()
         matrix = matrix / self.num_voters
         self.pairwise_matrix = matrix
 
     def votes_to_candidatelikeness_original_vectors(self) -> None:
         """ Convert votes to ... """
-        matrix = np.zeros([self.num_candidates, self.num_candidates])
-
-        for c_1 in range(self.num_candidates):
-            for c_2 in range(self.num_candidates):
-                for vote in self.votes:
-                    if (c_1 in vote and c_2 not in vote) or (c_1 not in vote and c_2 in vote):
-                        matrix[c_1][c_2] += 1
+        matrix = self._count_candidate_disagreements()
         matrix = matrix / self.num_voters
         self.candidatelikeness_original_vectors = matrix
 
+    def _count_candidate_disagreements(self) -> np.ndarray:
+        """ Return: matrix with numbers of votes that approve exactly one of two candidates """
+        matrix = self.get_approval_matrix()
+        approvals = matrix.sum(axis=0)
+        both = _matmul(matrix.T, matrix)
+        return approvals[:, np.newaxis] + approvals[np.newaxis, :] - 2 * both
+
     def votes_to_candidatelikeness_sorted_vectors(self) -> None:
         """ Convert votes to ... """
         self.votes_to_candidatelikeness_original_vectors()
@@ -126,27 +181,48 @@ class ApprovalElection(Election):
     def votes_to_voterlikeness_vectors(self, vector_type='hamming') -> None:
         """ Convert votes to ... """
 
-        vectors = np.zeros([self.num_voters, self.num_voters])
+        matrix = self.get_approval_matrix()
+        sizes = matrix.sum(axis=1)
+        intersections = _matmul(matrix, matrix.T)
 
-        for i in range(self.num_voters):
-            for j in range(self.num_voters):
-                set_a = self.votes[i]
-                set_b = self.votes[j]
-                if vector_type == 'hamming':
-                    vectors[i][j] = hamming(set_a, set_b)
-                elif vector_type == 'martin':
-                    vectors[i][j] = len(set_a.intersection(set_b)) - len(set_a)
-            vectors[i] = sorted(vectors[i])
+        if vector_type == 'hamming':
+            vectors = sizes[:, np.newaxis] + sizes[np.newaxis, :] - 2 * intersections
+        elif vector_type == 'martin':
+            vectors = intersections - sizes[:, np.newaxis]
+        else:
+            vectors = np.zeros([self.num_voters, self.num_voters])
 
-        self.voterlikeness_vectors = vectors
+        self.voterlikeness_vectors = np.sort(vectors.astype(float), axis=1)
+        self.voterlikeness_vector_type = vector_type
 
     def compute_reverse_approvals(self):
-        reverse_approvals = [set() for _ in range(self.num_candidates)]
-        for i, vote in enumerate(self.votes):
-            for c in vote:
-                reverse_approvals[c].add({i})
+        matrix = self.get_approval_matrix()
+        self.reverse_approvals = [set(np.flatnonzero(matrix[:, c]).tolist())
+                                  for c in range(self.num_candidates)]
+
+
+def votes_to_approval_matrix(votes: list, num_candidates: int = None) -> np.ndarray:
+    """ Return: (num_voters, num_candidates) boolean approval matrix """
+    sizes = np.array([len(vote) for vote in votes], dtype=int)
+    candidates = np.fromiter((c for vote in votes for c in vote), dtype=int,
+                             count=int(sizes.sum()))
+    if num_candidates is None:
+        num_candidates = int(candidates.max()) + 1 if len(candidates) else 0
+    matrix = np.zeros([len(votes), num_candidates], dtype=bool)
+    matrix[np.repeat(np.arange(len(votes)), sizes), candidates] = True
+    return matrix
+
+
+def approval_matrix_to_votes(matrix: np.ndarray) -> list:
+    """ Return: votes as a list of sets """
+    return [set(np.flatnonzero(row).tolist()) for row in matrix]
+
 
-        self.reverse_approvals = reverse_approvals
+def _matmul(matrix_1: np.ndarray, matrix_2: np.ndarray) -> np.ndarray:
+    """ Return: product of two 0/1 matrices as integer counts """
+    # float32 (BLAS) products are exact as long as the counts stay below 2^24
+    dtype = np.float32 if matrix_1.shape[1] < 2 ** 24 else np.float64
+    return (matrix_1.astype(dtype) @ matrix_2.astype(dtype)).round().astype(np.int64)
 
 
 def import_real_app_election(experiment_id: str, election_id: str, shift=False):
@@ -27,12 +27,14 @@ class ApprovalElectionExperiment(ElectionExperiment):
 
     def __init__(self, instances=None, distances=None, _import=True, shift=False,
                  coordinates=None, distance_id='emd-positionwise', experiment_id=None,
-                 instance_type='approval', dim=2, store=True):
+                 instance_type='approval', dim=2, store=True,
+                 lazy: bool = True, max_loaded_instances: int = None):
         self.shift = shift
         super().__init__(instances=instances, distances=distances,
                          coordinates=coordinates, distance_id=distance_id,
                          experiment_id=experiment_id, dim=dim, store=store,
-                         instance_type=instance_type, _import=_import)
+                         instance_type=instance_type, _import=_import, lazy=lazy,
+                         max_loaded_instances=max_loaded_instances)
 
     # def add_elections_to_experiment(self) -> dict:
     #     """ Return: elections imported from files """
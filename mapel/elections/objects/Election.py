@@ -2,6 +2,7 @@
 
 import copy
 import csv
+import hashlib
 import os
 
 import numpy as np
@@ -33,6 +34,32 @@ class Election(Instance):
         self.votes = votes
         self.model_id = model_id
 
+    @property
+    def votes(self):
+        return self._votes
+
+    @votes.setter
+    def votes(self, votes):
+        self._votes = votes
+        # precomputed data derived from the votes is no longer valid
+        self._cached = {}
+
+    @property
+    def potes(self) -> np.ndarray:
+        """ Return: positional votes (computed on first access) """
+        if 'potes' not in self._cached:
+            self._cached['potes'] = self.votes_to_potes()
+        return self._cached['potes']
+
+    @potes.setter
+    def potes(self, potes):
+        self._cached['potes'] = potes
+
+    def get_votes_array(self) -> np.ndarray:
+        """ Return: votes as an integer array (cached) """
+        if 'votes_array' not in self._cached:
+            self._cached['votes_array'] = np.asarray(self.votes, dtype=int)
+        return self._cached['votes_array']
 
     def import_matrix(self) -> np.ndarray:
 
@@ -47,9 +74,31 @@ class Election(Instance):
                     matrix[i][j] = row[candidate_id]
         return matrix
 
+    def get_hash(self) -> str:
+        """ Return: hash of the content of the election (votes or fake-model params)
+
+        Votes are sorted first, so the hash does not depend on the order of the voters
+        (which changes, e.g., when the election is stored and imported again) """
+        if self.fake or self.votes is None:
+            content = f'{self.ballot} {self.model_id} {self.params} ' \
+                      f'{self.num_candidates} {self.num_voters}'.encode()
+            return hashlib.sha1(content).hexdigest()
+        # hash of the votes is cached (until the votes change)
+        if 'hash' not in self._cached:
+            if self.ballot == 'approval':
+                votes = sorted(sorted(int(c) for c in vote) for vote in self.votes)
+                content = f'{self.num_candidates} {votes}'.encode()
+            else:
+                votes = np.asarray(self.votes, dtype=np.int64)
+                votes = votes[np.lexsort(votes.T[::-1])]
+                content = np.ascontiguousarray(votes).tobytes() + \
+                          f'{self.num_candidates} {self.num_voters}'.encode()
+            self._cached['hash'] = hashlib.sha1(content).hexdigest()
+        return self._cached['hash']
+
     def votes_to_potes(self) -> np.ndarray:
         """ Convert votes to positional votes """
-        return np.array([[vote.index(i) for i, _ in enumerate(vote)] for vote in self.votes])
+        return np.argsort(self.get_votes_array(), axis=1)
 
     def vector_to_interval(self, vector, precision=None) -> list:
         # discreet version for now
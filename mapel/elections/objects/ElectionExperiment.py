@@ -5,10 +5,14 @@ import itertools
 import os
 import warnings
 from abc import abstractmethod
+from functools import partial
+from multiprocessing.pool import ThreadPool
 from threading import Thread
 from time import sleep
 import ast
 
+from scipy import stats
+
 from mapel.elections.objects.ElectionFamily import ElectionFamily
 from mapel.elections.objects.OrdinalElection import OrdinalElection
 from mapel.elections.objects.ApprovalElection import ApprovalElection
@@ -19,6 +23,10 @@ import mapel.elections.features_main as features
 import mapel.elections.models.preflib as preflib
 from mapel.elections._glossary import *
 from mapel.main.objects.Experiment import Experiment
+from mapel.main._distance_cache import DistanceCache
+from mapel.main.objects.DistanceMatrix import DistanceMatrix, LandmarkDistanceMatrix
+from mapel.main.embedding.landmark_mds import compute_stress
+from mapel.main.objects.LazyInstances import LazyInstances
 import mapel.elections._print as pr
 from mapel.main._utils import *
 
@@ -66,28 +74,23 @@ class ElectionExperiment(Experiment):
             self.__dict__[name] = value
 
     def add_instances_to_experiment(self):
-        instances = {}
-
+        """ Return: elections of all the families (imported on first access if lazy) """
+        instance_ids = []
         for family_id in self.families:
             single = self.families[family_id].single
 
             ids = []
             for j in range(self.families[family_id].size):
                 instance_id = get_instance_id(single, family_id, j)
-
-                if self.instance_type == 'ordinal':
-                    instance = OrdinalElection(self.experiment_id, instance_id, _import=True)
-                elif self.instance_type == 'approval':
-                    instance = ApprovalElection(self.experiment_id, instance_id, _import=True)
-                else:
-                    instance = None
-
-                instances[instance_id] = instance
+                instance_ids.append(instance_id)
                 ids.append(str(instance_id))
 
             self.families[family_id].election_ids = ids
 
-        return instances
+        loader = partial(import_election, self.experiment_id, self.instance_type)
+        if self.lazy:
+            return LazyInstances(loader, instance_ids, max_loaded=self.max_loaded_instances)
+        return {instance_id: loader(instance_id) for instance_id in instance_ids}
 
     def set_default_num_candidates(self, num_candidates: int) -> None:
         """ Set default number of candidates """
@@ -207,8 +210,12 @@ class ElectionExperiment(Experiment):
     #                 matrix[i][j] = row[candidate_id]
     #     return matrix
 
-    def prepare_elections(self):
-        """ Prepare elections for a given experiment """
+    def prepare_elections(self, seed: int = None, num_workers: int = 1,
+                          file_format: str = 'text'):
+        """ Prepare elections for a given experiment
+
+        With a seed, the elections are reproducible regardless of num_workers.
+        file_format: 'text' (.soc files) or 'binary' (memory-mappable .npy files) """
 
         if self.instances is None:
             self.instances = {}
@@ -217,7 +224,10 @@ class ElectionExperiment(Experiment):
 
             new_instances = self.families[family_id].prepare_family(
                 store=self.store,
-                experiment_id=self.experiment_id)
+                experiment_id=self.experiment_id,
+                seed=seed,
+                num_workers=num_workers,
+                file_format=file_format)
 
             for instance_id in new_instances:
                 self.instances[instance_id] = new_instances[instance_id]
@@ -283,35 +293,28 @@ class ElectionExperiment(Experiment):
 
     def compute_distances(self, distance_id: str = 'emd-positionwise', num_threads: int = 1,
                           self_distances: bool = False, vector_type: str = 'A',
-                          printing: bool = False) -> None:
-        """ Compute distances between elections (using threads) """
+                          printing: bool = False, backend: str = 'thread',
+                          chunk_size: int = None, cache=None, qap_method: str = 'bnb',
+                          qap_time_limit: float = None) -> None:
+        """ Compute distances between elections (using threads or processes)
+
+        If cache is given (True or a DistanceCache), the distances already present in
+        the cache are reused and only the missing ones are computed.
+
+        Pairwise and voterlikeness distances match two matrices (a QAP). qap_method is
+        'bnb' (branch-and-bound, the default, which replaces the former integer linear
+        program), 'lp' (the former integer linear program) or 'heuristic' (local search
+        only). Both 'bnb' and 'lp' are exact; with qap_time_limit (seconds per pair),
+        branch-and-bound returns the best matching found so far instead, so the
+        distances depend on the speed of the machine. Such distances are only upper
+        bounds: their lower bounds are kept in self.lower_bounds and they are not
+        cached. """
 
         self.distance_id = distance_id
 
-        # precompute vectors, matrices, etc...
-        if '-approvalwise' in distance_id:
-            for election in self.elections.values():
-                election.votes_to_approvalwise_vector()
-        elif '-coapproval_frequency' in distance_id or 'flow' in distance_id:
-            for election in self.elections.values():
-                election.votes_to_coapproval_frequency_vectors(vector_type=vector_type)
-        elif '-voterlikeness' in distance_id:
-            for election in self.elections.values():
-                election.votes_to_voterlikeness_vectors(vector_type=vector_type)
-        elif '-candidatelikeness' in distance_id:
-            for election in self.elections.values():
-                # print(election)
-                election.votes_to_candidatelikeness_sorted_vectors()
-        elif '-pairwise' in distance_id:
-            for election in self.elections.values():
-                election.votes_to_pairwise_matrix()
-        # continue with normal code
-
         matchings = {election_id: {} for election_id in self.elections}
-        distances = {election_id: {} for election_id in self.elections}
-        times = {election_id: {} for election_id in self.elections}
-
-        threads = [{} for _ in range(num_threads)]
+        distances = DistanceMatrix(list(self.elections))
+        times = DistanceMatrix(list(self.elections))
 
         ids = []
         for i, election_1 in enumerate(self.elections):
@@ -322,22 +325,16 @@ class ElectionExperiment(Experiment):
                 elif i < j:
                     ids.append((election_1, election_2))
 
-        num_distances = len(ids)
-
-        for t in range(num_threads):
-            print(f'Starting thread: {t}')
-            sleep(0.1)
-            start = int(t * num_distances / num_threads)
-            stop = int((t + 1) * num_distances / num_threads)
-            thread_ids = ids[start:stop]
-
-            threads[t] = Thread(target=metr.run_single_thread, args=(self, thread_ids,
-                                                                     distances, times, matchings,
-                                                                     printing, t))
-            threads[t].start()
-
-        for t in range(num_threads):
-            threads[t].join()
+        if cache is True:
+            cache = DistanceCache()
+        lower_bounds = {}
+        num_imported = self._compute_distances_with_cache(
+            ids, distances, times, matchings, cache=cache, num_threads=num_threads,
+            vector_type=vector_type, printing=printing, backend=backend, chunk_size=chunk_size,
+            lower_bounds=lower_bounds,
+            qap_params={'method': qap_method, 'time_limit': qap_time_limit})
+        if cache is not None:
+            print(f'{num_imported} distances imported from cache')
 
         if self.store:
             self.store_distances_to_file(distance_id, distances, times)
@@ -345,9 +342,310 @@ class ElectionExperiment(Experiment):
         self.distances = distances
         self.times = times
         self.matchings = matchings
+        self.lower_bounds = lower_bounds
+
+    def add_instances_incremental(self, instances: dict = None, num_threads: int = 1,
+                                  vector_type: str = 'A', printing: bool = False,
+                                  backend: str = 'thread', chunk_size: int = None,
+                                  cache=None, embed: bool = True, qap_method: str = 'bnb',
+                                  qap_time_limit: float = None) -> list:
+        """ Add new elections to an existing map without recomputing the whole matrix
+
+        Only distances from the new elections (either given explicitly or already present
+        in self.elections but without distances) to all the elections are computed,
+        appended to the distance file, and the new points are placed among the fixed ones.
+        qap_method and qap_time_limit are as in compute_distances.
+        Return: ids of the new elections """
+
+        if instances is not None:
+            for election_id in instances:
+                self.elections[election_id] = instances[election_id]
+            self.num_elections = len(self.elections)
+
+        if not isinstance(self.distances, DistanceMatrix):
+            self.distances = DistanceMatrix.from_dict(self.distances or {})
+        if not isinstance(self.times, DistanceMatrix):
+            self.times = DistanceMatrix.from_dict(self.times or {},
+                                                  instance_ids=self.distances.instance_ids)
+
+        new_ids = [election_id for election_id in self.elections
+                   if election_id not in self.distances]
+        old_ids = [election_id for election_id in self.elections
+                   if election_id in self.distances]
+
+        ids = [(election_1, election_2) for election_2 in new_ids for election_1 in old_ids]
+        ids += list(itertools.combinations(new_ids, 2))
+
+        num_stored = len(self.distances)
+        self.distances.extend(new_ids)
+        self.times.extend(new_ids)
+        for election_id in self.elections:
+            self.matchings.setdefault(election_id, {})
+
+        if cache is True:
+            cache = DistanceCache()
+        self._compute_distances_with_cache(ids, self.distances, self.times, self.matchings,
+                                           cache=cache, num_threads=num_threads,
+                                           vector_type=vector_type, printing=printing,
+                                           backend=backend, chunk_size=chunk_size,
+                                           lower_bounds=self.lower_bounds,
+                                           qap_params={'method': qap_method,
+                                                       'time_limit': qap_time_limit})
+
+        if self.store:
+            self.store_distances_to_file(self.distance_id, self.distances, self.times,
+                                         num_stored=num_stored)
+
+        if embed and new_ids:
+            self.embed_incremental(new_ids)
+
+        return new_ids
+
+    def compute_landmark_distances(self, distance_id: str = 'emd-positionwise',
+                                   num_landmarks: int = 100, landmarks='farthest',
+                                   num_threads: int = 1, vector_type: str = 'A',
+                                   printing: bool = False, backend: str = 'thread',
+                                   chunk_size: int = None, cache=None, seed: int = None,
+                                   qap_method: str = 'bnb', qap_time_limit: float = None) -> None:
+        """ Compute distances between all elections and a few landmark elections only
+        (N * L instead of N * (N - 1) / 2 distances), e.g., for embed(algorithm='landmark')
 
-    def store_distances_to_file(self, distance_id, distances, times):
+        landmarks: 'farthest' (farthest-point sampling from a random election),
+        'random', 'families' (one election per family, then farthest-point sampling),
+        or a list of election ids; qap_method and qap_time_limit are as in
+        compute_distances """
 
+        self.distance_id = distance_id
+        qap_params = {'method': qap_method, 'time_limit': qap_time_limit}
+        election_ids = list(self.elections)
+        num_landmarks = min(num_landmarks, len(election_ids))
+        rng = np.random.default_rng(seed)
+
+        if isinstance(landmarks, str):
+            if landmarks == 'random':
+                chosen = rng.choice(len(election_ids), size=num_landmarks, replace=False)
+                initial_ids = [election_ids[i] for i in chosen]
+            elif landmarks == 'families':
+                initial_ids = [family.election_ids[0] for family in self.families.values()
+                               if family.election_ids][:num_landmarks]
+            elif landmarks == 'farthest':
+                initial_ids = [election_ids[rng.integers(len(election_ids))]]
+            else:
+                raise ValueError(f'Unknown landmarks: {landmarks}')
+            farthest = landmarks in {'farthest', 'families'}
+        else:
+            initial_ids = list(landmarks)
+            farthest = False
+
+        distances = LandmarkDistanceMatrix(election_ids)
+        times = LandmarkDistanceMatrix(election_ids)
+        if cache is True:
+            cache = DistanceCache()
+
+        # with farthest-point sampling, landmarks are added one by one, so the workers
+        # are started once and reused for all the landmarks
+        pool = None
+        if farthest:
+            if backend == 'process':
+                pool = metr.start_process_pool(self, num_threads, vector_type=vector_type,
+                                               qap_params=qap_params)
+            else:
+                pool = ThreadPool(num_threads)
+
+        def add_landmarks(landmark_ids: list) -> None:
+            ids = []
+            for landmark_id in landmark_ids:
+                ids += [(landmark_id, election_id) for election_id in election_ids
+                        if election_id != landmark_id and
+                        election_id not in distances.landmark_index]
+                distances.add_landmarks([landmark_id])
+                times.add_landmarks([landmark_id])
+            # matchings are only needed for the cache, so they are not kept
+            matchings = {election_id: {} for pair in ids for election_id in pair}
+            self._compute_distances_with_cache(ids, distances, times, matchings, cache=cache,
+                                               num_threads=num_threads,
+                                               vector_type=vector_type, printing=printing,
+                                               backend=backend, chunk_size=chunk_size,
+                                               pool=pool, qap_params=qap_params)
+
+        try:
+            add_landmarks(initial_ids)
+            while farthest and len(distances.landmark_ids) < num_landmarks:
+                min_distances = distances.values.min(axis=1).astype(float)
+                min_distances[[distances.index[landmark_id]
+                               for landmark_id in distances.landmark_ids]] = -np.inf
+                add_landmarks([election_ids[int(np.argmax(min_distances))]])
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+        print(f'{len(distances.landmark_ids)} landmarks')
+
+        if self.store:
+            path = os.path.join(os.getcwd(), "experiments", self.experiment_id, "distances",
+                                f'{distance_id}_landmarks')
+            distances.save(path)
+            times.save(f'{path}_times')
+
+        self.landmark_distances = distances
+        self.landmark_times = times
+
+    def compute_landmark_stress(self, num_pairs: int = 1000, num_threads: int = 1,
+                                vector_type: str = 'A', backend: str = 'thread',
+                                cache=None, seed: int = None, qap_method: str = 'bnb',
+                                qap_time_limit: float = None) -> dict:
+        """ Compare the map with exact distances of randomly sampled pairs of elections
+        (qap_method and qap_time_limit are as in compute_distances)
+
+        Return: normalized stress (the smaller the better) and Spearman correlation
+        between the exact and the embedded distances """
+
+        election_ids = [election_id for election_id in self.elections
+                        if election_id in self.coordinates]
+        rng = np.random.default_rng(seed)
+        pairs = rng.integers(len(election_ids), size=(num_pairs, 2))
+        pairs = np.unique(np.sort(pairs[pairs[:, 0] != pairs[:, 1]], axis=1), axis=0)
+        ids = [(election_ids[i], election_ids[j]) for i, j in pairs]
+
+        sampled_ids = list(dict.fromkeys(election_id for pair in ids for election_id in pair))
+        distances = DistanceMatrix(sampled_ids)
+        times = DistanceMatrix(sampled_ids)
+        matchings = {election_id: {} for election_id in sampled_ids}
+        if cache is True:
+            cache = DistanceCache()
+        self._compute_distances_with_cache(ids, distances, times, matchings, cache=cache,
+                                           num_threads=num_threads, vector_type=vector_type,
+                                           backend=backend,
+                                           qap_params={'method': qap_method,
+                                                       'time_limit': qap_time_limit})
+
+        exact = np.array([distances[id_1][id_2] for id_1, id_2 in ids], dtype=float)
+        embedded = np.array([np.linalg.norm(np.subtract(self.coordinates[id_1],
+                                                        self.coordinates[id_2]))
+                             for id_1, id_2 in ids])
+        stress = compute_stress(embedded, exact)
+        correlation = float(stats.spearmanr(exact, embedded)[0]) if len(ids) > 1 else 1.
+        print(f'Stress on {len(ids)} sampled pairs: {round(stress, 5)}, '
+              f'Spearman correlation: {round(correlation, 5)}')
+        return {'stress': stress, 'spearman': correlation, 'num_pairs': len(ids)}
+
+    def _compute_distances_with_cache(self, ids, distances, times, matchings, cache=None,
+                                      num_threads=1, vector_type='A', printing=False,
+                                      backend='thread', chunk_size=None,
+                                      lower_bounds=None, pool=None, qap_params=None) -> int:
+        """ Compute distances of given pairs, reusing (and filling) the cache
+
+        lower_bounds: filled with the lower bounds of the distances that are not proven
+        to be optimal (e.g., when the QAP time limit is reached); those are not cached
+
+        Return: number of distances imported from the cache """
+        if lower_bounds is None:
+            lower_bounds = {}
+        num_inexact = len(lower_bounds)
+
+        if cache is not None:
+            ids_to_compute = metr.import_distances_from_cache(self, ids, cache, distances, times,
+                                                              matchings, vector_type=vector_type)
+        else:
+            ids_to_compute = ids
+
+        if ids_to_compute:
+            self._compute_distances_of_pairs(ids_to_compute, distances, times, matchings,
+                                             num_threads=num_threads, vector_type=vector_type,
+                                             printing=printing, backend=backend,
+                                             chunk_size=chunk_size, lower_bounds=lower_bounds,
+                                             pool=pool, qap_params=qap_params)
+
+        num_inexact = (len(lower_bounds) - num_inexact) // 2
+        if num_inexact:
+            print(f'{num_inexact} distances are only upper bounds (see lower_bounds)')
+
+        if cache is not None and ids_to_compute:
+            metr.store_distances_in_cache(self, ids_to_compute, cache, distances, times,
+                                          matchings, vector_type=vector_type,
+                                          lower_bounds=lower_bounds)
+
+        return len(ids) - len(ids_to_compute)
+
+    def _compute_distances_of_pairs(self, ids, distances, times, matchings, num_threads=1,
+                                    vector_type='A', printing=False, backend='thread',
+                                    chunk_size=None, lower_bounds=None, pool=None,
+                                    qap_params=None) -> None:
+        """ Compute distances of given pairs
+
+        pool: workers reused across calls, i.e., a pool of processes started with
+        metr.start_process_pool (backend='process') or a ThreadPool (backend='thread');
+        a pool of processes keeps the qap_params it was started with """
+        distance_id = self.distance_id
+
+        # vectors, matrices, etc. are computed lazily by each election when first needed,
+        # so that they are recomputed for elections imported again after an eviction
+
+        if backend == 'process':
+            if pool is None:
+                print(f'Starting {num_threads} processes')
+            metr.run_process_pool(self, ids, distances, times, matchings,
+                                  num_processes=num_threads, chunk_size=chunk_size,
+                                  printing=printing, vector_type=vector_type,
+                                  lower_bounds=lower_bounds, pool=pool,
+                                  qap_params=qap_params)
+        elif metr.is_batchable(distance_id) and \
+                metr.bp.can_be_batched(self.elections, ids):
+            metr.run_batched_positionwise(self, ids, distances, times, matchings)
+        elif pool is not None:
+            num_distances = len(ids)
+            run_single_thread = partial(metr.run_single_thread, vector_type=vector_type,
+                                        lower_bounds=lower_bounds, qap_params=qap_params)
+            pool.starmap(run_single_thread,
+                         [(self, ids[int(t * num_distances / num_threads):
+                                     int((t + 1) * num_distances / num_threads)],
+                           distances, times, matchings, printing, t)
+                          for t in range(num_threads)])
+        else:
+            threads = [{} for _ in range(num_threads)]
+            num_distances = len(ids)
+
+            for t in range(num_threads):
+                print(f'Starting thread: {t}')
+                sleep(0.1)
+                start = int(t * num_distances / num_threads)
+                stop = int((t + 1) * num_distances / num_threads)
+                thread_ids = ids[start:stop]
+
+                threads[t] = Thread(target=metr.run_single_thread, args=(self, thread_ids,
+                                                                         distances, times,
+                                                                         matchings, printing, t),
+                                    kwargs={'vector_type': vector_type,
+                                            'lower_bounds': lower_bounds,
+                                            'qap_params': qap_params})
+                threads[t].start()
+
+            for t in range(num_threads):
+                threads[t].join()
+
+    def store_distances_to_file(self, distance_id, distances, times,
+                                file_format: str = 'binary', dtype=None, num_stored=None):
+        """ Store distances in a binary file (condensed matrix + instance ids)
+        or, as an export option, in a csv file
+
+        num_stored: number of elections (the first ones) whose distances are already
+        in the binary file, so only the values of the remaining ones are appended """
+
+        if file_format == 'binary':
+            path = os.path.join(os.getcwd(), "experiments", self.experiment_id, "distances",
+                                distance_id)
+            if not isinstance(distances, DistanceMatrix):
+                distances = DistanceMatrix.from_dict(distances, instance_ids=list(self.elections))
+            if not isinstance(times, DistanceMatrix):
+                times = DistanceMatrix.from_dict(times, instance_ids=distances.instance_ids)
+            if num_stored is None:
+                distances.save(path, dtype=dtype)
+                times.save(f'{path}_times', dtype=dtype)
+            else:
+                distances.append_to_file(path, num_stored, dtype=dtype)
+                times.append_to_file(f'{path}_times', num_stored, dtype=dtype)
+
+        elif file_format == 'csv':
             file_name = f'{distance_id}.csv'
             path = os.path.join(os.getcwd(), "experiments", self.experiment_id, "distances",
                                 file_name)
@@ -362,6 +660,11 @@ class ElectionExperiment(Experiment):
                     time = str(times[election_1][election_2])
                     writer.writerow([election_1, election_2, distance, time])
 
+    def export_distances_to_csv(self) -> None:
+        """ Export current distances to a csv file """
+        self.store_distances_to_file(self.distance_id, self.distances, self.times,
+                                     file_format='csv')
+
     def get_election_id_from_model_name(self, model_id: str) -> str:
         for family_id in self.families:
             if self.families[family_id].model_id == model_id:
@@ -578,6 +881,15 @@ class ElectionExperiment(Experiment):
                 experiment_id=self.experiment_id, rule_name=rule_name)
 
 
+def import_election(experiment_id: str, instance_type: str, election_id: str):
+    """ Return: election imported from the experiment (None for unknown instance type) """
+    if instance_type == 'ordinal':
+        return OrdinalElection(experiment_id, election_id, _import=True)
+    elif instance_type == 'approval':
+        return ApprovalElection(experiment_id, election_id, _import=True)
+    return None
+
+
 def check_if_all_equal(values, subject):
     if any(x != values[0] for x in values):
         text = f'Not all {subject} values are equal!'
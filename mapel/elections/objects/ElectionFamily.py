@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 
 import copy
+from multiprocessing import Pool
+
+import numpy as np
+
 from mapel.main.objects.Family import Family
 from mapel.elections.objects.OrdinalElection import OrdinalElection
 from mapel.elections._glossary import *
@@ -62,15 +66,23 @@ class ElectionFamily(Family):
         else:
             self.__dict__[name] = value
 
-    def prepare_family(self, experiment_id=None, store=None):
+    def prepare_family(self, experiment_id=None, store=None, seed=None, num_workers=1,
+                       file_format='text'):
+        """ Generate (and store) all the elections of the family.
+
+        If seed is given, each election is generated from its own random stream derived
+        from (seed, family_id, index), so the result does not depend on num_workers. """
 
         ballot = get_ballot_from_model(self.model_id)
 
         # if model_id in PARTY_MODELS:
         #     params['party'] = prepare_parties(params=params, model_id=model_id)
 
-        elections = {}
-        _keys = []
+        if seed is None and num_workers > 1:
+            # forked workers would share the global random state otherwise
+            seed = int(np.random.randint(2 ** 31))
+
+        tasks = []
         for j in range(self.size):
 
             params = copy.deepcopy(self.params)
@@ -93,24 +105,41 @@ class ElectionFamily(Family):
                 params = {**params, **new_params}
 
             election_id = get_instance_id(self.single, self.family_id, j)
+            seed_sequence = None if seed is None else get_seed_sequence(seed, self.family_id, j)
 
-            election = OrdinalElection(experiment_id, election_id, model_id=self.model_id,
-                                         num_voters=self.num_voters,
-                                         num_candidates=self.num_candidates,
-                                         params=copy.deepcopy(params), ballot=ballot,
-                                        variable=variable, _import=False,
-                                       )
+            tasks.append((experiment_id, election_id, self.model_id, self.num_voters,
+                          self.num_candidates, params, ballot, variable, store, file_format,
+                          seed_sequence))
 
-            election.prepare_instance(store=store, params=params)
+        if num_workers > 1 and len(tasks) > 1:
+            with Pool(processes=min(num_workers, len(tasks))) as pool:
+                generated = pool.map(_prepare_election, tasks)
+        else:
+            generated = [_prepare_election(task) for task in tasks]
 
-            elections[election_id] = election
+        elections = {election.election_id: election for election in generated}
+        self.election_ids = [election.election_id for election in generated]
 
-            _keys.append(election_id)
+        return elections
 
-        self.election_ids = _keys
 
+def _prepare_election(task) -> OrdinalElection:
+    experiment_id, election_id, model_id, num_voters, num_candidates, params, ballot, \
+        variable, store, file_format, seed_sequence = task
 
-        return elections
+    election = OrdinalElection(experiment_id, election_id, model_id=model_id,
+                               num_voters=num_voters,
+                               num_candidates=num_candidates,
+                               params=copy.deepcopy(params), ballot=ballot,
+                               variable=variable, _import=False,
+                               )
+
+    if seed_sequence is None:
+        election.prepare_instance(store=store, params=params, file_format=file_format)
+    else:
+        with seeded_global_random_state(seed_sequence):
+            election.prepare_instance(store=store, params=params, file_format=file_format)
+    return election
 
 
 def _get_params_for_crate(j):
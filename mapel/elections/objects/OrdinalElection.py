@@ -1,5 +1,4 @@
 import ast
-import itertools
 import os
 
 import numpy as np
@@ -7,6 +6,8 @@ from scipy.stats import gamma
 
 import mapel.elections.models.mallows as mallows
 from mapel.elections._glossary import *
+from mapel.elections._binary_elections import binary_election_exists, import_binary_election, \
+    store_binary_election, expand_votes
 from mapel.elections.models.group_separable import get_gs_caterpillar_vectors
 from mapel.elections.models.mallows import get_mallows_vectors
 from mapel.elections.models.preflib import get_sushi_vectors
@@ -17,6 +18,10 @@ from mapel.elections.objects.Election import Election
 from mapel.elections.other.winners import compute_sntv_winners, compute_borda_winners, \
     compute_stv_winners
 from mapel.elections.other.winners2 import generate_winners
+from mapel.main._inner_distances import swap_distances
+
+# upper bound on the number of elements in a single intermediate array
+MAX_BLOCK_ELEMENTS = 2 ** 24
 
 
 class OrdinalElection(Election):
@@ -49,7 +54,15 @@ class OrdinalElection(Election):
                         self.votes = votes
                         self.num_candidates = len(votes[0])
                         self.num_voters = len(votes)
-                        self.potes = self.votes_to_potes()
+                elif binary_election_exists(experiment_id, election_id, 'soc'):
+                    unique_votes, counts, self.num_voters, self.num_candidates, self.params, \
+                        self.model_id, self.fake = import_binary_election(experiment_id,
+                                                                          election_id, shift)
+                    if not self.fake:
+                        self.set_unique_votes(unique_votes, counts)
+                    self.alpha = 1
+                    if self.params and 'alpha' in self.params:
+                        self.alpha = self.params['alpha']
                 else:
 
                     self.fake = check_if_fake(experiment_id, election_id)
@@ -66,21 +79,55 @@ class OrdinalElection(Election):
                         except KeyError:
                             print("Error")
                             pass
-                        self.potes = self.votes_to_potes()
 
                 self.candidatelikeness_original_vectors = {}
 
+                # positionwise vectors are computed on first use (see get_vectors)
                 if with_matrix:
                     self.matrix = self.import_matrix()
                     self.vectors = self.matrix.transpose()
-                else:
-                    self.votes_to_positionwise_vectors()
 
             except:
                 pass
 
         self.borda_points = []
 
+    @property
+    def votes(self):
+        """ Return: votes (votes given with multiplicities are expanded on first access) """
+        if self._votes is None and self._vote_counts is not None:
+            self._votes = np.asarray(expand_votes(self._unique_votes, self._vote_counts),
+                                     dtype=int)
+        return self._votes
+
+    @votes.setter
+    def votes(self, votes):
+        self._votes = votes
+        self._unique_votes = None
+        self._vote_counts = None
+        # precomputed data derived from the votes is no longer valid
+        self._cached = {}
+
+    def set_unique_votes(self, unique_votes: np.ndarray, counts: np.ndarray) -> None:
+        """ Set votes as an integer array of unique votes and their multiplicities """
+        self.votes = None
+        self._unique_votes = unique_votes
+        self._vote_counts = counts
+
+    def get_unique_votes(self) -> (np.ndarray, np.ndarray):
+        """ Return: integer array of (not necessarily unique) votes, their multiplicities """
+        if self._vote_counts is not None:
+            return np.asarray(self._unique_votes, dtype=int), self._vote_counts
+        votes = self.get_votes_array()
+        return votes, np.ones(len(votes), dtype=int)
+
+    def votes_to_potes(self) -> np.ndarray:
+        """ Convert votes to positional votes """
+        if self._votes is None and self._vote_counts is not None:
+            potes = np.argsort(self._unique_votes, axis=1)
+            return expand_votes(potes, self._vote_counts)
+        return super().votes_to_potes()
+
     def get_vectors(self):
         if self.vectors is not None and len(self.vectors) > 0:
             return self.vectors
@@ -119,17 +166,14 @@ class OrdinalElection(Election):
             vectors = get_fake_vectors_crate(num_candidates=self.num_candidates,
                                              fake_param=self.params)
         else:
-            for i in range(self.num_voters):
-                pos = 0
-                for j in range(self.num_candidates):
-                    vote = self.votes[i][j]
-                    if vote == -1:
-                        continue
-                    vectors[vote][pos] += 1
-                    pos += 1
-            for i in range(self.num_candidates):
-                for j in range(self.num_candidates):
-                    vectors[i][j] /= float(self.num_voters)
+            votes, counts = self.get_unique_votes()
+            valid = votes != -1
+            positions = np.cumsum(valid, axis=1) - 1
+            weights = np.broadcast_to(np.asarray(counts)[:, np.newaxis], votes.shape)
+            vectors = np.bincount(votes[valid] * self.num_candidates + positions[valid],
+                                  weights=weights[valid], minlength=self.num_candidates ** 2)
+            vectors = vectors.reshape(self.num_candidates, self.num_candidates)
+            vectors = vectors / float(self.num_voters)
 
         self.vectors = vectors
         self.matrix = self.vectors.transpose()
@@ -141,6 +185,9 @@ class OrdinalElection(Election):
 
     def votes_to_pairwise_matrix(self) -> np.ndarray:
         """ convert VOTES to pairwise MATRIX """
+        if 'pairwise_matrix' in self._cached:
+            return self._cached['pairwise_matrix']
+
         matrix = np.zeros([self.num_candidates, self.num_candidates])
 
         if self.fake:
@@ -153,17 +200,17 @@ class OrdinalElection(Election):
 
         else:
 
-            for v in range(self.num_voters):
-                for c1 in range(self.num_candidates):
-                    for c2 in range(c1 + 1, self.num_candidates):
-                        matrix[int(self.votes[v][c1])][
-                            int(self.votes[v][c2])] += 1
+            potes = self.potes
+            block_size = max(1, MAX_BLOCK_ELEMENTS // self.num_candidates ** 2)
+            for start in range(0, self.num_voters, block_size):
+                block = potes[start:start + block_size]
+                matrix += (block[:, :, np.newaxis] < block[:, np.newaxis, :]).sum(axis=0)
 
-            for i in range(self.num_candidates):
-                for j in range(i + 1, self.num_candidates):
-                    matrix[i][j] /= float(self.num_voters)
-                    matrix[j][i] = 1. - matrix[i][j]
+            upper = np.triu_indices(self.num_candidates, k=1)
+            matrix[upper] /= float(self.num_voters)
+            matrix.T[upper] = 1. - matrix[upper]
 
+        self._cached['pairwise_matrix'] = matrix
         return matrix
 
     def votes_to_bordawise_vector(self) -> np.ndarray:
@@ -211,53 +258,14 @@ class OrdinalElection(Election):
 
     def votes_to_voterlikeness_matrix(self) -> np.ndarray:
         """ convert VOTES to voter-likeness MATRIX """
-        matrix = np.zeros([self.num_voters, self.num_voters])
-
-        for v1 in range(self.num_voters):
-            for v2 in range(self.num_voters):
-                # Spearman distance between votes
-                # matrix[v1][v2] = sum([abs(experiment.potes[v1][c]
-                # - experiment.potes[v2][c]) for c in range(experiment.num_candidates)])
-
-                # Swap distance between votes
-
-                # for i in range(self.num_candidates):
-                #     for j in range(i + 1, self.num_candidates):
-                swap_distance = 0
-                for i, j in itertools.combinations(self.potes[0], 2):
-                    if (self.potes[v1][i] > self.potes[v1][j] and
-                        self.potes[v2][i] < self.potes[v2][j]) or \
-                            (self.potes[v1][i] < self.potes[v1][j] and
-                             self.potes[v2][i] > self.potes[v2][j]):
-                        swap_distance += 1
-                matrix[v1][v2] = swap_distance
-
-        # VOTERLIKENESS IS SYMETRIC
-        for i in range(self.num_voters):
-            for j in range(i + 1, self.num_voters):
-                # matrix[i][j] /= float(experiment.num_candidates)
-                matrix[j][i] = matrix[i][j]
-
-        return matrix
+        # Swap distance between votes
+        if 'voterlikeness_matrix' not in self._cached:
+            self._cached['voterlikeness_matrix'] = swap_distances(self.potes)
+        return self._cached['voterlikeness_matrix']
 
     def votes_to_agg_voterlikeness_vector(self):
         """ convert VOTES to Borda vector """
-
-        vector = np.zeros([self.num_voters])
-
-        for v1 in range(self.num_voters):
-            for v2 in range(self.num_voters):
-
-                swap_distance = 0
-                for i in range(self.num_candidates):
-                    for j in range(i + 1, self.num_candidates):
-                        if (self.potes[v1][i] > self.potes[v1][j] and
-                            self.potes[v2][i] < self.potes[v2][j]) or \
-                                (self.potes[v1][i] < self.potes[v1][j] and
-                                 self.potes[v2][i] > self.potes[v2][j]):
-                            swap_distance += 1
-                vector[v1] += swap_distance
-
+        vector = self.votes_to_voterlikeness_matrix().sum(axis=1)
         return vector, len(vector)
 
     def votes_to_bordawise_vector_long_empty(self):
@@ -295,7 +303,7 @@ class OrdinalElection(Election):
             self.winners = generate_winners(election=self, num_winners=num_winners, method=method)
 
     # PREPARE INSTANCE
-    def prepare_instance(self, store=None, params: dict = None):
+    def prepare_instance(self, store=None, params: dict = None, file_format: str = 'text'):
 
         if params is None:
             params = {}
@@ -324,7 +332,7 @@ class OrdinalElection(Election):
         #                                 num_voters=num_voters, ballot=ballot, alpha=alpha)
 
         if store:
-            self.store_ordinal_election()
+            self.store_ordinal_election(file_format=file_format)
             # store_ordinal_election(experiment, model_id, election_id, num_candidates,
             #                        num_voters, params, ballot)
             # if ballot == 'approval':
@@ -333,10 +341,16 @@ class OrdinalElection(Election):
 
 
     # STORE
-    def store_ordinal_election(self):
-        """ Store ordinal election in a .soc file """
+    def store_ordinal_election(self, file_format: str = 'text'):
+        """ Store ordinal election in a .soc file (or in the binary format) """
+
+        if file_format == 'binary':
+            fake = self.model_id in LIST_OF_FAKE_MODELS
+            store_binary_election(self.experiment_id, self.election_id, self.model_id,
+                                  self.num_candidates, self.num_voters, self.params,
+                                  self.ballot, votes=None if fake else self.votes, fake=fake)
 
-        if self.model_id in LIST_OF_FAKE_MODELS:
+        elif self.model_id in LIST_OF_FAKE_MODELS:
             path = os.path.join("experiments", str(self.experiment_id),
                                 "elections", (str(self.election_id) + ".soc"))
             file_ = open(path, 'w')
@@ -68,7 +68,7 @@ def matrix2png(argv):
     else:
         experiment.add_election(election_model="norm-mallows_matrix", params={"norm-phi": param},
                                 election_id="M")
-    M = experiment.elections["M"].matrix
+    M = experiment.elections["M"].get_matrix()
 
     # get the mapping to a given election
     experiment.compute_distances()
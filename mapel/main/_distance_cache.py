@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+import os
+import sqlite3
+from time import time
+
+import numpy as np
+
+
+class DistanceCache:
+    """ Persistent cache of distances between instances, shared by all experiments.
+
+    Entries are keyed by content hashes of both instances and the distance_id, so the
+    same pair of instances is never computed twice, no matter in which experiment
+    it appears. Least recently used entries are evicted when the cache grows beyond
+    max_entries or max_size (in bytes). """
+
+    def __init__(self, path: str = None, max_entries: int = None, max_size: int = None):
+
+        if path is None:
+            path = os.path.join(os.getcwd(), 'cache', 'distances.sqlite')
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_size = max_size
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS distances ('
+            'hash_1 TEXT, hash_2 TEXT, distance_id TEXT, '
+            'distance REAL, matching BLOB, time REAL, '
+            'size INTEGER, last_access REAL, '
+            'PRIMARY KEY (hash_1, hash_2, distance_id))')
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS last_access_index ON distances (last_access)')
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM distances').fetchone()[0]
+
+    def get(self, hash_1: str, hash_2: str, distance_id: str) -> (float, np.ndarray, float):
+        """ Return: distance, matching (or None), time -- or None if not cached """
+        return self.get_many([(hash_1, hash_2)], distance_id).get((hash_1, hash_2))
+
+    def get_many(self, pairs: list, distance_id: str) -> dict:
+        """ Return: dictionary {(hash_1, hash_2): (distance, matching, time)}
+        for all the pairs that are present in the cache (in either order) """
+
+        cursor = self.connection.cursor()
+        # the pairs are looked up in bulk by joining a temporary table with the primary key
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS lookup (hash_1 TEXT, hash_2 TEXT)')
+        cursor.execute('DELETE FROM lookup')
+        cursor.executemany('INSERT INTO lookup VALUES (?, ?)', pairs)
+        rows = cursor.execute(
+            'SELECT d.rowid, l.hash_1, l.hash_2, 0, d.distance, d.matching, d.time '
+            'FROM lookup l JOIN distances d ON d.hash_1 = l.hash_1 AND d.hash_2 = l.hash_2 '
+            'AND d.distance_id = ? '
+            'UNION ALL '
+            'SELECT d.rowid, l.hash_1, l.hash_2, 1, d.distance, d.matching, d.time '
+            'FROM lookup l JOIN distances d ON d.hash_1 = l.hash_2 AND d.hash_2 = l.hash_1 '
+            'AND d.distance_id = ?', (distance_id, distance_id)).fetchall()
+        cursor.execute('DELETE FROM lookup')
+
+        found = {}
+        rowids = {}
+        # entries stored in the same order as requested take precedence
+        for rowid, hash_1, hash_2, swapped, distance, blob, time_ in \
+                sorted(rows, key=lambda row: -row[3]):
+            matching = _blob_to_matching(blob)
+            if swapped and matching is not None:
+                matching = np.argsort(matching)
+            found[(hash_1, hash_2)] = (distance, matching, time_)
+            rowids[(hash_1, hash_2)] = rowid
+
+        now = time()
+        cursor.executemany('UPDATE distances SET last_access = ? WHERE rowid = ?',
+                           [(now, rowid) for rowid in set(rowids.values())])
+        self.connection.commit()
+        return found
+
+    def put_many(self, entries: list, distance_id: str) -> None:
+        """ Store entries of the form (hash_1, hash_2, distance, matching, time) """
+
+        now = time()
+        rows = []
+        for hash_1, hash_2, distance, matching, time_ in entries:
+            blob = _matching_to_blob(matching)
+            size = 64 + (len(blob) if blob is not None else 0)
+            rows.append((hash_1, hash_2, distance_id, float(distance), blob, time_, size, now))
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO distances VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        self.connection.commit()
+        self.evict()
+
+    def evict(self) -> None:
+        """ Remove the least recently used entries until the limits are respected """
+
+        if self.max_entries is not None:
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self._remove_oldest(excess)
+
+        if self.max_size is not None:
+            total_size = self.connection.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM distances').fetchone()[0]
+            if total_size > self.max_size:
+                rows = self.connection.execute(
+                    'SELECT size FROM distances ORDER BY last_access').fetchall()
+                excess = 0
+                for (size,) in rows:
+                    if total_size <= self.max_size:
+                        break
+                    total_size -= size
+                    excess += 1
+                self._remove_oldest(excess)
+
+    def clear(self) -> None:
+        self.connection.execute('DELETE FROM distances')
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _remove_oldest(self, number: int) -> None:
+        self.connection.execute(
+            'DELETE FROM distances WHERE rowid IN '
+            '(SELECT rowid FROM distances ORDER BY last_access LIMIT ?)', (number,))
+        self.connection.commit()
+
+
+def _matching_to_blob(matching) -> bytes:
+    if matching is None:
+        return None
+    return np.asarray(matching, dtype=np.int32).tobytes()
+
+
+def _blob_to_matching(blob) -> np.ndarray:
+    if blob is None:
+        return None
+    return np.frombuffer(blob, dtype=np.int32).copy()
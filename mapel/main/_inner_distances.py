@@ -1,7 +1,6 @@
 import copy
 import math
 import numpy as np
-import itertools
 
 
 def map_str_to_func(name):
@@ -74,6 +73,104 @@ def hamming(set_1: set, set_2: set) -> float:
     return len(set_1.symmetric_difference(set_2))
 
 
+# BATCHED VERSIONS
+# vectors_1 of shape (..., p, k) and vectors_2 of shape (..., q, k) give (..., p, q) costs
+
+# upper bound on the number of elements of a single intermediate (..., p, q, k) array
+MAX_BLOCK_ELEMENTS = 2 ** 22
+
+
+def _differences(vectors_1: np.ndarray, vectors_2: np.ndarray) -> np.ndarray:
+    return vectors_1[..., :, np.newaxis, :] - vectors_2[..., np.newaxis, :, :]
+
+
+def batched_discrete(vectors_1: np.ndarray, vectors_2: np.ndarray) -> np.ndarray:
+    return np.any(_differences(vectors_1, vectors_2) != 0, axis=-1).astype(vectors_1.dtype)
+
+
+def batched_wl1(vectors_1: np.ndarray, vectors_2: np.ndarray) -> np.ndarray:
+    length = vectors_1.shape[-1]
+    weights = np.arange(length, dtype=vectors_1.dtype)
+    return length * length - np.abs(_differences(vectors_1, vectors_2)) @ weights
+
+
+def batched_l1(vectors_1: np.ndarray, vectors_2: np.ndarray) -> np.ndarray:
+    return np.abs(_differences(vectors_1, vectors_2)).sum(axis=-1)
+
+
+def batched_l2(vectors_1: np.ndarray, vectors_2: np.ndarray) -> np.ndarray:
+    return np.sqrt((_differences(vectors_1, vectors_2) ** 2).sum(axis=-1))
+
+
+def batched_chebyshev(vectors_1: np.ndarray, vectors_2: np.ndarray) -> np.ndarray:
+    return np.abs(_differences(vectors_1, vectors_2)).max(axis=-1)
+
+
+def batched_hellinger(vectors_1: np.ndarray, vectors_2: np.ndarray) -> np.ndarray:
+    length = vectors_1.shape[-1]
+    h1 = vectors_1.mean(axis=-1)[..., :, np.newaxis]
+    h2 = vectors_2.mean(axis=-1)[..., np.newaxis, :]
+    product = np.sqrt(vectors_1) @ np.swapaxes(np.sqrt(vectors_2), -1, -2)
+    return np.sqrt(np.maximum(0., 1 - product / np.sqrt(h1 * h2 * length * length)))
+
+
+def batched_emd(vectors_1: np.ndarray, vectors_2: np.ndarray) -> np.ndarray:
+    return batched_l1(np.cumsum(vectors_1, axis=-1)[..., :-1],
+                      np.cumsum(vectors_2, axis=-1)[..., :-1])
+
+
+def map_str_to_batched_func(name):
+    return {'l1': batched_l1,
+            'l2': batched_l2,
+            'chebyshev': batched_chebyshev,
+            'hellinger': batched_hellinger,
+            'emd': batched_emd,
+            'discrete': batched_discrete,
+            'wl1': batched_wl1,
+            }.get(name)
+
+
+def get_cost_matrix(vectors_1, vectors_2, inner_distance, dtype=np.float64,
+                    max_block_elements: int = MAX_BLOCK_ELEMENTS) -> np.ndarray:
+    """ Return: matrix C, where C[i][j] = inner_distance(vectors_1[i], vectors_2[j])
+    (leading batch dimensions are allowed, e.g., (B, p, k) and (B, q, k) give (B, p, q))
+
+    inner_distance is a name or a function from map_str_to_func; rows of vectors_1 are
+    processed in blocks, so that intermediate arrays stay below max_block_elements """
+
+    batched_func = _get_batched_func(inner_distance)
+    try:
+        vectors_1 = np.asarray(vectors_1, dtype=dtype)
+        vectors_2 = np.asarray(vectors_2, dtype=dtype)
+    except ValueError:
+        # vectors of different lengths
+        batched_func = None
+
+    if batched_func is None:
+        if isinstance(inner_distance, str):
+            inner_distance = map_str_to_func(inner_distance)
+        return np.array([[inner_distance(vector_1, vector_2) for vector_2 in vectors_2]
+                         for vector_1 in vectors_1], dtype=dtype)
+
+    *batch, size_1, length = vectors_1.shape
+    size_2 = vectors_2.shape[-2]
+    block_size = max(1, max_block_elements // max(1, int(np.prod(batch)) * size_2 * length))
+    costs = np.empty(tuple(batch) + (size_1, size_2), dtype=dtype)
+    for start in range(0, size_1, block_size):
+        costs[..., start:start + block_size, :] = \
+            batched_func(vectors_1[..., start:start + block_size, :], vectors_2)
+    return costs
+
+
+def _get_batched_func(inner_distance):
+    if isinstance(inner_distance, str):
+        return map_str_to_batched_func(inner_distance)
+    for name in ['l1', 'l2', 'chebyshev', 'hellinger', 'emd', 'discrete', 'wl1']:
+        if inner_distance is map_str_to_func(name):
+            return map_str_to_batched_func(name)
+    return None
+
+
 # TMP
 def vote_to_pote(vote: list) -> list:
     """ Return: Positional vote """
@@ -83,21 +180,58 @@ def vote_to_pote(vote: list) -> list:
 def swap_distance(vote_1: list, vote_2: list, matching=None) -> int:
     """ Return: Swap distance between two votes """
 
-    new_vote_2 = copy.deepcopy(vote_2)
+    new_vote_2 = np.asarray(vote_2)
     if matching is not None:
-        for i in range(len(vote_2)):
-            new_vote_2[i] = matching[vote_2[i]]
-
-    # print(vote_1, new_vote_2)
-    pote_1 = vote_to_pote(vote_1)
-    pote_2 = vote_to_pote(new_vote_2)
-
-    swap_distance = 0
-    for i, j in itertools.combinations(pote_1, 2):
-        if (pote_1[i] > pote_1[j] and pote_2[i] < pote_2[j]) or \
-                (pote_1[i] < pote_1[j] and pote_2[i] > pote_2[j]):
-            swap_distance += 1
-    return swap_distance
+        new_vote_2 = np.asarray(matching)[new_vote_2]
+
+    potes = np.argsort(np.array([vote_1, new_vote_2]), axis=1)
+    orders = potes_to_pairwise_orders(potes)
+    return int(np.sum(orders[0] != orders[1]))
+
+
+def potes_to_pairwise_orders(potes: np.ndarray) -> np.ndarray:
+    """ Return: for each vote and each pair of candidates i < j,
+    whether candidate i is ranked above candidate j """
+    potes = np.asarray(potes)
+    rows, cols = np.triu_indices(potes.shape[1], k=1)
+    return potes[:, rows] < potes[:, cols]
+
+
+def swap_distances(potes_1: np.ndarray, potes_2: np.ndarray = None,
+                   block_size: int = 1024) -> np.ndarray:
+    """ Return: matrix of swap distances between each vote of potes_1 and each vote
+    of potes_2 (if potes_2 is None, between all pairs of votes of potes_1) """
+
+    symmetric = potes_2 is None
+    orders_1 = potes_to_pairwise_orders(potes_1)
+    orders_2 = orders_1 if symmetric else potes_to_pairwise_orders(potes_2)
+    return _hamming_distances_of_orders(orders_1, orders_2, symmetric, block_size)
+
+
+def _hamming_distances_of_orders(orders_1: np.ndarray, orders_2: np.ndarray,
+                                 symmetric: bool = False, block_size: int = 1024) -> np.ndarray:
+    """ Return: matrix of Hamming distances between binary rows, computed as
+    |a| + |b| - 2 <a, b> with the dot products done block by block """
+
+    # all partial sums are integers, float32 is exact below 2^24
+    dtype = np.float32 if orders_1.shape[1] < 2 ** 24 else np.float64
+    orders_1 = orders_1.astype(dtype)
+    orders_2 = orders_1 if symmetric else orders_2.astype(dtype)
+    counts_1 = orders_1.sum(axis=1)
+    counts_2 = orders_2.sum(axis=1)
+
+    num_1, num_2 = len(orders_1), len(orders_2)
+    distances = np.zeros((num_1, num_2))
+    for start_1 in range(0, num_1, block_size):
+        stop_1 = min(start_1 + block_size, num_1)
+        for start_2 in range(start_1 if symmetric else 0, num_2, block_size):
+            stop_2 = min(start_2 + block_size, num_2)
+            block = counts_1[start_1:stop_1, np.newaxis] + counts_2[np.newaxis, start_2:stop_2] \
+                - 2 * orders_1[start_1:stop_1] @ orders_2[start_2:stop_2].T
+            distances[start_1:stop_1, start_2:stop_2] = np.rint(block)
+            if symmetric and start_1 != start_2:
+                distances[start_2:stop_2, start_1:stop_1] = np.rint(block).T
+    return distances
 
 
 # # # # # # # # # # # # # # # #
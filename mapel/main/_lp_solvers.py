@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+
+import os
+
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+
+try:
+    from scipy.optimize import milp, LinearConstraint, Bounds
+except ImportError:
+    milp = None
+
+try:
+    import pulp
+except ImportError:
+    pulp = None
+
+try:
+    import cplex
+except ImportError:
+    cplex = None
+
+try:
+    import gurobipy
+except ImportError:
+    gurobipy = None
+
+
+# in order of preference
+SOLVERS = ['highs', 'cbc', 'cplex', 'gurobi']
+
+
+def get_available_solvers() -> list:
+    """ Return: names of the solvers that can be used in the current environment """
+    available = {'highs': milp is not None,
+                 'cbc': pulp is not None,
+                 'cplex': cplex is not None,
+                 'gurobi': gurobipy is not None}
+    return [solver for solver in SOLVERS if available[solver]]
+
+
+def get_default_solver() -> str:
+    """ Return: solver set in MAPEL_LP_SOLVER variable, or the first available one """
+    solver = os.environ.get('MAPEL_LP_SOLVER')
+    if solver is not None:
+        return solver.lower()
+    available = get_available_solvers()
+    if not available:
+        raise ImportError('No LP solver found! Install scipy>=1.9 (HiGHS) or pulp (CBC).')
+    return available[0]
+
+
+class LinearProgram:
+    """ (Mixed integer) linear program built in memory.
+
+    Variables are added in blocks and referred to by their indices, constraints are
+    added as rows of the form: lb <= sum(coefficients * x[variables]) <= ub.
+    The same model can be solved by any of the supported solvers. """
+
+    def __init__(self, sense: str = 'minimize'):
+        self.sense = sense
+
+        self.objective = []
+        self.lower_bounds = []
+        self.upper_bounds = []
+        self.integrality = []
+        self.num_variables = 0
+
+        self.rows = []
+        self.cols = []
+        self.coefficients = []
+        self.row_lower_bounds = []
+        self.row_upper_bounds = []
+        self.num_constraints = 0
+
+    def add_variables(self, shape, obj=0., lb=0., ub=np.inf, integer: bool = False,
+                      binary: bool = False) -> np.ndarray:
+        """ Return: array (of given shape) with indices of the new variables """
+        size = int(np.prod(shape))
+        if binary:
+            integer = True
+            ub = np.minimum(ub, 1.)
+        self.objective.append(_broadcast(obj, shape))
+        self.lower_bounds.append(_broadcast(lb, shape))
+        self.upper_bounds.append(_broadcast(ub, shape))
+        self.integrality.append(np.full(size, int(integer)))
+        indices = np.arange(self.num_variables, self.num_variables + size).reshape(shape)
+        self.num_variables += size
+        return indices
+
+    def add_constraints(self, variables, coefficients=1., lb=-np.inf, ub=np.inf) -> None:
+        """ Add one constraint per row of variables (a 2D array of variable indices);
+        coefficients have to be broadcastable to the shape of variables """
+        variables = np.atleast_2d(variables)
+        num_rows = variables.shape[0]
+        coefficients = np.broadcast_to(np.asarray(coefficients, dtype=float), variables.shape)
+        rows = np.broadcast_to(np.arange(self.num_constraints,
+                                         self.num_constraints + num_rows)[:, np.newaxis],
+                               variables.shape)
+        nonzero = coefficients != 0
+        self.rows.append(rows[nonzero])
+        self.cols.append(variables[nonzero])
+        self.coefficients.append(coefficients[nonzero])
+        self.row_lower_bounds.append(np.broadcast_to(np.asarray(lb, dtype=float), num_rows))
+        self.row_upper_bounds.append(np.broadcast_to(np.asarray(ub, dtype=float), num_rows))
+        self.num_constraints += num_rows
+
+    def get_model_arrays(self) -> tuple:
+        """ Return: c, integrality, lb, ub, A (csr), row_lb, row_ub """
+        c = _concatenate(self.objective)
+        if self.sense == 'maximize':
+            c = -c
+        matrix = coo_matrix((_concatenate(self.coefficients),
+                             (_concatenate(self.rows, dtype=int),
+                              _concatenate(self.cols, dtype=int))),
+                            shape=(self.num_constraints, self.num_variables))
+        return (c, _concatenate(self.integrality, dtype=int),
+                _concatenate(self.lower_bounds), _concatenate(self.upper_bounds),
+                csr_matrix(matrix),
+                _concatenate(self.row_lower_bounds), _concatenate(self.row_upper_bounds))
+
+    def solve(self, solver: str = None, time_limit: float = None,
+              threads: int = 1) -> (float, np.ndarray):
+        """ Return: objective value, values of all the variables
+        (None, None if the solver failed) """
+        if solver is None:
+            solver = get_default_solver()
+        solvers = {'highs': _solve_highs,
+                   'cbc': _solve_cbc,
+                   'cplex': _solve_cplex,
+                   'gurobi': _solve_gurobi}
+        if solver not in solvers:
+            raise ValueError(f'Unknown LP solver: {solver}')
+        objective_value, values = solvers[solver](self, time_limit, threads)
+        if objective_value is None:
+            print("Exception raised while solving")
+        return objective_value, values
+
+
+def _broadcast(values, shape) -> np.ndarray:
+    return np.broadcast_to(np.asarray(values, dtype=float), shape).ravel()
+
+
+def _concatenate(arrays, dtype=float) -> np.ndarray:
+    if not arrays:
+        return np.zeros(0, dtype=dtype)
+    return np.concatenate([np.asarray(array, dtype=dtype) for array in arrays])
+
+
+def _sign(program: LinearProgram) -> float:
+    return -1. if program.sense == 'maximize' else 1.
+
+
+def _split_rows(row_lb, row_ub) -> list:
+    """ Return: list of (row_indices, sense, rhs) with sense in 'E', 'G', 'L' """
+    equal = row_lb == row_ub
+    lower = ~equal & np.isfinite(row_lb)
+    upper = ~equal & np.isfinite(row_ub)
+    return [(np.flatnonzero(equal), 'E', row_lb[equal]),
+            (np.flatnonzero(lower), 'G', row_lb[lower]),
+            (np.flatnonzero(upper), 'L', row_ub[upper])]
+
+
+def _solve_highs(program: LinearProgram, time_limit: float, threads: int):
+    if milp is None:
+        raise ImportError('HiGHS solver requires scipy>=1.9')
+    c, integrality, lb, ub, matrix, row_lb, row_ub = program.get_model_arrays()
+    constraints = [LinearConstraint(matrix, row_lb, row_ub)] if matrix.shape[0] else []
+    options = {} if time_limit is None else {'time_limit': time_limit}
+    result = milp(c, integrality=integrality, bounds=Bounds(lb, ub),
+                  constraints=constraints, options=options)
+    if result.x is None:
+        return None, None
+    return _sign(program) * result.fun, result.x
+
+
+def _solve_cbc(program: LinearProgram, time_limit: float, threads: int):
+    if pulp is None:
+        raise ImportError('CBC solver requires pulp')
+    c, integrality, lb, ub, matrix, row_lb, row_ub = program.get_model_arrays()
+    model = pulp.LpProblem('mapel', pulp.LpMinimize)
+    variables = [pulp.LpVariable(f'x{i}',
+                                 lowBound=lb[i] if np.isfinite(lb[i]) else None,
+                                 upBound=ub[i] if np.isfinite(ub[i]) else None,
+                                 cat='Integer' if integrality[i] else 'Continuous')
+                 for i in range(program.num_variables)]
+    model += pulp.lpSum(c[i] * variables[i] for i in np.flatnonzero(c))
+    for row_indices, sense, rhs in _split_rows(row_lb, row_ub):
+        for row, value in zip(row_indices, rhs):
+            start, stop = matrix.indptr[row], matrix.indptr[row + 1]
+            expression = pulp.lpSum(coefficient * variables[col] for col, coefficient in
+                                    zip(matrix.indices[start:stop], matrix.data[start:stop]))
+            if sense == 'E':
+                model += expression == value
+            elif sense == 'G':
+                model += expression >= value
+            else:
+                model += expression <= value
+    model.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit, threads=threads))
+    if pulp.LpStatus[model.status] != 'Optimal':
+        return None, None
+    values = np.array([variable.varValue for variable in variables], dtype=float)
+    return _sign(program) * pulp.value(model.objective), values
+
+
+def _solve_cplex(program: LinearProgram, time_limit: float, threads: int):
+    if cplex is None:
+        raise ImportError('CPLEX solver requires cplex')
+    c, integrality, lb, ub, matrix, row_lb, row_ub = program.get_model_arrays()
+    cp = cplex.Cplex()
+    cp.parameters.threads.set(threads)
+    if time_limit is not None:
+        cp.parameters.timelimit.set(time_limit)
+    cp.set_results_stream(None)
+    cp.objective.set_sense(cp.objective.sense.minimize)
+    types = [cp.variables.type.integer if integer else cp.variables.type.continuous
+             for integer in integrality]
+    cp.variables.add(obj=c.tolist(),
+                     lb=[value if np.isfinite(value) else -cplex.infinity for value in lb],
+                     ub=[value if np.isfinite(value) else cplex.infinity for value in ub],
+                     types=types)
+    for row_indices, sense, rhs in _split_rows(row_lb, row_ub):
+        if len(row_indices) == 0:
+            continue
+        lin_expr = []
+        for row in row_indices:
+            start, stop = matrix.indptr[row], matrix.indptr[row + 1]
+            lin_expr.append(cplex.SparsePair(ind=matrix.indices[start:stop].tolist(),
+                                             val=matrix.data[start:stop].tolist()))
+        cp.linear_constraints.add(lin_expr=lin_expr, senses=[sense] * len(lin_expr),
+                                  rhs=rhs.tolist())
+    try:
+        cp.solve()
+        values = np.array(cp.solution.get_values())
+        return _sign(program) * cp.solution.get_objective_value(), values
+    except cplex.CplexSolverError:
+        return None, None
+
+
+def _solve_gurobi(program: LinearProgram, time_limit: float, threads: int):
+    if gurobipy is None:
+        raise ImportError('Gurobi solver requires gurobipy')
+    c, integrality, lb, ub, matrix, row_lb, row_ub = program.get_model_arrays()
+    model = gurobipy.Model()
+    model.Params.OutputFlag = 0
+    model.Params.Threads = threads
+    if time_limit is not None:
+        model.Params.TimeLimit = time_limit
+    vtype = np.where(integrality == 1, gurobipy.GRB.INTEGER, gurobipy.GRB.CONTINUOUS)
+    x = model.addMVar(program.num_variables, lb=lb, ub=ub, obj=c, vtype=vtype)
+    for row_indices, sense, rhs in _split_rows(row_lb, row_ub):
+        if len(row_indices) == 0:
+            continue
+        gurobi_sense = {'E': '=', 'G': '>', 'L': '<'}[sense]
+        model.addMConstr(matrix[row_indices], x, gurobi_sense, rhs)
+    model.optimize()
+    if model.SolCount == 0:
+        return None, None
+    return _sign(program) * model.ObjVal, np.array(x.X)
+
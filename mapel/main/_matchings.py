@@ -1,11 +1,25 @@
 #!/usr/bin/env python
 
-import os
+import logging
 
 import numpy as np
 from scipy.optimize import linear_sum_assignment
 
 from mapel.elections.metrics import lp
+from mapel.main._qap import solve_qap, get_optimality_gap
+
+
+class InexactDistance(float):
+    """ Distance found when the time limit was reached, i.e., only an upper bound;
+    lower_bound is the best lower bound proven so far """
+
+    def __new__(cls, value: float, lower_bound: float):
+        distance = float.__new__(cls, value)
+        distance.lower_bound = lower_bound
+        return distance
+
+    def __reduce__(self):
+        return InexactDistance, (float(self), self.lower_bound)
 
 
 def solve_matching_vectors(cost_table) -> (float, list):
@@ -15,14 +29,25 @@ def solve_matching_vectors(cost_table) -> (float, list):
     return cost_table[row_ind, col_ind].sum(), list(col_ind)
 
 
-def solve_matching_matrices(matrix_1, matrix_2, length, inner_distance) -> float:
-    """ Return: objective value"""
-    file_name = f'{np.random.random()}.lp'
-    path = os.path.join(os.getcwd(), 'trash', file_name)
-    lp.generate_lp_file_matching_matrix(path, matrix_1, matrix_2, length, inner_distance)
-    matching_cost = lp.solve_lp_matrix(path)
-    lp.remove_lp_file(path)
-    return matching_cost
+def solve_matching_matrices(matrix_1, matrix_2, length, inner_distance,
+                            method: str = 'bnb', time_limit: float = None) -> float:
+    """ Return: objective value (InexactDistance if it is not proven to be optimal)
+
+    method: 'bnb' (exact, unless time_limit is reached), 'heuristic' (upper bound
+    from local search) or 'lp' (integer linear program)
+    time_limit: seconds after which branch-and-bound stops with the best matching
+    found so far (by default it runs until optimality is proven) """
+    if method == 'lp':
+        return lp.solve_lp_matching_matrices(matrix_1, matrix_2, length, inner_distance)
+
+    upper_bound, lower_bound, _ = solve_qap(matrix_1, matrix_2, inner_distance,
+                                            method=method, time_limit=time_limit)
+    if upper_bound > lower_bound + 1e-9:
+        if method == 'bnb':
+            logging.debug(f'QAP time limit reached, optimality gap: '
+                          f'{get_optimality_gap(upper_bound, lower_bound):.2%}')
+        return InexactDistance(upper_bound, lower_bound)
+    return upper_bound
 
 
 # # # # # # # # # # # # # # # #
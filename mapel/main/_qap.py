@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+""" Quadratic assignment engine for distances that match the entries of two (m, m)
+matrices (e.g., pairwise or voterlikeness ones):
+
+    min over permutations s of  sum_{k != i} T(A[k][i], B[s(k)][s(i)])
+
+where T is the inner distance between single values. It provides a heuristic upper
+bound (iterated linearization and 2-opt local search), a Gilmore-Lawler lower bound,
+and an exact branch-and-bound (with an optional time limit). """
+
+from time import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from mapel.main._inner_distances import get_cost_matrix
+
+
+class QuadraticAssignment:
+
+    def __init__(self, matrix_1, matrix_2, inner_distance):
+
+        matrix_1 = np.asarray(matrix_1, dtype=float)
+        matrix_2 = np.asarray(matrix_2, dtype=float)
+        self.size = len(matrix_1)
+
+        values_1, index_1 = np.unique(matrix_1, return_inverse=True)
+        values_2, index_2 = np.unique(matrix_2, return_inverse=True)
+        table = get_cost_matrix(values_1[:, np.newaxis], values_2[:, np.newaxis],
+                                inner_distance)
+
+        # diagonal entries point at an extra zero row (column) of the table,
+        # so that they never contribute to the cost
+        self.table = np.zeros([len(values_1) + 1, len(values_2) + 1])
+        self.table[:-1, :-1] = table
+        self.index_1 = index_1.reshape(matrix_1.shape)
+        self.index_2 = index_2.reshape(matrix_2.shape)
+        np.fill_diagonal(self.index_1, len(values_1))
+        np.fill_diagonal(self.index_2, len(values_2))
+
+        # for Monge tables, the cheapest matching of two sets of values is the sorted one
+        self.is_monge = bool(np.all(table[:-1, :-1] + table[1:, 1:] <=
+                                    table[:-1, 1:] + table[1:, :-1] + 1e-9))
+
+    def cost(self, permutation) -> float:
+        """ Return: value of the objective for given permutation """
+        permutation = np.asarray(permutation)
+        return float(self.table[self.index_1,
+                                self.index_2[permutation][:, permutation]].sum())
+
+    def linear_costs(self, permutation) -> (np.ndarray, np.ndarray):
+        """ Return: tables G1, G2, where G1[k][l] (G2[k][l]) is the cost of the k-th row
+        (column) if k is mapped to l, and all the other indices i to permutation[i] """
+        permutation = np.asarray(permutation)
+        rows_2 = self.index_2[:, permutation]
+        cols_2 = self.index_2[permutation, :].T
+        g_1 = np.empty([self.size, self.size])
+        g_2 = np.empty([self.size, self.size])
+        for k in range(self.size):
+            g_1[k] = self.table[self.index_1[k][np.newaxis, :], rows_2].sum(axis=1)
+            g_2[k] = self.table[self.index_1[:, k][np.newaxis, :], cols_2].sum(axis=1)
+        return g_1, g_2
+
+    def improve_by_linearization(self, permutation) -> (float, np.ndarray):
+        """ Return: cost and permutation after iterated linear assignment steps """
+        best_permutation = np.asarray(permutation)
+        best_cost = self.cost(best_permutation)
+        while True:
+            g_1, g_2 = self.linear_costs(best_permutation)
+            _, new_permutation = linear_sum_assignment(g_1 + g_2)
+            new_cost = self.cost(new_permutation)
+            if new_cost >= best_cost - 1e-9:
+                return best_cost, best_permutation
+            best_cost, best_permutation = new_cost, new_permutation
+
+    def improve_by_swaps(self, permutation) -> (float, np.ndarray):
+        """ Return: cost and permutation after a best-improvement 2-opt local search """
+        permutation = np.array(permutation)
+        cost = self.cost(permutation)
+        table = self.table
+        while True:
+            g_1, g_2 = self.linear_costs(permutation)
+            # moved[p][q] -- cost of row and column p if p is mapped to permutation[q]
+            moved = g_1[:, permutation] + g_2[:, permutation]
+            current = np.diag(moved)
+            b_pq = self.index_2[permutation[:, np.newaxis], permutation[np.newaxis, :]]
+            old_pairs = table[self.index_1, b_pq]
+            new_pairs = table[self.index_1, b_pq.T]
+            delta = (moved + moved.T - current[:, np.newaxis] - current[np.newaxis, :]
+                     + old_pairs + old_pairs.T + new_pairs + new_pairs.T)
+            np.fill_diagonal(delta, 0.)
+            p, q = np.unravel_index(np.argmin(delta), delta.shape)
+            if delta[p, q] >= -1e-9:
+                return cost, permutation
+            permutation[[p, q]] = permutation[[q, p]]
+            cost += delta[p, q]
+
+    def get_upper_bound(self, num_restarts: int = 4, start=None) -> (float, np.ndarray):
+        """ Return: cost and permutation found by the local search from several starts """
+        starts = [np.arange(self.size)] + \
+                 [np.random.permutation(self.size) for _ in range(num_restarts)]
+        if start is not None:
+            starts.insert(0, np.asarray(start))
+
+        best_cost, best_permutation = np.inf, None
+        for permutation in starts:
+            cost = self.cost(permutation)
+            while True:
+                new_cost, permutation = self.improve_by_linearization(permutation)
+                new_cost, permutation = self.improve_by_swaps(permutation)
+                if new_cost >= cost - 1e-9:
+                    break
+                cost = new_cost
+            cost = self.cost(permutation)
+            if cost < best_cost:
+                best_cost, best_permutation = cost, permutation
+        return best_cost, best_permutation
+
+    def get_bound_table(self, rows=None, cols=None) -> np.ndarray:
+        """ Return: table L, where L[k][l] is a lower bound on the cost of the terms
+        (k, i) and (i, k) for i in rows if k is mapped to l (and rows to cols) """
+        if rows is None:
+            rows = np.arange(self.size)
+            cols = np.arange(self.size)
+        block_1 = self.index_1[np.ix_(rows, rows)]
+        block_2 = self.index_2[np.ix_(cols, cols)]
+        # each term is split between its row and its column
+        return (self._min_matchings(block_1, block_2) +
+                self._min_matchings(block_1.T, block_2.T)) / 2.
+
+    def _min_matchings(self, block_1: np.ndarray, block_2: np.ndarray) -> np.ndarray:
+        """ Return: M[k][l] -- cost of the cheapest matching of the off-diagonal
+        values from k-th row of block_1 with those from l-th row of block_2 """
+        size = len(block_1)
+        off_diagonal = ~np.eye(size, dtype=bool)
+        rows_1 = block_1[off_diagonal].reshape(size, size - 1)
+        rows_2 = block_2[off_diagonal].reshape(size, size - 1)
+        if self.is_monge:
+            rows_1 = np.sort(rows_1, axis=1)
+            rows_2 = np.sort(rows_2, axis=1)
+            return np.array([self.table[rows_1[k][np.newaxis, :], rows_2].sum(axis=1)
+                             for k in range(size)])
+        matchings = np.zeros([size, size])
+        for k in range(size):
+            for l in range(size):
+                costs = self.table[rows_1[k][:, np.newaxis], rows_2[l][np.newaxis, :]]
+                row_ind, col_ind = linear_sum_assignment(costs)
+                matchings[k, l] = costs[row_ind, col_ind].sum()
+        return matchings
+
+    def get_lower_bound(self) -> (float, np.ndarray):
+        """ Return: Gilmore-Lawler lower bound, permutation optimal for the bound table """
+        bound_table = self.get_bound_table()
+        row_ind, col_ind = linear_sum_assignment(bound_table)
+        return float(bound_table[row_ind, col_ind].sum()), col_ind
+
+    def branch_and_bound(self, upper_bound: float, permutation,
+                         time_limit: float = None) -> (float, float, np.ndarray):
+        """ Return: best cost found, lower bound, best permutation
+        (the cost is optimal, i.e., equal to the lower bound, unless the time ran out) """
+        start_time = time()
+        size = self.size
+        best_cost, best_permutation = upper_bound, np.asarray(permutation)
+
+        # node: (bound, assigned values for indices 0, ..., len(assigned) - 1)
+        stack = [(-np.inf, [])]
+        while stack:
+            if time_limit is not None and time() - start_time > time_limit:
+                lower_bound = min([best_cost] + [bound for bound, _ in stack])
+                return best_cost, lower_bound, best_permutation
+
+            bound, assigned = stack.pop()
+            if bound >= best_cost - 1e-9:
+                continue
+            depth = len(assigned)
+            if depth == size:
+                best_cost, best_permutation = self.cost(assigned), np.array(assigned)
+                continue
+
+            children = []
+            for k, l, child_bound in self._get_children(assigned):
+                if child_bound < best_cost - 1e-9:
+                    children.append((child_bound, assigned + [l]))
+            # the most promising child is explored first
+            children.sort(key=lambda child: -child[0])
+            stack.extend(children)
+
+        return best_cost, best_cost, best_permutation
+
+    def _get_children(self, assigned: list) -> list:
+        """ Return: list of (k, l, bound) for assigning the next index k to a free l """
+        size = self.size
+        depth = len(assigned)
+        fixed = np.arange(depth)
+        rows = np.arange(depth, size)
+        free = np.setdiff1d(np.arange(size), assigned)
+        assigned = np.asarray(assigned, dtype=int)
+
+        fixed_cost = float(self.table[self.index_1[np.ix_(fixed, fixed)],
+                                      self.index_2[np.ix_(assigned, assigned)]].sum())
+
+        # linear terms: between free and already fixed indices
+        linear = self.table[self.index_1[np.ix_(rows, fixed)][:, np.newaxis, :],
+                            self.index_2[np.ix_(free, assigned)][np.newaxis, :, :]].sum(axis=2)
+        linear += self.table[self.index_1[np.ix_(fixed, rows)].T[:, np.newaxis, :],
+                             self.index_2[np.ix_(assigned, free)].T[np.newaxis, :, :]].sum(axis=2)
+        if len(rows) > 1:
+            bound_table = linear + self.get_bound_table(rows, free)
+        else:
+            bound_table = linear
+
+        # the bound for each child: its own cost plus the best assignment of the rest
+        children = []
+        for position, l in enumerate(free):
+            rest_rows = np.arange(1, len(rows))
+            rest_cols = np.delete(np.arange(len(free)), position)
+            if len(rest_rows) > 0:
+                sub_table = bound_table[np.ix_(rest_rows, rest_cols)]
+                row_ind, col_ind = linear_sum_assignment(sub_table)
+                rest = sub_table[row_ind, col_ind].sum()
+            else:
+                rest = 0.
+            children.append((depth, l, fixed_cost + bound_table[0, position] + rest))
+        return children
+
+
+def solve_qap(matrix_1, matrix_2, inner_distance, method: str = 'bnb',
+              time_limit: float = None, num_restarts: int = 4) -> (float, float, np.ndarray):
+    """ Match the entries of two square matrices (see QuadraticAssignment)
+
+    method: 'heuristic' (local search) or 'bnb' (branch-and-bound starting from the
+    local search, exact unless time_limit is reached)
+
+    Return: distance (upper bound), lower bound, matching """
+    problem = QuadraticAssignment(matrix_1, matrix_2, inner_distance)
+    if problem.size <= 1:
+        return 0., 0., np.arange(problem.size)
+
+    lower_bound, start = problem.get_lower_bound()
+    upper_bound, permutation = problem.get_upper_bound(num_restarts=num_restarts, start=start)
+
+    if method == 'bnb' and upper_bound > lower_bound + 1e-9:
+        upper_bound, lower_bound, permutation = problem.branch_and_bound(
+            upper_bound, permutation, time_limit=time_limit)
+    elif method not in {'bnb', 'heuristic'}:
+        raise ValueError(f'Unknown QAP method: {method}')
+
+    return upper_bound, min(lower_bound, upper_bound), permutation
+
+
+def get_optimality_gap(upper_bound: float, lower_bound: float) -> float:
+    """ Return: relative gap between the bounds (zero if the upper bound is optimal) """
+    if upper_bound <= 0:
+        return 0.
+    return (upper_bound - lower_bound) / upper_bound
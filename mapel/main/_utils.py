@@ -1,3 +1,9 @@
+import hashlib
+import random
+from contextlib import contextmanager
+
+import numpy as np
+
 
 def get_instance_id(single, family_id, j):
     if single:
@@ -7,4 +13,25 @@ def get_instance_id(single, family_id, j):
 
 def rotate(vector, shift):
     shift = shift % len(vector)
-    return vector[shift:] + vector[:shift]
\ No newline at end of file
+    return vector[shift:] + vector[:shift]
+
+
+def get_seed_sequence(seed, family_id, j) -> np.random.SeedSequence:
+    """ Return: independent seed sequence for j-th instance of a given family """
+    family_hash = int.from_bytes(hashlib.sha256(str(family_id).encode()).digest()[0:8], 'little')
+    return np.random.SeedSequence(entropy=seed, spawn_key=(family_hash, j))
+
+
+@contextmanager
+def seeded_global_random_state(seed_sequence: np.random.SeedSequence):
+    """ Seed global np.random and random states (used by the models) from a seed sequence;
+    the previous states are restored on exit """
+    np_state, random_state = np.random.get_state(), random.getstate()
+    state = seed_sequence.generate_state(4)
+    np.random.seed(state)
+    random.seed(int.from_bytes(state.tobytes(), 'little'))
+    try:
+        yield
+    finally:
+        np.random.set_state(np_state)
+        random.setstate(random_state)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+""" Landmark MDS (de Silva and Tenenbaum), i.e., the Nystrom approximation of classical
+MDS. Only the distances between all the instances and a few landmarks are needed:
+the landmarks are embedded by classical MDS, and every other instance is placed by
+distance-based triangulation w.r.t. the landmarks. """
+
+import numpy as np
+
+
+def classical_mds(landmark_distances: np.ndarray, dim: int = 2) -> (np.ndarray, np.ndarray):
+    """ Return: (L, dim) positions of the landmarks, (L, dim) triangulation matrix
+    (columns with non-positive eigenvalues are left zero) """
+    squared = np.asarray(landmark_distances, dtype=float) ** 2
+    num_landmarks = len(squared)
+    centering = np.eye(num_landmarks) - np.ones([num_landmarks, num_landmarks]) / num_landmarks
+    gram = -0.5 * centering @ squared @ centering
+
+    eigenvalues, eigenvectors = np.linalg.eigh((gram + gram.T) / 2)
+    order = np.argsort(-eigenvalues)[:dim]
+    eigenvalues, eigenvectors = eigenvalues[order], eigenvectors[:, order]
+
+    positions = np.zeros([num_landmarks, dim])
+    triangulation = np.zeros([num_landmarks, dim])
+    positive = eigenvalues > 1e-12
+    positions[:, :len(order)][:, positive] = \
+        eigenvectors[:, positive] * np.sqrt(eigenvalues[positive])
+    triangulation[:, :len(order)][:, positive] = \
+        eigenvectors[:, positive] / np.sqrt(eigenvalues[positive])
+    return positions, triangulation
+
+
+def landmark_mds(landmark_distances: np.ndarray, distances_to_landmarks: np.ndarray,
+                 dim: int = 2) -> np.ndarray:
+    """ Embed instances given only their distances to the landmarks
+
+    landmark_distances: (L, L) distances between the landmarks
+    distances_to_landmarks: (N, L) distances between all instances and the landmarks
+
+    Return: (N, dim) positions of the instances """
+    squared = np.asarray(landmark_distances, dtype=float) ** 2
+    _, triangulation = classical_mds(landmark_distances, dim=dim)
+    squared_to_landmarks = np.asarray(distances_to_landmarks, dtype=float) ** 2
+    return -0.5 * (squared_to_landmarks - squared.mean(axis=0)) @ triangulation
+
+
+def compute_stress(embedded_distances: np.ndarray, distances: np.ndarray) -> float:
+    """ Return: normalized stress (Kruskal's stress-1) of the embedded distances """
+    embedded_distances = np.asarray(embedded_distances, dtype=float)
+    distances = np.asarray(distances, dtype=float)
+    denominator = np.sum(distances ** 2)
+    if denominator == 0:
+        return 0.
+    return float(np.sqrt(np.sum((embedded_distances - distances) ** 2) / denominator))
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+
+import io
+import json
+import os
+
+import numpy as np
+
+NPY_HEADER_FUNCTIONS = {
+    (1, 0): (np.lib.format.read_array_header_1_0, np.lib.format.write_array_header_1_0),
+    (2, 0): (np.lib.format.read_array_header_2_0, np.lib.format.write_array_header_2_0),
+}
+
+
+class DistanceMatrix:
+    """ Symmetric matrix of distances between instances.
+
+    Values are kept as a condensed lower triangle (diagonal included) row by row,
+    so the matrix can be stored in a binary file and memory-mapped on load, and
+    adding instances only appends values (see extend and append_to_file). For
+    backward compatibility it behaves like a dictionary of dictionaries,
+    i.e., distances[instance_id_1][instance_id_2] works as before. """
+
+    def __init__(self, instance_ids: list, values: np.ndarray = None, dtype=np.float64):
+
+        self.instance_ids = list(instance_ids)
+        self.index = {instance_id: i for i, instance_id in enumerate(self.instance_ids)}
+
+        size = len(self.instance_ids)
+        if values is None:
+            values = np.zeros(size * (size + 1) // 2, dtype=dtype)
+        self.values = values
+
+    def __len__(self):
+        return len(self.instance_ids)
+
+    def __iter__(self):
+        return iter(self.instance_ids)
+
+    def __contains__(self, instance_id):
+        return instance_id in self.index
+
+    def __getitem__(self, instance_id):
+        return DistanceRow(self, self.index[instance_id])
+
+    def keys(self):
+        return list(self.instance_ids)
+
+    def items(self):
+        return [(instance_id, self[instance_id]) for instance_id in self.instance_ids]
+
+    def get_value(self, instance_id_1, instance_id_2) -> float:
+        return self.values[self._position(self.index[instance_id_1],
+                                          self.index[instance_id_2])]
+
+    def set_value(self, instance_id_1, instance_id_2, value: float) -> None:
+        self.values[self._position(self.index[instance_id_1],
+                                   self.index[instance_id_2])] = value
+
+    @staticmethod
+    def _position(i: int, j: int) -> int:
+        if i < j:
+            i, j = j, i
+        return i * (i + 1) // 2 + j
+
+    def to_matrix(self) -> np.ndarray:
+        """ Return: dense (N, N) matrix """
+        size = len(self.instance_ids)
+        matrix = np.zeros((size, size), dtype=self.values.dtype)
+        rows, cols = np.tril_indices(size)
+        matrix[rows, cols] = self.values
+        matrix[cols, rows] = self.values
+        return matrix
+
+    @classmethod
+    def from_matrix(cls, instance_ids: list, matrix: np.ndarray, dtype=np.float64):
+        rows, cols = np.tril_indices(len(instance_ids))
+        return cls(instance_ids, values=np.asarray(matrix, dtype=dtype)[rows, cols])
+
+    @classmethod
+    def from_dict(cls, distances: dict, instance_ids: list = None, dtype=np.float64):
+        """ Build from a dictionary of dictionaries (missing values are set to zero) """
+        if instance_ids is None:
+            instance_ids = list(distances)
+        distance_matrix = cls(instance_ids, dtype=dtype)
+        for instance_id_1 in distances:
+            if instance_id_1 not in distance_matrix:
+                continue
+            for instance_id_2, value in distances[instance_id_1].items():
+                if instance_id_2 in distance_matrix:
+                    distance_matrix.set_value(instance_id_1, instance_id_2, value)
+        return distance_matrix
+
+    def subset(self, instance_ids: list):
+        """ Return: distance matrix restricted to given instances """
+        indices = np.array([self.index[instance_id] for instance_id in instance_ids], dtype=int)
+        rows, cols = np.tril_indices(len(indices))
+        i = np.maximum(indices[rows], indices[cols])
+        j = np.minimum(indices[rows], indices[cols])
+        positions = i * (i + 1) // 2 + j
+        return DistanceMatrix(instance_ids, values=np.array(self.values[positions]))
+
+    def extend(self, new_instance_ids: list) -> None:
+        """ Add new instances (with zero distances) to the matrix, i.e., append their rows
+        to the condensed values """
+        new_instance_ids = [instance_id for instance_id in new_instance_ids
+                            if instance_id not in self.index]
+        if not new_instance_ids:
+            return
+        old_size = len(self.instance_ids)
+        for i, instance_id in enumerate(new_instance_ids):
+            self.index[instance_id] = old_size + i
+        self.instance_ids += new_instance_ids
+        size = len(self.instance_ids)
+        tail = np.zeros(size * (size + 1) // 2 - len(self.values), dtype=self.values.dtype)
+        self.values = np.concatenate([self.values, tail])
+
+    def save(self, path: str, dtype=None) -> None:
+        """ Store as path.npy (condensed values) and path.json (instance ids) """
+        values = self.values if dtype is None else self.values.astype(dtype)
+        np.save(f'{path}.npy', values)
+        self._save_header(path, values.dtype)
+
+    def append_to_file(self, path: str, num_stored: int, dtype=None) -> None:
+        """ Store the values of the instances added (see extend) after the first num_stored
+        ones, by appending them to path.npy written by save; the whole file is rewritten
+        only if it does not match the first num_stored instances """
+        values = self.values if dtype is None else self.values.astype(dtype)
+        num_stored_values = num_stored * (num_stored + 1) // 2
+
+        appended = False
+        if DistanceMatrix.exists(path):
+            with open(f'{path}.json', 'r') as json_file:
+                header = json.load(json_file)
+            stored_ids = header['instance_ids'] if header.get('layout') == 'lower' else None
+        if DistanceMatrix.exists(path) and stored_ids == self.instance_ids[0:num_stored]:
+            with open(f'{path}.npy', 'r+b') as npy_file:
+                version = np.lib.format.read_magic(npy_file)
+                if version in NPY_HEADER_FUNCTIONS:
+                    read_header, write_header = NPY_HEADER_FUNCTIONS[version]
+                    shape, fortran_order, stored_dtype = read_header(npy_file)
+                    data_offset = npy_file.tell()
+                    header = io.BytesIO()
+                    write_header(header, {'descr': np.lib.format.dtype_to_descr(values.dtype),
+                                          'fortran_order': False, 'shape': values.shape})
+                    # the header of .npy files leaves room for the first dimension to grow
+                    if shape == (num_stored_values,) and not fortran_order and \
+                            stored_dtype == values.dtype and \
+                            len(header.getvalue()) == data_offset:
+                        npy_file.seek(data_offset + num_stored_values * values.dtype.itemsize)
+                        npy_file.write(np.ascontiguousarray(values[num_stored_values:]).tobytes())
+                        npy_file.truncate()
+                        npy_file.seek(0)
+                        npy_file.write(header.getvalue())
+                        appended = True
+
+        if appended:
+            self._save_header(path, values.dtype)
+        else:
+            self.save(path, dtype=dtype)
+
+    def _save_header(self, path: str, dtype) -> None:
+        with open(f'{path}.json', 'w') as json_file:
+            json.dump({'instance_ids': self.instance_ids, 'dtype': str(dtype),
+                       'layout': 'lower'}, json_file)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        """ Import from path.npy and path.json (memory-mapped, copy-on-write) """
+        with open(f'{path}.json', 'r') as json_file:
+            header = json.load(json_file)
+        values = np.load(f'{path}.npy', mmap_mode='c' if mmap else None)
+        if header.get('layout') != 'lower':
+            # older files keep the condensed upper triangle
+            size = len(header['instance_ids'])
+            rows, cols = np.tril_indices(size)
+            values = np.array(values[cols * (2 * size - cols + 1) // 2 + rows - cols])
+        return cls(header['instance_ids'], values=values)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.isfile(f'{path}.npy') and os.path.isfile(f'{path}.json')
+
+
+class DistanceRow:
+    """ Dictionary-like view of a single row of a DistanceMatrix """
+
+    def __init__(self, distance_matrix: DistanceMatrix, i: int):
+        self.distance_matrix = distance_matrix
+        self.i = i
+
+    def _other_ids(self):
+        instance_ids = self.distance_matrix.instance_ids
+        return instance_ids[0:self.i] + instance_ids[self.i + 1:]
+
+    def __getitem__(self, instance_id):
+        distance_matrix = self.distance_matrix
+        return float(distance_matrix.values[
+                         distance_matrix._position(self.i, distance_matrix.index[instance_id])])
+
+    def __setitem__(self, instance_id, value):
+        distance_matrix = self.distance_matrix
+        distance_matrix.values[
+            distance_matrix._position(self.i, distance_matrix.index[instance_id])] = value
+
+    def __contains__(self, instance_id):
+        return instance_id in self.distance_matrix.index
+
+    def __iter__(self):
+        return iter(self._other_ids())
+
+    def __len__(self):
+        return len(self.distance_matrix.instance_ids) - 1
+
+    def get(self, instance_id, default=None):
+        if instance_id in self:
+            return self[instance_id]
+        return default
+
+    def keys(self):
+        return self._other_ids()
+
+    def values(self):
+        return [self[instance_id] for instance_id in self._other_ids()]
+
+    def items(self):
+        return [(instance_id, self[instance_id]) for instance_id in self._other_ids()]
+
+
+class LandmarkDistanceMatrix:
+    """ Distances between all instances and a few landmark instances.
+
+    Values are kept as a dense (N, L) array. As for DistanceMatrix,
+    distances[instance_id][landmark_id] and distances[landmark_id][instance_id]
+    both work (for a pair of landmarks, both entries are kept equal). """
+
+    def __init__(self, instance_ids: list, landmark_ids: list = (), values: np.ndarray = None,
+                 dtype=np.float64):
+
+        self.instance_ids = list(instance_ids)
+        self.index = {instance_id: i for i, instance_id in enumerate(self.instance_ids)}
+        self.landmark_ids = []
+        self.landmark_index = {}
+        self.values = np.zeros((len(self.instance_ids), 0), dtype=dtype)
+        self.add_landmarks(landmark_ids)
+        if values is not None:
+            self.values = values
+
+    def __len__(self):
+        return len(self.instance_ids)
+
+    def __iter__(self):
+        return iter(self.instance_ids)
+
+    def __contains__(self, instance_id):
+        return instance_id in self.index
+
+    def __getitem__(self, instance_id):
+        return LandmarkDistanceRow(self, instance_id)
+
+    def add_landmarks(self, landmark_ids: list) -> None:
+        """ Add new landmarks (distances to other landmarks are copied, others are zero) """
+        for landmark_id in landmark_ids:
+            if landmark_id in self.landmark_index:
+                continue
+            column = np.zeros((len(self.instance_ids), 1), dtype=self.values.dtype)
+            for other_id, j in self.landmark_index.items():
+                column[self.index[other_id], 0] = self.values[self.index[landmark_id], j]
+            self.values = np.hstack([self.values, column])
+            self.landmark_index[landmark_id] = len(self.landmark_ids)
+            self.landmark_ids.append(landmark_id)
+
+    def get_value(self, instance_id_1, instance_id_2) -> float:
+        if instance_id_2 in self.landmark_index:
+            return self.values[self.index[instance_id_1], self.landmark_index[instance_id_2]]
+        return self.values[self.index[instance_id_2], self.landmark_index[instance_id_1]]
+
+    def set_value(self, instance_id_1, instance_id_2, value: float) -> None:
+        if instance_id_1 not in self.landmark_index and \
+                instance_id_2 not in self.landmark_index:
+            raise KeyError(f'Neither {instance_id_1} nor {instance_id_2} is a landmark')
+        if instance_id_2 in self.landmark_index:
+            self.values[self.index[instance_id_1], self.landmark_index[instance_id_2]] = value
+        if instance_id_1 in self.landmark_index:
+            self.values[self.index[instance_id_2], self.landmark_index[instance_id_1]] = value
+
+    def to_landmark_matrix(self) -> np.ndarray:
+        """ Return: dense (L, L) matrix of distances between the landmarks """
+        rows = [self.index[landmark_id] for landmark_id in self.landmark_ids]
+        return self.values[rows]
+
+    def save(self, path: str, dtype=None) -> None:
+        """ Store as path.npy (values) and path.json (instance and landmark ids) """
+        values = self.values if dtype is None else self.values.astype(dtype)
+        np.save(f'{path}.npy', values)
+        with open(f'{path}.json', 'w') as json_file:
+            json.dump({'instance_ids': self.instance_ids, 'landmark_ids': self.landmark_ids,
+                       'dtype': str(values.dtype)}, json_file)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        """ Import from path.npy and path.json (memory-mapped, copy-on-write) """
+        with open(f'{path}.json', 'r') as json_file:
+            header = json.load(json_file)
+        values = np.load(f'{path}.npy', mmap_mode='c' if mmap else None)
+        return cls(header['instance_ids'], header['landmark_ids'], values=values)
+
+
+class LandmarkDistanceRow:
+    """ Dictionary-like view of distances from a single instance to the landmarks
+    (or from a single landmark to all the instances) """
+
+    def __init__(self, distance_matrix: LandmarkDistanceMatrix, instance_id):
+        self.distance_matrix = distance_matrix
+        self.instance_id = instance_id
+
+    def __getitem__(self, instance_id):
+        return float(self.distance_matrix.get_value(self.instance_id, instance_id))
+
+    def __setitem__(self, instance_id, value):
+        self.distance_matrix.set_value(self.instance_id, instance_id, value)
+
+    def __contains__(self, instance_id):
+        distance_matrix = self.distance_matrix
+        return instance_id in distance_matrix.index and \
+            (instance_id in distance_matrix.landmark_index or
+             self.instance_id in distance_matrix.landmark_index)
+
+    def get(self, instance_id, default=None):
+        if instance_id in self:
+            return self[instance_id]
+        return default
@@ -8,12 +8,16 @@ from abc import ABCMeta, abstractmethod
 
 import networkx as nx
 import numpy as np
+from scipy.sparse import csr_matrix
 
 from mapel.main.embedding.kamada_kawai.kamada_kawai import KamadaKawai
+from mapel.main.embedding.landmark_mds import landmark_mds, compute_stress
 
 COLORS = []
 
 from mapel.main.objects.Family import Family
+from mapel.main.objects.DistanceMatrix import DistanceMatrix
+from mapel.main.objects.LazyInstances import LazyInstances
 import mapel.elections._print as pr
 
 try:
@@ -37,9 +41,12 @@ class Experiment:
 
     def __init__(self, instances=None, distances=None, dim=2, store=True,
                  coordinates=None, distance_id='emd-positionwise', experiment_id=None,
-                 instance_type='ordinal', _import=True, clean=False, coordinates_names=None):
+                 instance_type='ordinal', _import=True, clean=False, coordinates_names=None,
+                 lazy: bool = True, max_loaded_instances: int = None):
 
         self._import = _import
+        self.lazy = lazy
+        self.max_loaded_instances = max_loaded_instances
         self.clean = clean
         self.experiment_id = experiment_id
 
@@ -52,9 +59,13 @@ class Experiment:
         self.distances = None
         self.coordinates = None
         self.coordinates_lists = {}
+        self.landmark_distances = None
+        self.landmark_times = None
 
         self.families = {}
         self.times = {}
+        # lower bounds of the distances that are not proven to be optimal, by pair of ids
+        self.lower_bounds = {}
         self.stds = {}
         self.matchings = {}
         self.features = {}
@@ -75,7 +86,7 @@ class Experiment:
             self.families = self.import_controllers()
             self.store = store
 
-        if isinstance(instances, dict):
+        if isinstance(instances, (dict, LazyInstances)):
             self.instances = instances
             print('=== Omitting import! ===')
         elif _import and self.experiment_id != 'virtual':
@@ -89,7 +100,7 @@ class Experiment:
         else:
             self.instances = {}
 
-        if isinstance(distances, dict):
+        if isinstance(distances, (dict, DistanceMatrix)):
             self.distances = distances
             print('=== Omitting import! ===')
         elif _import and self.experiment_id != 'virtual':
@@ -131,53 +142,49 @@ class Experiment:
     def add_family(self):
         pass
 
+    def get_distance_matrix(self, distances=None) -> DistanceMatrix:
+        """ Return: distances (by default self.distances) as a DistanceMatrix """
+        if distances is None:
+            distances = self.distances
+        if isinstance(distances, DistanceMatrix):
+            return distances
+        return DistanceMatrix.from_dict(distances)
+
     def embed(self, algorithm: str = 'spring', num_iterations: int = 1000, radius: float = np.infty,
               dim: int = 2, num_neighbors: int = None, method: str = 'standard',
               zero_distance: float = 0.1, factor: float = 1., saveas: str = None) -> None:
 
+        if algorithm in {'landmark', 'landmark-mds'}:
+            return self.embed_landmarks(dim=dim, saveas=saveas)
+
         if algorithm == 'spring':
             attraction_factor = 2
         else:
             attraction_factor = 1
 
-        num_elections = len(self.distances)
-
-        x = np.zeros((num_elections, num_elections))
-
-        for i, instance_id_1 in enumerate(self.distances):
-            for j, instance_id_2 in enumerate(self.distances):
-                if i < j:
-                    self.distances[instance_id_1][instance_id_2] *= factor
-                    if self.distances[instance_id_1][instance_id_2] == 0.:
-                        self.distances[instance_id_1][instance_id_2] = zero_distance
-                        self.distances[instance_id_2][instance_id_1] = zero_distance
-                    if algorithm in {'spring'}:
-                        normal = True
-                        if self.distances[instance_id_1][instance_id_2] > radius:
-                            x[i][j] = 0.
-                            normal = False
-                        if num_neighbors is not None:
-                            tmp = self.distances[instance_id_1]
-                            sorted_list_1 = list((dict(sorted(tmp.items(),
-                                                              key=lambda item: item[1]))).keys())
-                            tmp = self.distances[instance_id_2]
-                            sorted_list_2 = list((dict(sorted(tmp.items(),
-                                                              key=lambda item: item[1]))).keys())
-                            if (instance_id_1 not in sorted_list_2[0:num_neighbors]) and (
-                                    instance_id_2 not in sorted_list_1[0:num_neighbors]):
-                                x[i][j] = 0.
-                                normal = False
-                        if normal:
-                            x[i][j] = 1. / self.distances[instance_id_1][
-                                instance_id_2]
-                    else:
-                        x[i][j] = self.distances[instance_id_1][instance_id_2]
-                    x[i][j] = x[i][j] ** attraction_factor
-                    x[j][i] = x[i][j]
-
-        dt = [('weight', float)]
-        y = x.view(dt)
-        graph = nx.from_numpy_array(y)
+        distance_matrix = self.get_distance_matrix()
+        instance_ids = distance_matrix.instance_ids
+        num_elections = len(instance_ids)
+
+        distances = distance_matrix.to_matrix().astype(float)
+        distances *= factor
+        distances[distances == 0.] = zero_distance
+        np.fill_diagonal(distances, 0.)
+        self.distances = DistanceMatrix.from_matrix(instance_ids, distances)
+
+        if algorithm in {'spring'}:
+            with np.errstate(divide='ignore'):
+                x = 1. / distances
+            x[distances > radius] = 0.
+            if num_neighbors is not None and num_neighbors < num_elections - 1:
+                x[~_get_neighborhood_mask(distances, num_neighbors)] = 0.
+        else:
+            x = distances.copy()
+        x = x ** attraction_factor
+        np.fill_diagonal(x, 0.)
+
+        if algorithm == 'spring':
+            graph = _sparse_matrix_to_graph(csr_matrix(x))
 
         if num_neighbors is None:
             num_neighbors = 100
@@ -207,37 +214,99 @@ class Experiment:
             logging.warning("Unknown method!")
 
         coordinates = {}
-        for i, instance_id in enumerate(self.distances):
+        for i, instance_id in enumerate(instance_ids):
             coordinates[instance_id] = [my_pos[i][d] for d in range(dim)]
 
         if self.store:
-            if saveas is None:
-                file_name = f'{self.distance_id}_{str(dim)}d.csv'
-            else:
-                file_name = saveas
-            path = os.path.join(os.getcwd(), "experiments", self.experiment_id,
-                                "coordinates", file_name)
-            with open(path, 'w', newline='') as csvfile:
+            self._store_coordinates(coordinates, dim=dim, saveas=saveas)
+
+        self.coordinates = coordinates
+
+    def embed_landmarks(self, dim: int = 2, saveas: str = None) -> None:
+        """ Embed all the instances using only their distances to the landmarks
+        (see compute_landmark_distances) with landmark MDS """
+
+        if self.landmark_distances is None:
+            raise ValueError('Landmark distances are not computed!')
+
+        landmark_distances = self.landmark_distances
+        distances_to_landmarks = np.asarray(landmark_distances.values, dtype=float)
+        my_pos = landmark_mds(landmark_distances.to_landmark_matrix(),
+                              distances_to_landmarks, dim=dim)
+
+        # in-sample quality: how well the distances to the landmarks are preserved
+        landmark_pos = my_pos[[landmark_distances.index[landmark_id]
+                               for landmark_id in landmark_distances.landmark_ids]]
+        embedded = np.linalg.norm(my_pos[:, np.newaxis, :] - landmark_pos[np.newaxis, :, :],
+                                  axis=2)
+        print(f'Landmark stress: {round(compute_stress(embedded, distances_to_landmarks), 5)}')
+
+        coordinates = {}
+        for i, instance_id in enumerate(landmark_distances.instance_ids):
+            coordinates[instance_id] = [my_pos[i][d] for d in range(dim)]
+
+        if self.store:
+            self._store_coordinates(coordinates, dim=dim, saveas=saveas)
 
-                writer = csv.writer(csvfile, delimiter=';')
+        self.coordinates = coordinates
+
+    def _store_coordinates(self, coordinates: dict, dim: int = 2, saveas: str = None) -> None:
+        if saveas is None:
+            file_name = f'{self.distance_id}_{str(dim)}d.csv'
+        else:
+            file_name = saveas
+        path = os.path.join(os.getcwd(), "experiments", self.experiment_id,
+                            "coordinates", file_name)
+        with open(path, 'w', newline='') as csvfile:
+
+            writer = csv.writer(csvfile, delimiter=';')
+            if dim == 2:
+                writer.writerow(["instance_id", "x", "y"])
+                print(["instance_id", "x", "y"])
+            elif dim == 3:
+                writer.writerow(["instance_id", "x", "y", "z"])
+
+            for instance_id in self.instances:
+                x = round(coordinates[instance_id][0], 5)
+                y = round(coordinates[instance_id][1], 5)
                 if dim == 2:
-                    writer.writerow(["instance_id", "x", "y"])
-                    print(["instance_id", "x", "y"])
+                    writer.writerow([instance_id, x, y])
                 elif dim == 3:
-                    writer.writerow(["instance_id", "x", "y", "z"])
-
-                ctr = 0
-                for instance_id in self.instances:
-                    x = round(coordinates[instance_id][0], 5)
-                    y = round(coordinates[instance_id][1], 5)
-                    if dim == 2:
-                        writer.writerow([instance_id, x, y])
-                    elif dim == 3:
-                        z = round(my_pos[ctr][2], 5)
-                        writer.writerow([instance_id, x, y, z])
-                    ctr += 1
+                    z = round(coordinates[instance_id][2], 5)
+                    writer.writerow([instance_id, x, y, z])
+
+    def embed_incremental(self, new_instance_ids: list) -> None:
+        """ Place new instances on the existing (two-dimensional) map,
+        keeping the coordinates of all the other instances fixed """
+
+        old_ids = [instance_id for instance_id in self.coordinates
+                   if instance_id in self.distances and instance_id not in new_instance_ids]
+        all_ids = old_ids + list(new_instance_ids)
+
+        x = self.get_distance_matrix().subset(all_ids).to_matrix().astype(float)
+        np.fill_diagonal(x, 0.)
+
+        initial_positions = None
+        if len(old_ids) > 1:
+            # bring the distances to the scale of the existing coordinates
+            old_positions = np.array([self.coordinates[instance_id][0:2]
+                                      for instance_id in old_ids])
+            embedded = np.linalg.norm(old_positions[:, np.newaxis, :] -
+                                      old_positions[np.newaxis, :, :], axis=2)
+            original = x[0:len(old_ids), 0:len(old_ids)]
+            if np.sum(original ** 2) > 0:
+                x *= np.sum(original * embedded) / np.sum(original ** 2)
+            initial_positions = {i: old_positions[i] for i in range(len(old_ids))}
+
+        my_pos = KamadaKawai().embed(distances=x, initial_positions=initial_positions,
+                                     fix_initial_positions=True)
+
+        for i, instance_id in enumerate(all_ids):
+            if instance_id in new_instance_ids:
+                self.coordinates[instance_id] = [my_pos[i][0], my_pos[i][1]]
 
-        self.coordinates = coordinates
+        if self.store:
+            self.update()
 
     def print_map(self, dim: int = 2, **kwargs) -> None:
         """ Print the two-dimensional embedding of multi-dimensional map of the instances """
@@ -422,14 +491,20 @@ class Experiment:
 
         return px, py
 
-    def add_distances_to_experiment(self) -> (dict, dict, dict):
-        """ Import precomputed distances between each pair of instances from a file """
+    def add_distances_to_experiment(self) -> (DistanceMatrix, DistanceMatrix, DistanceMatrix):
+        """ Import precomputed distances between each pair of instances from a file
+        (binary file if present, otherwise csv file) """
+
+        path = os.path.join(os.getcwd(), 'experiments', self.experiment_id, 'distances',
+                            self.distance_id)
+        if DistanceMatrix.exists(path):
+            return self.add_distances_to_experiment_from_binary(path)
+
         file_name = f'{self.distance_id}.csv'
         path = os.path.join(os.getcwd(), 'experiments', self.experiment_id, 'distances', file_name)
 
-        distances = {}
-        times = {}
-        stds = {}
+        rows = []
+        seen = set()
 
         with open(path, 'r', newline='') as csv_file:
 
@@ -450,37 +525,10 @@ class Experiment:
                 if instance_id_1 not in self.instances or instance_id_2 not in self.instances:
                     continue
 
-                if instance_id_1 not in distances:
-                    distances[instance_id_1] = {}
-                if instance_id_1 not in times:
-                    times[instance_id_1] = {}
-                if instance_id_1 not in stds:
-                    stds[instance_id_1] = {}
-
-                if instance_id_2 not in distances:
-                    distances[instance_id_2] = {}
-                if instance_id_2 not in times:
-                    times[instance_id_2] = {}
-                if instance_id_2 not in stds:
-                    stds[instance_id_2] = {}
-
-                try:
-                    distances[instance_id_1][instance_id_2] = float(row['distance'])
-                    distances[instance_id_2][instance_id_1] = distances[instance_id_1][instance_id_2]
-                except KeyError:
-                    pass
-
-                try:
-                    times[instance_id_1][instance_id_2] = float(row['time'])
-                    times[instance_id_2][instance_id_1] = times[instance_id_1][instance_id_2]
-                except KeyError:
-                    pass
-
-                try:
-                    stds[instance_id_1][instance_id_2] = float(row['std'])
-                    stds[instance_id_2][instance_id_1] = stds[instance_id_1][instance_id_2]
-                except KeyError:
-                    pass
+                seen.add(instance_id_1)
+                seen.add(instance_id_2)
+                rows.append((instance_id_1, instance_id_2,
+                             row.get('distance'), row.get('time'), row.get('std')))
 
                 if instance_id_1 not in self.instances:
                     warn = True
@@ -489,8 +537,42 @@ class Experiment:
                 text = f'Possibly outdated distances are imported!'
                 warnings.warn(text)
 
+        instance_ids = [instance_id for instance_id in self.instances if instance_id in seen]
+        distances = DistanceMatrix(instance_ids)
+        times = DistanceMatrix(instance_ids)
+        stds = DistanceMatrix(instance_ids)
+
+        for instance_id_1, instance_id_2, distance, time, std in rows:
+            if distance is not None:
+                distances.set_value(instance_id_1, instance_id_2, float(distance))
+            if time is not None:
+                times.set_value(instance_id_1, instance_id_2, float(time))
+            if std is not None:
+                stds.set_value(instance_id_1, instance_id_2, float(std))
+
         return distances, times, stds
 
+    def add_distances_to_experiment_from_binary(self, path) -> (DistanceMatrix, DistanceMatrix,
+                                                                 DistanceMatrix):
+        """ Import precomputed distances from a memory-mapped binary file """
+
+        distances = DistanceMatrix.load(path)
+        if DistanceMatrix.exists(f'{path}_times'):
+            times = DistanceMatrix.load(f'{path}_times')
+        else:
+            times = DistanceMatrix(distances.instance_ids)
+
+        instance_ids = [instance_id for instance_id in distances if instance_id in self.instances]
+        if len(instance_ids) < len(distances):
+            distances = distances.subset(instance_ids)
+            times = times.subset(instance_ids)
+
+        if any(instance_id not in distances for instance_id in self.instances):
+            text = f'Possibly outdated distances are imported!'
+            warnings.warn(text)
+
+        return distances, times, DistanceMatrix(distances.instance_ids)
+
     def clean_elections(self):
         path = os.path.join(os.getcwd(), "experiments", self.experiment_id, "elections")
         for file_name in os.listdir(path):
@@ -532,3 +614,22 @@ class Experiment:
             # writer.writerow(["election_id", "value", "bound", "num_large_parties"])
             for key in feature_dict:
                 writer.writerow([key, str(feature_dict[key])])
+
+
+def _get_neighborhood_mask(distances: np.ndarray, num_neighbors: int) -> np.ndarray:
+    """ Return: symmetric boolean mask of pairs in which at least one instance
+    is among the num_neighbors nearest neighbors of the other one """
+    num_instances = len(distances)
+    sortable = distances.copy()
+    np.fill_diagonal(sortable, np.inf)
+    neighbors = np.argpartition(sortable, num_neighbors - 1, axis=1)[:, 0:num_neighbors]
+    mask = np.zeros((num_instances, num_instances), dtype=bool)
+    mask[np.arange(num_instances)[:, np.newaxis], neighbors] = True
+    return mask | mask.T
+
+
+def _sparse_matrix_to_graph(matrix: csr_matrix) -> nx.Graph:
+    try:
+        return nx.from_scipy_sparse_array(matrix)
+    except AttributeError:
+        return nx.from_scipy_sparse_matrix(matrix)
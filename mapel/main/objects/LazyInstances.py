@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from threading import RLock
+
+
+class LazyInstances(MutableMapping):
+    """ Dictionary of instances that are imported only on first access.
+
+    Ids are registered up front, but loader(instance_id) is called only when the
+    instance is requested. If max_loaded is given, at most that many lazily
+    imported instances stay in memory (least recently used ones are dropped and
+    imported again when needed). Instances added explicitly (instances[id] = ...)
+    are never dropped.
+
+    It is not a subclass of dict, so every access (including dict(instances) and
+    {**instances}) goes through __getitem__ and imports the instance if needed. """
+
+    def __init__(self, loader, instance_ids=(), max_loaded: int = None):
+        self.loader = loader
+        self.max_loaded = max_loaded
+        # instance_id -> instance (None if not imported yet)
+        self._instances = {instance_id: None for instance_id in instance_ids}
+        self._loaded = OrderedDict()
+        self._lock = RLock()
+
+    def __getitem__(self, instance_id):
+        with self._lock:
+            instance = self._instances[instance_id]
+            if instance_id in self._loaded:
+                self._loaded.move_to_end(instance_id)
+            elif instance is None:
+                instance = self.loader(instance_id)
+                self._instances[instance_id] = instance
+                self._loaded[instance_id] = True
+                self._evict()
+            return instance
+
+    def __setitem__(self, instance_id, instance):
+        with self._lock:
+            self._loaded.pop(instance_id, None)
+            self._instances[instance_id] = instance
+
+    def __delitem__(self, instance_id):
+        with self._lock:
+            self._loaded.pop(instance_id, None)
+            del self._instances[instance_id]
+
+    def __contains__(self, instance_id):
+        return instance_id in self._instances
+
+    def __iter__(self):
+        return iter(self._instances)
+
+    def __len__(self):
+        return len(self._instances)
+
+    def __repr__(self):
+        return f'LazyInstances({len(self)} instances, {self.num_loaded()} loaded)'
+
+    def __reduce__(self):
+        # only instances that are currently in memory are sent (e.g., to worker
+        # processes), the receiving side imports the other ones on demand
+        with self._lock:
+            present = {instance_id: instance
+                       for instance_id, instance in self._instances.items()
+                       if instance is not None}
+            return _rebuild_lazy_instances, (self.loader, list(self._instances),
+                                             self.max_loaded, present, list(self._loaded))
+
+    def copy(self):
+        instances = LazyInstances(self.loader, max_loaded=self.max_loaded)
+        instances._instances = self._instances.copy()
+        instances._loaded = self._loaded.copy()
+        return instances
+
+    def is_loaded(self, instance_id) -> bool:
+        return self._instances.get(instance_id) is not None
+
+    def num_loaded(self) -> int:
+        return sum(instance is not None for instance in self._instances.values())
+
+    def unload(self, instance_ids=None) -> None:
+        """ Drop lazily imported instances (by default all of them) from memory """
+        with self._lock:
+            if instance_ids is None:
+                instance_ids = list(self._loaded)
+            for instance_id in instance_ids:
+                if instance_id in self._loaded:
+                    del self._loaded[instance_id]
+                    self._instances[instance_id] = None
+
+    def _evict(self) -> None:
+        if self.max_loaded is None:
+            return
+        while len(self._loaded) > self.max_loaded:
+            instance_id, _ = self._loaded.popitem(last=False)
+            self._instances[instance_id] = None
+
+
+def _rebuild_lazy_instances(loader, instance_ids, max_loaded, present,
+                            loaded) -> LazyInstances:
+    instances = LazyInstances(loader, instance_ids, max_loaded=max_loaded)
+    instances._instances.update(present)
+    instances._loaded.update((instance_id, True) for instance_id in loaded)
+    return instances
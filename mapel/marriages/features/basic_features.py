@@ -1,5 +1,3 @@
-import gurobipy as gp
-from gurobipy import GRB
 from mapel.roommates.matching.games import StableRoommates
 from random import shuffle
 import statistics
@@ -7,6 +5,9 @@ import warnings
 import sys
 import time
 import networkx as nx
+import numpy as np
+
+from mapel.main._lp_solvers import LinearProgram
 
 sys.setrecursionlimit(10000)
 # warnings.filterwarnings("error")
@@ -52,136 +53,102 @@ def compute_stable_SR(votes):
 
 
 
-def spear_distance(instance1,instance2):
-    num_agents=len(instance1)
-    m = gp.Model("qp")
-    #m.setParam('Threads', 6)
-    #m.setParam('OutputFlag', False)
-    x = m.addVars(num_agents, num_agents, lb=0, ub=1, vtype=GRB.BINARY)
-    opt = m.addVar(vtype=GRB.INTEGER, lb=0, ub=num_agents * num_agents*num_agents)
+def _get_ranks(instance) -> np.ndarray:
+    """ Return: ranks[i][j] -- position of j in the preferences of i (zero for i == j) """
+    num_agents = len(instance)
+    ranks = np.zeros([num_agents, num_agents], dtype=int)
     for i in range(num_agents):
-        m.addConstr(gp.quicksum(x[i, j] for j in range(num_agents)) == 1)
-        m.addConstr(gp.quicksum(x[j, i] for j in range(num_agents)) == 1)
-    m.addConstr(gp.quicksum(abs(instance1[i].index(k)-instance2[j].index(t)) * x[i, j]*x[k,t] for i in range(num_agents)
-                            for j in range(num_agents) for k in [x for x in range(num_agents) if x != i]
-                            for t in [x for x in range(num_agents) if x != j]) == opt)
-    m.setObjective(opt, GRB.MINIMIZE)
-    m.optimize()
-    for i in range(num_agents):
-        for j in range(num_agents):
-            if x[i, j].X == 1:
-                print(i,j)
-    return int(m.objVal)
+        ranks[i, list(instance[i])] = np.arange(len(instance[i]))
+    return ranks
+
+
+def _add_matching_variables(program, num_agents, obj=0.) -> np.ndarray:
+    """ Return: binary variables x[i][j] of a symmetric matching
+    (nobody is matched with themselves) """
+    x = program.add_variables((num_agents, num_agents), obj=obj,
+                              ub=1. - np.eye(num_agents), binary=True)
+    i, j = np.triu_indices(num_agents, 1)
+    program.add_constraints(np.stack([x[i, j], x[j, i]], axis=1), [1., -1.], lb=0., ub=0.)
+    return x
+
+
+def _get_better_pairs(x, instance, i, j) -> list:
+    """ Return: variables of the pairs that i or j weakly prefer to being matched together """
+    return [x[i, k] for k in instance[i][:instance[i].index(j) + 1]] + \
+        [x[j, k] for k in instance[j][:instance[j].index(i) + 1]]
+
+
+def _get_matching(x_values) -> dict:
+    matching = {}
+    for i, j in zip(*np.nonzero(x_values > 0.5)):
+        matching[int(i)] = int(j)
+        matching[int(j)] = int(i)
+    return matching
+
+
+def spear_distance(instance1,instance2):
+    # the quadratic model has the same optimum as its linearization
+    return spear_distance_linear(instance1, instance2)
 
 
 def spear_distance_linear(instance1,instance2):
     num_agents=len(instance1)
-    m = gp.Model("mip1")
-    #m.setParam('Threads', 6)
-    #m.setParam('OutputFlag', False)
-    x = m.addVars(num_agents, num_agents, lb=0, ub=1, vtype=GRB.BINARY)
-    y = m.addVars(num_agents, num_agents,num_agents,num_agents, lb=0, ub=1, vtype=GRB.CONTINUOUS)
-    opt = m.addVar(vtype=GRB.INTEGER, lb=0, ub=num_agents * num_agents*num_agents)
-    for i in range(num_agents):
-        m.addConstr(gp.quicksum(x[i, j] for j in range(num_agents)) == 1)
-        m.addConstr(gp.quicksum(x[j, i] for j in range(num_agents)) == 1)
-    for i in range(num_agents):
-        for j in range(num_agents):
-            for k in range(num_agents):
-                for l in range(num_agents):
-                    m.addConstr(y[i,j,k,l]<=x[i, j])
-                    m.addConstr(y[i, j, k, l] <= x[k, l])
-                    m.addConstr(y[i, j, k, l] >= x[i, j]+x[k, l]-1)
-
-    m.addConstr(gp.quicksum(abs(instance1[i].index(k)-instance2[j].index(t)) * y[i, j,k,t] for i in range(num_agents)
-                            for j in range(num_agents) for k in [x for x in range(num_agents) if x != i]
-                            for t in [x for x in range(num_agents) if x != j]) == opt)
-    m.setObjective(opt, GRB.MINIMIZE)
-    m.optimize()
-    for i in range(num_agents):
-        for j in range(num_agents):
-            if x[i, j].X == 1:
-                print(i,j)
-    return int(m.objVal)
+    ranks_1 = _get_ranks(instance1)
+    ranks_2 = _get_ranks(instance2)
+    program = LinearProgram()
+    x = program.add_variables((num_agents, num_agents), binary=True)
+    program.add_constraints(x, lb=1., ub=1.)
+    program.add_constraints(x.T, lb=1., ub=1.)
+
+    # y[i][j][k][t] = x[i][j] * x[k][t]
+    weights = np.abs(ranks_1[:, np.newaxis, :, np.newaxis] -
+                     ranks_2[np.newaxis, :, np.newaxis, :]).astype(float)
+    others = ~np.eye(num_agents, dtype=bool)
+    weights *= others[:, np.newaxis, :, np.newaxis] & others[np.newaxis, :, np.newaxis, :]
+    y = program.add_variables(weights.shape, obj=weights, ub=1.)
+    i, j, k, t = np.indices(weights.shape).reshape(4, -1)
+    program.add_constraints(np.stack([y.ravel(), x[i, j]], axis=1), [1., -1.], ub=0.)
+    program.add_constraints(np.stack([y.ravel(), x[k, t]], axis=1), [1., -1.], ub=0.)
+    program.add_constraints(np.stack([y.ravel(), x[i, j], x[k, t]], axis=1), [1., -1., -1.],
+                            lb=-1.)
+
+    objective_value, values = program.solve()
+    for i, j in zip(*np.nonzero(values[x] > 0.5)):
+        print(i,j)
+    return int(round(objective_value))
 
 #Only call for instances that admit a stable matchig
 #summed: Set to true we try to optimize the summed rank of agents for their partner in the matching, set to false we optimize the minimum rank
 #Best (only relevant if summed is set to true): Set to true we output the best possible matching, set to false the worst one
 def rank_matching(instance,best,summed):
     num_agents=len(instance)
-    m = gp.Model("mip1")
-    m.setParam('OutputFlag', False)
-    x = m.addVars(num_agents, num_agents, lb=0, ub=1, vtype=GRB.BINARY)
-    opt = m.addVar(vtype=GRB.INTEGER, lb=0, ub=num_agents*num_agents)
-    for i in range(num_agents):
-        m.addConstr(x[i, i]  == 0)
-    for i in range(num_agents):
-        for j in range(num_agents):
-            m.addConstr(x[i, j]  == x[j, i])
-    for i in range(num_agents):
-        m.addConstr(gp.quicksum(x[i, j] for j in range(num_agents)) <= 1)
+    ranks = _get_ranks(instance)
+    program = LinearProgram(sense='maximize' if summed and best else 'minimize')
+    x = _add_matching_variables(program, num_agents, obj=ranks if summed else 0.)
+    program.add_constraints(x, ub=1.)
     for i in range(num_agents):
         for j in range(i+1,num_agents):
-            better_pairs=[]
-            for t in range(0,instance[i].index(j)+1):
-                better_pairs.append([i,instance[i][t]])
-            for t in range(0,instance[j].index(i)+1):
-                better_pairs.append([j,instance[j][t]])
-            m.addConstr(gp.quicksum(x[a[0], a[1]] for a in better_pairs) >= 1)
-    if summed:
-        #print(instance[0])
-        m.addConstr(gp.quicksum(instance[i].index(j)* x[i, j]  for i in range(num_agents) for j in [x for x in range(num_agents) if x != i]) == opt)
-        if best:
-            m.setObjective(opt, GRB.MAXIMIZE)
-        else:
-            m.setObjective(opt, GRB.MINIMIZE)
-    else:
-        for i in range(num_agents):
-            m.addConstr(gp.quicksum(instance[j].index(i) * x[i, j] for j in [x for x in range(num_agents) if x != i])<=opt)
-        m.setObjective(opt, GRB.MINIMIZE)
-    m.optimize()
-    matching={}
-    for i in range(num_agents):
-        for j in range(num_agents):
-            if x[i, j].X == 1:
-                matching[i]=j
-                matching[j]=i
-    return int(m.objVal), matching
+            program.add_constraints([_get_better_pairs(x, instance, i, j)], lb=1.)
+    if not summed:
+        opt = program.add_variables(1, obj=1., ub=num_agents * num_agents, integer=True)
+        program.add_constraints(np.hstack([x, np.repeat(opt, num_agents)[:, np.newaxis]]),
+                                np.hstack([ranks.T, -np.ones([num_agents, 1])]), ub=0.)
+    objective_value, values = program.solve()
+    return int(round(objective_value)), _get_matching(values[x])
 
 def min_num_bps_matching(instance):
     num_agents=len(instance.votes)
-    m = gp.Model("mip1")
-    m.setParam('OutputFlag', False)
-    x = m.addVars(num_agents, num_agents, lb=0, ub=1, vtype=GRB.BINARY)
-    y = m.addVars(num_agents, num_agents, lb=0, ub=1, vtype=GRB.BINARY)
-    opt = m.addVar(vtype=GRB.INTEGER, lb=0, ub=num_agents*num_agents)
-    m.addConstr(gp.quicksum(y[i, j] for i in range(num_agents) for j in range(num_agents)) <= opt)
-    for i in range(num_agents):
-        m.addConstr(x[i, i]  == 0)
-    for i in range(num_agents):
-        for j in range(num_agents):
-            m.addConstr(x[i, j]  == x[j, i])
-    for i in range(num_agents):
-        m.addConstr(gp.quicksum(x[i, j] for j in range(num_agents)) <= 1)
+    program = LinearProgram()
+    x = _add_matching_variables(program, num_agents)
+    program.add_constraints(x, ub=1.)
+    # y[i][j] -- agents i and j form a blocking pair
+    y = program.add_variables((num_agents, num_agents), obj=1., binary=True)
     for i in range(num_agents):
         for j in range(i+1,num_agents):
-            better_pairs=[]
-            for t in range(0,instance.votes[i].index(j)+1):
-                better_pairs.append([i,instance.votes[i][t]])
-            for t in range(0,instance.votes[j].index(i)+1):
-                better_pairs.append([j,instance.votes[j][t]])
-            m.addConstr(gp.quicksum(x[a[0], a[1]] for a in better_pairs) >= 1-y[i,j])
-
-    m.setObjective(opt, GRB.MINIMIZE)
-    m.optimize()
-    matching={}
-    for i in range(num_agents):
-        for j in range(num_agents):
-            if x[i, j].X == 1:
-                matching[i]=j
-                matching[j]=i
-    #return int(m.objVal), matching
-    return int(m.objVal)
+            program.add_constraints([_get_better_pairs(x, instance.votes, i, j) + [y[i, j]]],
+                                    lb=1.)
+    objective_value, values = program.solve()
+    return int(round(objective_value))
 
 def summed_rank_maximal_matching(instance):
     val,matching= rank_matching(instance.votes,True,True)
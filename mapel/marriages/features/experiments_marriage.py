@@ -1,5 +1,3 @@
-import gurobipy as gp
-from gurobipy import GRB
 # from matching.games import StableRoommates
 from random import shuffle
 import statistics
@@ -7,6 +5,9 @@ import warnings
 import sys
 import time
 import networkx as nx
+import numpy as np
+
+from mapel.main._lp_solvers import LinearProgram
 sys.setrecursionlimit(10000)
 warnings.filterwarnings("error")
 
@@ -49,45 +50,35 @@ def number_blockingPairs(instance,matching):
 #Best (only relevant if summed is set to true): Set to true we output the best possible matching, set to false the worst one
 def rank_matching(instance,best,summed):
     num_agents=len(instance[0])
-    m = gp.Model("mip1")
-    m.setParam('OutputFlag', False)
-    x = m.addVars(num_agents, num_agents, lb=0, ub=1, vtype=GRB.BINARY)
-    opt = m.addVar(vtype=GRB.INTEGER, lb=0, ub=num_agents*num_agents)
-    for i in range(num_agents):
-        m.addConstr(gp.quicksum(x[i, j] for j in range(num_agents)) <= 1)
-        m.addConstr(gp.quicksum(x[j, i] for j in range(num_agents)) <= 1)
+    # ranks[k][i][j] -- position of j in the preferences of the i-th agent on side k
+    ranks = np.zeros([2, num_agents, num_agents], dtype=int)
+    for k in [0, 1]:
+        for i in range(num_agents):
+            ranks[k, i, list(instance[k][i])] = np.arange(num_agents)
+
+    program = LinearProgram(sense='maximize' if summed and best else 'minimize')
+    x = program.add_variables((num_agents, num_agents), obj=ranks.sum(axis=0) if summed else 0.,
+                              binary=True)
+    program.add_constraints(x, ub=1.)
+    program.add_constraints(x.T, ub=1.)
     for i in range(num_agents):
         for j in range(num_agents):
-            #print(i,j)
-            better_pairs=[]
-            for t in range(0,instance[0][i].index(j)+1):
-                better_pairs.append([i,instance[0][i][t]])
-            for t in range(0,instance[1][j].index(i)+1):
-                better_pairs.append([instance[1][j][t],j])
-            #print(better_pairs)
-            #exit()
-            m.addConstr(gp.quicksum(x[a[0], a[1]] for a in better_pairs) >= 1)
-    if summed:
-        #print(instance[0])
-        m.addConstr(gp.quicksum(instance[k][i].index(j)* x[i, j]  for i in range(num_agents) for j in range(num_agents) for k in [0,1]) == opt)
-        if best:
-            m.setObjective(opt, GRB.MAXIMIZE)
-        else:
-            m.setObjective(opt, GRB.MINIMIZE)
-    else:
-        for i in range(num_agents):
-            m.addConstr(gp.quicksum(instance[0][j].index(i) * x[i, j] for j in range(num_agents))<=opt)
-            m.addConstr(gp.quicksum(instance[1][j].index(i) * x[i, j] for j in range(num_agents))<= opt)
-        m.setObjective(opt, GRB.MINIMIZE)
-    m.optimize()
+            better_pairs = [x[i, c] for c in instance[0][i][:ranks[0, i, j] + 1]] + \
+                [x[c, j] for c in instance[1][j][:ranks[1, j, i] + 1]]
+            program.add_constraints([better_pairs], lb=1.)
+    if not summed:
+        opt = program.add_variables(1, obj=1., ub=num_agents * num_agents, integer=True)
+        opt_column = np.repeat(opt, num_agents)[:, np.newaxis]
+        for k in [0, 1]:
+            program.add_constraints(np.hstack([x, opt_column]),
+                                    np.hstack([ranks[k].T, -np.ones([num_agents, 1])]), ub=0.)
+    objective_value, values = program.solve()
     matching1={}
     matching2 = {}
-    for i in range(num_agents):
-        for j in range(num_agents):
-            if x[i, j].X == 1:
-                matching1[i]=j
-                matching2[j]=i
-    return int(m.objVal), [matching1,matching2]
+    for i, j in zip(*np.nonzero(values[x] > 0.5)):
+        matching1[int(i)]=int(j)
+        matching2[int(j)]=int(i)
+    return int(round(objective_value)), [matching1,matching2]
 
 
 
@@ -3,7 +3,7 @@ from itertools import combinations, permutations
 
 from mapel.main._matchings import *
 from mapel.marriages.objects.Marriages import Marriages
-from mapel.main._inner_distances import swap_distance
+from mapel.main._inner_distances import swap_distance, get_cost_matrix
 
 
 # MAIN DISTANCES
@@ -73,10 +73,8 @@ def get_matching_cost_retrospective(instance_1: Marriages, instance_2: Marriages
     vectors_1 = instance_1.get_retrospective_vectors()
     vectors_2 = instance_2.get_retrospective_vectors()
 
-    size = instance_1.num_agents
-
-    return [[inner_distance(vectors_1[0][i], vectors_2[0][j]) for i in range(size)] for j in range(size)], \
-           [[inner_distance(vectors_1[1][i], vectors_2[1][j]) for i in range(size)] for j in range(size)]
+    return get_cost_matrix(vectors_2[0], vectors_1[0], inner_distance), \
+           get_cost_matrix(vectors_2[1], vectors_1[1], inner_distance)
 
 
 
@@ -85,8 +83,7 @@ def get_matching_cost_positionwise(instance_1: Marriages, instance_2: Marriages,
     """ Return: Cost table """
     vectors_1 = instance_1.get_positionwise_vectors()
     vectors_2 = instance_2.get_positionwise_vectors()
-    size = instance_1.num_agents
-    return [[inner_distance(vectors_1[i], vectors_2[j]) for i in range(size)] for j in range(size)]
+    return get_cost_matrix(vectors_2, vectors_1, inner_distance)
 
 # def get_matching_cost_pos_swap(instance_1: Roommates, instance_2: Roommates,
 #                                 matching) -> List[list]:
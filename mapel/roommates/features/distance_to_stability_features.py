@@ -1,11 +1,12 @@
-import gurobipy as gp
-from gurobipy import GRB
 from random import shuffle
 import statistics
 import warnings
 import sys
 import time
 import networkx as nx
+import numpy as np
+
+from mapel.main._lp_solvers import LinearProgram
 
 def generate_instance(num_agents):
     instance=[]
@@ -16,121 +17,84 @@ def generate_instance(num_agents):
     return instance
 
 
+def _get_ranks(instance) -> np.ndarray:
+    """ Return: ranks[i][j] -- position of j in the preferences of i (zero for i == j) """
+    num_agents = len(instance)
+    ranks = np.zeros([num_agents, num_agents], dtype=int)
+    for i in range(num_agents):
+        ranks[i, list(instance[i])] = np.arange(len(instance[i]))
+    return ranks
+
+
+def _add_matching_variables(program, num_agents) -> np.ndarray:
+    """ Return: binary variables x[i][j] of a symmetric matching
+    (nobody is matched with themselves) """
+    x = program.add_variables((num_agents, num_agents), ub=1. - np.eye(num_agents), binary=True)
+    i, j = np.triu_indices(num_agents, 1)
+    program.add_constraints(np.stack([x[i, j], x[j, i]], axis=1), [1., -1.], lb=0., ub=0.)
+    return x
+
+
+def _get_better_pairs(x, instance, i, j) -> list:
+    """ Return: variables of the pairs that i or j weakly prefer to being matched together """
+    return [x[i, k] for k in instance[i][:instance[i].index(j) + 1]] + \
+        [x[j, k] for k in instance[j][:instance[j].index(i) + 1]]
+
+
 #Only works for even number of agents
 def swap_distance_to_stable(instance):
     num_agents=len(instance)
-    m = gp.Model("mip1")
-    m.setParam('OutputFlag', False)
+    ranks = _get_ranks(instance)
+    program = LinearProgram()
     #who is matched to whom
-    x = m.addVars(num_agents, num_agents, lb=0, ub=1, vtype=GRB.BINARY)
+    x = _add_matching_variables(program, num_agents)
+    program.add_constraints(x, lb=1., ub=1.)
     #am I matched to rank i or better
-    gm = m.addVars(num_agents, num_agents-1, lb=0, ub=1, vtype=GRB.BINARY)
+    gm = program.add_variables((num_agents, num_agents-1), binary=True)
     #by how much have my partner been swaped up in my preferences
-    yy = m.addVars(num_agents, lb=0, ub=num_agents, vtype=GRB.INTEGER)
-
-    for i in range(num_agents):
-        yy[i].start=0
-
-    opt = m.addVar(vtype=GRB.INTEGER, lb=0, ub=num_agents*num_agents)
-    m.addConstr(gp.quicksum(yy[i] for i in range(num_agents)) == opt)
-    for i in range(num_agents):
-        m.addConstr(x[i, i]  == 0)
-
-    for i in range(num_agents):
-        for j in range(num_agents):
-            m.addConstr(x[i, j]  == x[j, i])
-
-    for i in range(num_agents):
-        for j in range(num_agents):
-            if i!=j:
-                for t in range(num_agents-1):
-                    m.addConstr(x[i, j]*instance[i].index(j)  <= t+yy[i]+num_agents*(1-gm[i,t]))
-
+    yy = program.add_variables(num_agents, obj=1., ub=num_agents, integer=True)
 
-    for i in range(num_agents):
-        m.addConstr(gp.quicksum(x[i, j] for j in range(num_agents)) == 1)
+    # x[i][j] * rank of j <= t + yy[i] + num_agents * (1 - gm[i][t])
+    i, j, t = np.nonzero(np.broadcast_to(~np.eye(num_agents, dtype=bool)[:, :, np.newaxis],
+                                         (num_agents, num_agents, num_agents-1)))
+    program.add_constraints(np.stack([x[i, j], yy[i], gm[i, t]], axis=1),
+                            np.stack([ranks[i, j], -np.ones(len(i)),
+                                      np.full(len(i), num_agents)], axis=1),
+                            ub=t + num_agents)
 
-    for i in range(num_agents):
-        for j in range(i+1,num_agents):
-            m.addConstr(gm[i,instance[i].index(j)]+gm[j,instance[j].index(i)]>=1)
-    m.setObjective(opt, GRB.MINIMIZE)
-    m.optimize()
+    i, j = np.triu_indices(num_agents, 1)
+    program.add_constraints(np.stack([gm[i, ranks[i, j]], gm[j, ranks[j, i]]], axis=1), lb=1.)
 
-    return int(m.objVal)
+    objective_value, _ = program.solve()
+    return int(round(objective_value))
 
 def delete_distance_to_stable(instance):
     num_agents=len(instance)
-    m = gp.Model("mip1")
-    m.setParam('OutputFlag', False)
-    x = m.addVars(num_agents, num_agents, lb=0, ub=1, vtype=GRB.BINARY)
-    y = m.addVars(num_agents, lb=0, ub=1, vtype=GRB.BINARY)
-    for i in range(num_agents):
-        y[i].start=0
-    opt = m.addVar(vtype=GRB.INTEGER, lb=0, ub=num_agents)
-    m.addConstr(gp.quicksum(y[i] for i in range(num_agents)) == opt)
-    for i in range(num_agents):
-        m.addConstr(x[i, i]  == 0)
-    for i in range(num_agents):
-        for j in range(num_agents):
-            m.addConstr(x[i, j]  == x[j, i])
-    for i in range(num_agents):
-        m.addConstr(gp.quicksum(x[i, j] for j in range(num_agents)) <= (1-y[i]))
+    program = LinearProgram()
+    x = _add_matching_variables(program, num_agents)
+    y = program.add_variables(num_agents, obj=1., binary=True)
+    program.add_constraints(np.hstack([x, y[:, np.newaxis]]), ub=1.)
     for i in range(num_agents):
         for j in range(i+1,num_agents):
-            better_pairs=[]
-            for t in range(0,instance[i].index(j)+1):
-                better_pairs.append([i,instance[i][t]])
-            for t in range(0,instance[j].index(i)+1):
-                better_pairs.append([j,instance[j][t]])
-            m.addConstr(gp.quicksum(x[a[0], a[1]] for a in better_pairs) >= 1-y[i]-y[j])
-
-    m.setObjective(opt, GRB.MINIMIZE)
-    m.optimize()
-    matching={}
-    for i in range(num_agents):
-        for j in range(num_agents):
-            if x[i, j].X == 1:
-                matching[i]=j
-                matching[j]=i
-    return int(m.objVal)
+            program.add_constraints([_get_better_pairs(x, instance, i, j) + [y[i], y[j]]],
+                                    lb=1.)
+    objective_value, _ = program.solve()
+    return int(round(objective_value))
 
 
 def min_num_blocking_agents_matching(instance):
     num_agents=len(instance)
-    m = gp.Model("mip1")
-    m.setParam('OutputFlag', False)
-    x = m.addVars(num_agents, num_agents, lb=0, ub=1, vtype=GRB.BINARY)
-    y = m.addVars(num_agents, lb=0, ub=1, vtype=GRB.BINARY)
-    for i in range(num_agents):
-        y[i].start=0
-    opt = m.addVar(vtype=GRB.INTEGER, lb=0, ub=num_agents)
-    m.addConstr(gp.quicksum(y[i] for i in range(num_agents)) <= opt)
-    for i in range(num_agents):
-        m.addConstr(x[i, i]  == 0)
-    for i in range(num_agents):
-        for j in range(num_agents):
-            m.addConstr(x[i, j]  == x[j, i])
-    for i in range(num_agents):
-        m.addConstr(gp.quicksum(x[i, j] for j in range(num_agents)) <= 1)
+    program = LinearProgram()
+    x = _add_matching_variables(program, num_agents)
+    program.add_constraints(x, ub=1.)
+    y = program.add_variables(num_agents, obj=1., binary=True)
     for i in range(num_agents):
         for j in range(i+1,num_agents):
-            better_pairs=[]
-            for t in range(0,instance[i].index(j)+1):
-                better_pairs.append([i,instance[i][t]])
-            for t in range(0,instance[j].index(i)+1):
-                better_pairs.append([j,instance[j][t]])
-            m.addConstr(gp.quicksum(x[a[0], a[1]] for a in better_pairs) >= 1-y[i]-y[j])
-
-    m.setObjective(opt, GRB.MINIMIZE)
-    m.optimize()
-    matching={}
-    for i in range(num_agents):
-        for j in range(num_agents):
-            if x[i, j].X == 1:
-                matching[i]=j
-                matching[j]=i
-    print(m.objVal)
-    return int(m.objVal)
+            program.add_constraints([_get_better_pairs(x, instance, i, j) + [y[i], y[j]]],
+                                    lb=1.)
+    objective_value, _ = program.solve()
+    print(objective_value)
+    return int(round(objective_value))
 
 #for i in range(100):
 #    instance=generate_instance(50)
@@ -3,7 +3,7 @@ from itertools import permutations
 
 from mapel.main._matchings import *
 from mapel.roommates.objects.Roommates import Roommates
-from mapel.main._inner_distances import swap_distance
+from mapel.main._inner_distances import swap_distance, get_cost_matrix
 
 
 # MAIN DISTANCES
@@ -70,8 +70,7 @@ def get_matching_cost_retrospective(instance_1: Roommates, instance_2: Roommates
     """ Return: Cost table """
     vectors_1 = instance_1.get_retrospective_vectors()
     vectors_2 = instance_2.get_retrospective_vectors()
-    size = instance_1.num_agents
-    return [[inner_distance(vectors_1[i], vectors_2[j]) for i in range(size)] for j in range(size)]
+    return get_cost_matrix(vectors_2, vectors_1, inner_distance)
 
 
 def get_matching_cost_positionwise(instance_1: Roommates, instance_2: Roommates,
@@ -79,8 +78,7 @@ def get_matching_cost_positionwise(instance_1: Roommates, instance_2: Roommates,
     """ Return: Cost table """
     vectors_1 = instance_1.get_positionwise_vectors()
     vectors_2 = instance_2.get_positionwise_vectors()
-    size = instance_1.num_agents
-    return [[inner_distance(vectors_1[i], vectors_2[j]) for i in range(size)] for j in range(size)]
+    return get_cost_matrix(vectors_2, vectors_1, inner_distance)
 
 # # # # # # # # # # # # # # # #
 # LAST CLEANUP ON: 16.03.2022 #